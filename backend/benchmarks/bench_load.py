@@ -0,0 +1,195 @@
+"""
+End-to-end load test of the API, in-process and fully offline.
+
+Drives main.app through httpx's ASGI transport with a fixed number of
+concurrent clients per scenario. Pikalytics and Pokepaste are replayed from
+recorded pages by benchmarks/fake_upstreams and the OpenAI provider is
+benchmarks/fake_openai, each with its own simulated latency. Reports
+requests/s and p50/p90/p99 latency per route, and how many upstream
+requests the run cost.
+
+With --cache warm (the default) each scenario first makes one pass over its
+inputs, so the timings are cache hits; --cache cold clears every service
+cache before each request, so each one goes upstream unless it coalesces
+with a concurrent one.
+
+    cd backend && python -m benchmarks.bench_load [--requests N] [--concurrency C]
+        [--cache warm|cold] [--upstream-latency S] [--llm-latency S] [--only NAME ...] [--json]
+"""
+import os
+
+# Keep the run from touching the databases next to the app
+os.environ.setdefault("META_HISTORY_PATH", "")
+os.environ.setdefault("TEAMS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+# Measure the app rather than the outbound rate limits
+for upstream in ("PIKALYTICS", "POKEPASTE", "OPENAI"):
+    os.environ.setdefault(f"{upstream}_RATE_LIMIT", "100000")
+    os.environ.setdefault(f"{upstream}_BURST", "100000")
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+from benchmarks import fake_upstreams
+from benchmarks.fake_openai import fake_provider, make_app
+from main import app
+from services import llm, pikalytics, pokepaste
+from services.showdown import parse_showdown_team
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    route: str
+    # JSON body and, for routes with parameters, the path of the i-th request
+    body: Callable[[int], Optional[dict]] = lambda i: None
+    path: Optional[Callable[[int], str]] = None
+    stream: bool = False
+
+def load_pastes() -> List[str]:
+    return [path.read_text() for path in sorted((FIXTURES / "pastes").glob("*.txt"))]
+
+def meta_names() -> List[str]:
+    """Pokemon names from the recorded Pikalytics landing page, most used first."""
+    page = (FIXTURES / "pikalytics" / "home.html").read_bytes()
+    return [p["name"] for p in pikalytics.parse_meta_page(page)]
+
+def build_scenarios() -> List[Scenario]:
+    pastes = load_pastes()
+    names = meta_names()[:40]
+    urls = fake_upstreams.paste_urls()
+    teams = [[p.name for p in parse_showdown_team(paste)] for paste in pastes]
+    return [
+        Scenario("meta", "GET", "/meta", path=lambda i: "/meta?format=sv"),
+        Scenario("sets", "GET", "/sets/{pokemon}", path=lambda i: f"/sets/{names[i % len(names)]}?format=sv"),
+        Scenario("sets_batch", "POST", "/sets/batch", lambda i: {"pokemon": teams[i % len(teams)], "format": "sv"}),
+        Scenario("fetch_pokepaste", "POST", "/fetch-pokepaste", lambda i: {"url": urls[i % len(urls)]}),
+        Scenario("team_stats", "POST", "/team/stats", lambda i: {"team": pastes[i % len(pastes)]}),
+        Scenario("analyze_quick", "POST", "/analyze-team", lambda i: {"team": pastes[i % len(pastes)], "mode": "quick"}),
+        Scenario("analyze_deep", "POST", "/analyze-team", lambda i: {"team": pastes[i % len(pastes)], "mode": "deep"}),
+        Scenario("analyze_stream", "POST", "/analyze-team/stream", lambda i: {"team": pastes[i % len(pastes)]}, stream=True),
+    ]
+
+def clear_caches() -> None:
+    pikalytics._meta_cache.clear()
+    pikalytics._sets_cache.clear()
+    pikalytics._snapshots.clear()
+    pokepaste._paste_cache.clear()
+    llm._analysis_cache.clear()
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, i: int) -> int:
+    path = scenario.path(i) if scenario.path else scenario.route
+    body = scenario.body(i)
+    if scenario.stream:
+        async with client.stream(scenario.method, path, json=body) as response:
+            async for _ in response.aiter_raw():
+                pass
+            return response.status_code
+    response = await client.request(scenario.method, path, json=body)
+    return response.status_code
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       cold: bool, upstreams: Dict[str, object]) -> dict:
+    if cold:
+        clear_caches()
+    else:
+        # One pass over the inputs so the timed requests are cache hits
+        for i in range(min(requests, 64)):
+            await send(client, scenario, i)
+    before = {name: app.state.requests for name, app in upstreams.items()}
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if cold:
+                clear_caches()
+            started = time.perf_counter()
+            try:
+                status = await send(client, scenario, i)
+            except Exception:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "route": f"{scenario.method} {scenario.route}",
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "upstream_requests": {name: app.state.requests - before[name] for name, app in upstreams.items()},
+    }
+
+async def run(args) -> dict:
+    pikalytics_app, pokepaste_app = fake_upstreams.install(args.upstream_latency)
+    openai_app = make_app(latency=args.llm_latency, chunk_delay=0)
+    llm.providers["openai"] = fake_provider(openai_app)
+    llm.ANALYSIS_ROUTES.update(quick="rules", deep="openai")
+    upstreams = {"pikalytics": pikalytics_app, "pokepaste": pokepaste_app, "openai": openai_app}
+
+    scenarios = [s for s in build_scenarios() if not args.only or s.name in args.only]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in scenarios:
+            results.append(await run_scenario(client, scenario, args.requests, args.concurrency, args.cache == "cold", upstreams))
+    return {
+        "cache": args.cache,
+        "upstream_latency_s": args.upstream_latency,
+        "llm_latency_s": args.llm_latency,
+        "scenarios": results,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--cache", choices=("warm", "cold"), default="warm")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="simulated Pikalytics/Pokepaste latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="simulated model latency in seconds")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these scenarios")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"cache: {results['cache']}, upstream latency {args.upstream_latency:.3f}s, model latency {args.llm_latency:.3f}s")
+    print(f"{'scenario':<17}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}  upstream")
+    for r in results["scenarios"]:
+        upstream = ", ".join(f"{name}={count}" for name, count in r["upstream_requests"].items() if count)
+        print(f"{r['scenario']:<17}{r['rps']:>9.1f}{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}  {upstream}")
+
+if __name__ == "__main__":
+    main()
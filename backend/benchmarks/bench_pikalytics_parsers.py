@@ -0,0 +1,72 @@
+"""
+Compare the Pikalytics HTML extraction backends on saved fixture pages.
+
+Checks that every backend produces the same dicts as the BeautifulSoup
+reference, then reports parse throughput per page.
+
+    cd backend && python -m benchmarks.bench_pikalytics_parsers [--repeat N] [--json]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from services.pikalytics import PARSERS
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pikalytics"
+REFERENCE = "bs4"
+
+def load_pages():
+    """Return (name, kind, content) for every fixture; kind is "meta" or "sets"."""
+    pages = []
+    for path in sorted(FIXTURES.glob("*.html")):
+        kind = "sets" if path.name.startswith("pokedex_") else "meta"
+        pages.append((path.stem, kind, path.read_bytes()))
+    return pages
+
+def time_parser(fn, content: bytes, repeat: int) -> float:
+    """Best-of-three mean seconds per parse."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(content)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+def run(repeat: int) -> list:
+    results = []
+    for name, kind, content in load_pages():
+        index = 0 if kind == "meta" else 1
+        expected = PARSERS[REFERENCE][index](content)
+        for backend, fns in PARSERS.items():
+            fn = fns[index]
+            results.append({
+                "page": name,
+                "backend": backend,
+                "bytes": len(content),
+                "entries": len(expected),
+                "matches_reference": fn(content) == expected,
+                "ms_per_parse": time_parser(fn, content, repeat) * 1000,
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="parses per timing round")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    reference = {r["page"]: r["ms_per_parse"] for r in results if r["backend"] == REFERENCE}
+    print(f"{'page':<26}{'backend':<8}{'entries':>8}{'ms/parse':>11}{'speedup':>9}  match")
+    for r in results:
+        speedup = reference[r["page"]] / r["ms_per_parse"]
+        print(f"{r['page']:<26}{r['backend']:<8}{r['entries']:>8}{r['ms_per_parse']:>11.2f}{speedup:>8.1f}x  {r['matches_reference']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Speed and correctness of the Pokepaste extraction tiers on saved pages.
+
+For each saved page, compares the /raw text path, the streaming <pre>
+scanner and the full BeautifulSoup DOM parse: all three must yield the same
+parsed team as the original paste, and each is timed.
+
+    cd backend && python -m benchmarks.bench_pokepaste_extract [--repeat N] [--json]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from services.pokepaste import PreBlockScanner, _extract_team_from_dom, clean_team_data
+from services.showdown import looks_like_pokemon_team, parse_showdown_team
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+def raw_tier(raw: str):
+    text = raw.strip()
+    return clean_team_data(text) if looks_like_pokemon_team(text) else None
+
+def scanner_tier(page: str):
+    scanner = PreBlockScanner()
+    scanner.feed(page)
+    return scanner.team_data()
+
+TIERS = {
+    "raw": raw_tier,
+    "scanner": scanner_tier,
+    "dom": _extract_team_from_dom,
+}
+
+def per_call_us(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(arg)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1e6
+
+def run(repeat: int) -> list:
+    results = []
+    for page_path in sorted((FIXTURES / "pokepaste").glob("*.html")):
+        page = page_path.read_text()
+        # pokepast.es serves /raw with CRLF line endings
+        raw = (FIXTURES / "pastes" / f"{page_path.stem}.txt").read_text().replace("\n", "\r\n")
+        expected = [p.to_dict() for p in parse_showdown_team(raw)]
+        for tier, fn in TIERS.items():
+            source = raw if tier == "raw" else page
+            team = fn(source)
+            results.append({
+                "paste": page_path.stem,
+                "tier": tier,
+                "correct": team is not None and [p.to_dict() for p in parse_showdown_team(team)] == expected,
+                "us_per_extract": per_call_us(fn, source, repeat),
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="extractions per timing round")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    dom = {r["paste"]: r["us_per_extract"] for r in results if r["tier"] == "dom"}
+    print(f"{'paste':<18}{'tier':<9}{'us/extract':>12}{'vs dom':>9}  correct")
+    for r in results:
+        print(f"{r['paste']:<18}{r['tier']:<9}{r['us_per_extract']:>12.1f}{dom[r['paste']] / r['us_per_extract']:>8.1f}x  {r['correct']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-team latency of the analysis providers, fully offline.
+
+Runs the paste corpus through the "rules" provider and through the "openai"
+provider pointed at benchmarks/fake_openai in-process, with the fake's
+latency set to zero (pure client/parsing overhead) and to --latency seconds
+(a stand-in for WAN and model time), and reports milliseconds per team.
+
+    cd backend && python -m benchmarks.bench_providers [--rounds N] [--latency S] [--json]
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.fake_openai import fake_provider, make_app
+from services import llm
+from services.showdown import ShowdownPokemon, parse_showdown_team
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pastes"
+
+def load_teams() -> List[List[ShowdownPokemon]]:
+    return [parse_showdown_team(path.read_text()) for path in sorted(FIXTURES.glob("*.txt"))]
+
+async def per_team_ms(mode: str, teams, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        # Analyses are cached by team; start every round cold
+        llm._analysis_cache.clear()
+        for team in teams:
+            analysis = await llm.analyze_parsed_team(team, mode=mode)
+            assert analysis.get("grade"), analysis
+    return (time.perf_counter() - start) / (len(teams) * rounds) * 1000
+
+async def run(args) -> dict:
+    teams = load_teams()
+    llm.ANALYSIS_ROUTES.update(quick="rules", deep="openai")
+    results = {"teams": len(teams), "rules_ms_per_team": await per_team_ms("quick", teams, args.rounds)}
+    for label, latency in (("overhead", 0.0), ("remote", args.latency)):
+        llm.providers["openai"] = fake_provider(make_app(latency=latency))
+        rounds = args.rounds if latency == 0 else 1
+        results[f"openai_{label}_ms_per_team"] = await per_team_ms("deep", teams, rounds)
+    results["fake_latency_s"] = args.latency
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50, help="passes over the corpus per timing")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated remote model latency in seconds")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"corpus: {results['teams']} teams")
+    print(f"rules provider:               {results['rules_ms_per_team']:>9.3f} ms/team")
+    print(f"openai via fake, no latency:  {results['openai_overhead_ms_per_team']:>9.3f} ms/team")
+    print(f"openai via fake, {args.latency:.2f}s model: {results['openai_remote_ms_per_team']:>9.3f} ms/team")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Throughput of the Showdown team parser against the original implementation.
+
+Parses a corpus of real tournament pastes with both the original dict-based
+parser from services/llm.py and services/showdown, and reports pastes/s.
+"cold" clears the parser's table of already-seen lines before every paste.
+
+    cd backend && python -m benchmarks.bench_showdown_parser [--rounds N] [--json]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from services import showdown
+from services.showdown import parse_showdown_team
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pastes"
+
+def legacy_parse_showdown_team(team_text: str) -> List[Dict]:
+    """The original services.llm parser, kept verbatim as the baseline."""
+    pokemon_list = []
+    current_pokemon = {}
+    
+    lines = team_text.strip().split('\n')
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+            
+        # New Pokemon (starts with name and optional @item)
+        if not line.startswith(' ') and not line.startswith('-') and not line.startswith('EVs:') and not line.startswith('IVs:') and not line.startswith('Ability:') and not line.startswith('Nature') and not line.startswith('Level:') and not line.startswith('Tera Type:'):
+            # Save previous Pokemon if exists
+            if current_pokemon:
+                pokemon_list.append(current_pokemon)
+                current_pokemon = {}
+            
+            # Parse new Pokemon line
+            parts = line.split(' @ ')
+            name = parts[0].strip()
+            item = parts[1].strip() if len(parts) > 1 else None
+            
+            current_pokemon = {
+                'name': name,
+                'item': item,
+                'ability': None,
+                'nature': None,
+                'level': None,
+                'tera_type': None,
+                'evs': {},
+                'ivs': {},
+                'moves': []
+            }
+        
+        # Ability
+        elif line.startswith('Ability:'):
+            current_pokemon['ability'] = line.replace('Ability:', '').strip()
+        
+        # Level
+        elif line.startswith('Level:'):
+            level_text = line.replace('Level:', '').strip()
+            try:
+                current_pokemon['level'] = int(level_text)
+            except ValueError:
+                current_pokemon['level'] = None
+        
+        # Tera Type
+        elif line.startswith('Tera Type:'):
+            current_pokemon['tera_type'] = line.replace('Tera Type:', '').strip()
+        
+        # Nature
+        elif line.startswith('Nature'):
+            current_pokemon['nature'] = line.replace('Nature', '').strip()
+        
+        # EVs
+        elif line.startswith('EVs:'):
+            ev_text = line.replace('EVs:', '').strip()
+            evs = {}
+            for ev_part in ev_text.split('/'):
+                ev_part = ev_part.strip()
+                if ' ' in ev_part:
+                    # Extract the number from strings like "252 HP" or "4 SpD"
+                    parts = ev_part.split()
+                    if len(parts) >= 2:
+                        try:
+                            value = int(parts[0])
+                            stat = ' '.join(parts[1:])  # Handle multi-word stats like "Sp. Atk"
+                            evs[stat] = value
+                        except ValueError:
+                            # Skip invalid EV entries
+                            continue
+            current_pokemon['evs'] = evs
+        
+        # IVs (can appear after moves)
+        elif line.startswith('IVs:'):
+            iv_text = line.replace('IVs:', '').strip()
+            ivs = {}
+            for iv_part in iv_text.split('/'):
+                iv_part = iv_part.strip()
+                if ' ' in iv_part:
+                    # Extract the number from strings like "31 HP" or "0 SpD"
+                    parts = iv_part.split()
+                    if len(parts) >= 2:
+                        try:
+                            value = int(parts[0])
+                            stat = ' '.join(parts[1:])  # Handle multi-word stats like "Sp. Atk"
+                            ivs[stat] = value
+                        except ValueError:
+                            # Skip invalid IV entries
+                            continue
+            current_pokemon['ivs'] = ivs
+        
+        # Moves
+        elif line.startswith('-'):
+            move = line.replace('-', '').strip()
+            current_pokemon['moves'].append(move)
+    
+    # Add the last Pokemon
+    if current_pokemon:
+        pokemon_list.append(current_pokemon)
+    
+    return pokemon_list
+
+def load_corpus() -> List[str]:
+    return [path.read_text() for path in sorted(FIXTURES.glob("*.txt"))]
+
+def throughput(fn, corpus: List[str], rounds: int) -> float:
+    """Best-of-three pastes parsed per second."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn(corpus)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) * rounds / best
+
+def parse_cold(corpus: List[str]) -> None:
+    for text in corpus:
+        showdown._lines.clear()
+        parse_showdown_team(text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000, help="passes over the corpus per timing round")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    
+    corpus = load_corpus()
+    results = {
+        "pastes": len(corpus),
+        "pokemon": sum(len(parse_showdown_team(text)) for text in corpus),
+        "legacy_pastes_per_s": throughput(lambda texts: [legacy_parse_showdown_team(t) for t in texts], corpus, args.rounds),
+        "showdown_pastes_per_s": throughput(lambda texts: [parse_showdown_team(t) for t in texts], corpus, args.rounds),
+        "showdown_cold_pastes_per_s": throughput(parse_cold, corpus, args.rounds),
+    }
+    results["speedup"] = results["showdown_pastes_per_s"] / results["legacy_pastes_per_s"]
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"corpus: {results['pastes']} pastes, {results['pokemon']} Pokemon")
+    print(f"legacy parser:     {results['legacy_pastes_per_s']:>10.0f} pastes/s")
+    print(f"showdown parser:   {results['showdown_pastes_per_s']:>10.0f} pastes/s  ({results['speedup']:.1f}x)")
+    print(f"showdown (cold):   {results['showdown_cold_pastes_per_s']:>10.0f} pastes/s")
+
+if __name__ == "__main__":
+    main()
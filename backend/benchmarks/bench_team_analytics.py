@@ -0,0 +1,55 @@
+"""
+Latency of the local team analytics engine.
+
+Runs services/analytics over the tournament paste corpus one team at a time
+and as a single batch, and reports microseconds per team.
+
+    cd backend && python -m benchmarks.bench_team_analytics [--rounds N] [--json]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List
+
+from services.analytics import analyze_teams, team_stats
+from services.showdown import ShowdownPokemon, parse_showdown_team
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pastes"
+
+def load_teams() -> List[List[ShowdownPokemon]]:
+    return [parse_showdown_team(path.read_text()) for path in sorted(FIXTURES.glob("*.txt"))]
+
+def per_team_us(fn, teams, rounds: int) -> float:
+    """Best-of-three microseconds per team."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn(teams)
+        best = min(best, time.perf_counter() - start)
+    return best / (len(teams) * rounds) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=500, help="passes over the corpus per timing round")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    
+    teams = load_teams()
+    results = {
+        "teams": len(teams),
+        "unknown_pokemon": sum(len(stats["unknown"]) for stats in analyze_teams(teams)),
+        "single_us_per_team": per_team_us(lambda ts: [team_stats(t) for t in ts], teams, args.rounds),
+        "batch_us_per_team": per_team_us(analyze_teams, teams, args.rounds),
+    }
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"corpus: {results['teams']} teams, {results['unknown_pokemon']} Pokemon without data")
+    print(f"one team at a time: {results['single_us_per_team']:>8.1f} us/team")
+    print(f"batched:            {results['batch_us_per_team']:>8.1f} us/team")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
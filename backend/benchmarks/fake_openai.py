@@ -0,0 +1,117 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions, plain or streamed, with a valid team
+analysis after a configurable delay, and reports token usage like the real
+API. The service, benchmarks and smoke runs can then work fully offline.
+
+    cd backend && uvicorn benchmarks.fake_openai:app --port 8100
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn main:app
+
+In-process, use fake_provider() to get a ChatProvider wired to it through
+httpx's ASGI transport, with no socket at all.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from services.providers import ChatProvider
+from services.tokens import count_message_tokens, count_tokens
+
+# Seconds before the answer starts, and between streamed chunks
+FAKE_OPENAI_LATENCY = float(os.getenv("FAKE_OPENAI_LATENCY", "0.5"))
+FAKE_OPENAI_CHUNK_DELAY = float(os.getenv("FAKE_OPENAI_CHUNK_DELAY", "0.01"))
+CHUNK_SIZE = 16
+
+ANALYSIS = {
+    "grade": "B",
+    "strengths": [{"point": "Solid speed control", "reasoning": "Tailwind lets the slower attackers move first."}],
+    "weaknesses": [{"point": "Shared Ice weakness", "reasoning": "Several members take super effective damage from Icy Wind."}],
+    "threats": [{"point": "Urshifu-Rapid-Strike", "reasoning": "Surging Strikes ignores Protect chip and hits most of the team hard."}],
+    "suggestions": [{"type": "item_change", "description": "Move Covert Cloak to the Tailwind setter.", "priority": "medium"}],
+}
+_FIELDS_REQUEST = re.compile(r"Respond with only a JSON object with these fields.*?: (.+)$")
+_PACKED_REQUEST = re.compile(r"Please analyze these (\d+) VGC teams")
+
+
+def _answer(messages: List[dict]) -> str:
+    """The analysis JSON the real model would be asked for by services/llm."""
+    last = messages[-1]["content"]
+    fields = _FIELDS_REQUEST.search(last)
+    if fields:
+        return json.dumps({f.strip(): ANALYSIS[f.strip()] for f in fields.group(1).split(",") if f.strip() in ANALYSIS})
+    packed = _PACKED_REQUEST.search(last)
+    if packed:
+        return json.dumps({"teams": [ANALYSIS] * int(packed.group(1))})
+    return json.dumps(ANALYSIS)
+
+def make_app(latency: float = FAKE_OPENAI_LATENCY, chunk_delay: float = FAKE_OPENAI_CHUNK_DELAY) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "gpt-4")
+        content = _answer(body["messages"])
+        usage = {
+            "prompt_tokens": count_message_tokens(body["messages"], model),
+            "completion_tokens": count_tokens(content, model),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        await asyncio.sleep(latency)
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, with_usage: bool = False) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if with_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if with_usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(content), CHUNK_SIZE):
+                await asyncio.sleep(chunk_delay)
+                yield chunk({"content": content[start:start + CHUNK_SIZE]})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk({}, with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+app = make_app()
+
+def fake_provider(fake_app: FastAPI = app, name: str = "openai", model: str = "gpt-4", timeout: float = 60) -> ChatProvider:
+    """A ChatProvider that talks to ``fake_app`` in-process."""
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app), base_url="http://fake-openai")
+    return ChatProvider(name, model, "fake", "http://fake-openai/v1", timeout, http_client=http_client)
@@ -0,0 +1,119 @@
+"""
+Local stand-ins for pikalytics.com and pokepast.es that replay recorded pages.
+
+Pikalytics serves fixtures/pikalytics/home.html at / and the saved pokedex
+pages at /pokedex/<format>/<name> (other names get one of the saved pages,
+so any Pokemon parses). Pokepaste serves each saved paste at /<id> and its
+CRLF text export at /<id>/raw, with an ETag so revalidation answers 304.
+Both wait a configurable delay before answering.
+
+install() points the backend's shared HTTP client at them in-process; any
+other host gets a 502, so nothing leaves the machine.
+"""
+import asyncio
+import hashlib
+import os
+from itertools import cycle
+from pathlib import Path
+from typing import Dict
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from services import http_client
+from services.reference import reference, to_id
+
+# Seconds before each recorded page is served
+FAKE_UPSTREAM_LATENCY = float(os.getenv("FAKE_UPSTREAM_LATENCY", "0.05"))
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PIKALYTICS_HOSTS = ("www.pikalytics.com", "pikalytics.com")
+POKEPASTE_HOSTS = ("pokepast.es", "www.pokepast.es")
+
+def paste_ids() -> Dict[str, str]:
+    """Paste id (alphanumeric, like real ones) -> fixture name."""
+    return {path.stem.replace("_", ""): path.stem for path in sorted((FIXTURES / "pokepaste").glob("*.html"))}
+
+def paste_urls():
+    return [f"https://pokepast.es/{paste_id}" for paste_id in paste_ids()]
+
+def _etag(content: bytes) -> str:
+    return '"' + hashlib.sha1(content).hexdigest() + '"'
+
+def _page(request: Request, content: bytes, media_type: str) -> Response:
+    etag = _etag(content)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content, media_type=media_type, headers={"ETag": etag})
+
+
+def make_pikalytics_app(latency: float = FAKE_UPSTREAM_LATENCY) -> FastAPI:
+    app = FastAPI(title="fake-pikalytics")
+    app.state.requests = 0
+    home = (FIXTURES / "pikalytics" / "home.html").read_bytes()
+    pokedex = {to_id(path.stem[len("pokedex_"):]): path.read_bytes() for path in (FIXTURES / "pikalytics").glob("pokedex_*.html")}
+    fallback = cycle(sorted(pokedex))
+
+    @app.get("/")
+    async def landing():
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        return Response(home, media_type="text/html")
+
+    @app.get("/pokedex/{format}/{name}")
+    async def pokedex_page(format: str, name: str):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        page = pokedex.get(to_id(name))
+        if page is None:
+            # Like the real site: unknown names 404, other species reuse a fixture page
+            if reference.species(name) is None:
+                return Response(status_code=404)
+            page = pokedex[next(fallback)]
+        return Response(page, media_type="text/html")
+
+    return app
+
+def make_pokepaste_app(latency: float = FAKE_UPSTREAM_LATENCY) -> FastAPI:
+    app = FastAPI(title="fake-pokepaste")
+    app.state.requests = 0
+    pages = {paste_id: (FIXTURES / "pokepaste" / f"{name}.html").read_bytes() for paste_id, name in paste_ids().items()}
+    # pokepast.es serves /raw with CRLF line endings
+    raws = {
+        paste_id: (FIXTURES / "pastes" / f"{name}.txt").read_text().replace("\n", "\r\n").encode()
+        for paste_id, name in paste_ids().items()
+    }
+
+    @app.get("/{paste_id}")
+    async def paste_page(paste_id: str, request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        if paste_id not in pages:
+            return Response(status_code=404)
+        return _page(request, pages[paste_id], "text/html")
+
+    @app.get("/{paste_id}/raw")
+    async def paste_raw(paste_id: str, request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        if paste_id not in raws:
+            return Response(status_code=404)
+        return _page(request, raws[paste_id], "text/plain")
+
+    return app
+
+
+def create_client(pikalytics: FastAPI, pokepaste: FastAPI) -> httpx.AsyncClient:
+    """A client with the backend's settings that routes upstream hosts to the stand-ins."""
+    mounts = {}
+    for hosts, app in ((PIKALYTICS_HOSTS, pikalytics), (POKEPASTE_HOSTS, pokepaste)):
+        transport = httpx.ASGITransport(app=app)
+        mounts.update({f"all://{host}": transport for host in hosts})
+    offline = httpx.MockTransport(lambda request: httpx.Response(502, text=f"{request.url.host} is not stubbed"))
+    return http_client.create_client(transport=offline, mounts=mounts)
+
+def install(latency: float = FAKE_UPSTREAM_LATENCY):
+    """Route the shared HTTP client to fresh stand-ins; returns (pikalytics app, pokepaste app)."""
+    pikalytics, pokepaste = make_pikalytics_app(latency), make_pokepaste_app(latency)
+    http_client._client = create_client(pikalytics, pokepaste)
+    return pikalytics, pokepaste
@@ -0,0 +1,138 @@
+"""
+Run the whole benchmark suite and save one JSON report, to compare commits.
+
+Each benchmark runs in its own process with --json; the report records the
+git commit, Python version and machine next to the results. With --compare
+every timing is checked against an earlier report and changes larger than
+--threshold percent are listed; the exit status is 1 if any got slower.
+
+    cd backend && python -m benchmarks.run_all [--quick] [--output FILE] [--compare BASELINE] [--threshold PCT]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# Benchmark module -> arguments for a --quick run
+SUITE = {
+    "bench_showdown_parser": ["--rounds", "200"],
+    "bench_team_analytics": ["--rounds", "50"],
+    "bench_pikalytics_parsers": ["--repeat", "3"],
+    "bench_pokepaste_extract": ["--repeat", "20"],
+    "bench_providers": ["--rounds", "5", "--latency", "0.1"],
+    "bench_load": ["--requests", "50", "--concurrency", "8", "--llm-latency", "0.1"],
+}
+
+# Numeric result keys that are timings or rates, by which direction is better
+LOWER_IS_BETTER = ("_ms", "_us", "ms_per_", "us_per_")
+HIGHER_IS_BETTER = ("_per_s", "rps")
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_benchmark(module: str, args: List[str]):
+    # Nothing in the suite should write the app's databases
+    env = {"META_HISTORY_PATH": "", "TEAMS_SQLITE_PATH": ":memory:", "OPENAI_API_KEY": "fake", **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args, "--json"],
+        cwd=BACKEND, capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"}
+    return json.loads(result.stdout)
+
+def run_suite(modules: List[str], quick: bool) -> dict:
+    results = {}
+    for module in modules:
+        print(f"running {module}...", file=sys.stderr)
+        results[module] = run_benchmark(module, SUITE[module] if quick else [])
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": time.time(),
+        "quick": quick,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+
+def _direction(key: str) -> int:
+    """1 if higher is better, -1 if lower is better, 0 if the value isn't a timing."""
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER) or key.startswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    """Timing values by path; list items are named by their string fields (page, scenario, ...)."""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            path = f"{prefix}.{key}" if prefix else key
+            if isinstance(item, (int, float)) and not isinstance(item, bool):
+                if _direction(key):
+                    flat[path] = item
+            else:
+                flat.update(flatten(item, path))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = "/".join(str(v) for v in item.values() if isinstance(v, str)) if isinstance(item, dict) else ""
+            flat.update(flatten(item, f"{prefix}[{label or i}]"))
+    return flat
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """Timings that changed by more than ``threshold`` percent, worst regressions first."""
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    changes = []
+    for path in old.keys() & new.keys():
+        if not old[path]:
+            continue
+        change = (new[path] - old[path]) / old[path] * 100
+        if abs(change) >= threshold:
+            better = change * _direction(path.rsplit(".", 1)[-1]) > 0
+            changes.append({"metric": path, "baseline": old[path], "current": new[path],
+                            "change_pct": round(change, 1), "regression": not better})
+    return sorted(changes, key=lambda c: (not c["regression"], -abs(c["change_pct"])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer rounds per benchmark, for a fast check")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITE), metavar="MODULE", help="run only these benchmarks")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument("--compare", help="an earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change worth reporting")
+    args = parser.parse_args()
+
+    report = run_suite(args.only or list(SUITE), args.quick)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        changes = compare(baseline, report, args.threshold)
+        print(f"against {(baseline.get('commit') or 'unknown')[:10]}: {len(changes)} timings changed by {args.threshold:g}% or more",
+              file=sys.stderr)
+        for c in changes:
+            label = "SLOWER" if c["regression"] else "faster"
+            print(f"  {label:<7}{c['change_pct']:>+8.1f}%  {c['metric']}  ({c['baseline']:.4g} -> {c['current']:.4g})", file=sys.stderr)
+        if any(c["regression"] for c in changes):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import analyze, meta, sets, teams
+from routers import analyze, meta, metrics, sets, teams
+from services import batch, history, http_client, llm, pikalytics, tokens
+from services.metrics import MetricsMiddleware, ProfilerMiddleware
+from services.meta_scheduler import scheduler
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start_client()
+    history.open_history()
+    # Token counting runs on the event loop, so load encodings before requests need them
+    await tokens.warm_encodings(p.model for p in llm.providers.values() if p.kind == "chat")
+    # Keep meta snapshots fresh in the background; /meta reads them from memory
+    scheduler.start()
+    # Warm the sets cache once the first snapshot exists, without blocking startup
+    prefetch = None
+    if pikalytics.SETS_PREFETCH_TOP_N > 0:
+        prefetch = asyncio.create_task(_prefetch_sets())
+    yield
+    if prefetch is not None:
+        prefetch.cancel()
+    batch.cancel_jobs()
+    await scheduler.stop()
+    history.close_history()
+    await http_client.close_client()
+
+async def _prefetch_sets():
+    if scheduler.formats:
+        await scheduler.wait_ready()
+    await pikalytics.prefetch_top_sets(pikalytics.SETS_PREFETCH_FORMAT)
+
+app = FastAPI(lifespan=lifespan)
+# Middleware added last runs outermost, so request timings include profiling overhead
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(analyze.router)
 app.include_router(meta.router)
+app.include_router(metrics.router)
 app.include_router(sets.router)
-app.include_router(teams.router) 
\ No newline at end of file
+app.include_router(teams.router)
\ No newline at end of file
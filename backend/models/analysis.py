@@ -0,0 +1,55 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Iterable, List, Literal
+
+class AnalysisPoint(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    point: str
+    reasoning: str
+
+class Suggestion(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["move_change", "item_change", "ability_change", "pokemon_swap"]
+    description: str
+    priority: Literal["high", "medium", "low"]
+
+class TeamAnalysis(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    grade: Literal["A", "B", "C", "D", "F"]
+    strengths: List[AnalysisPoint]
+    weaknesses: List[AnalysisPoint]
+    threats: List[AnalysisPoint]
+    suggestions: List[Suggestion]
+
+class PackedAnalysis(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    teams: List[TeamAnalysis]
+
+# Model each top-level analysis field is validated against, item by item for lists
+SECTION_MODELS = {
+    "strengths": AnalysisPoint,
+    "weaknesses": AnalysisPoint,
+    "threats": AnalysisPoint,
+    "suggestions": Suggestion,
+}
+
+def response_format(model: type, name: str) -> dict:
+    """OpenAI structured-output response_format for a Pydantic model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": model.model_json_schema(), "strict": True},
+    }
+
+def sections_response_format(sections: Iterable[str]) -> dict:
+    """response_format for a TeamAnalysis with only the given top-level fields."""
+    schema = TeamAnalysis.model_json_schema()
+    sections = [s for s in schema["required"] if s in set(sections)]
+    schema["properties"] = {s: schema["properties"][s] for s in sections}
+    schema["required"] = sections
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "team_analysis_sections", "schema": schema, "strict": True},
+    }
@@ -9,7 +9,15 @@ class PokemonSet(BaseModel):
     nature: Optional[str]
     evs: Optional[dict]
     ivs: Optional[dict]
+    level: Optional[int] = None
+    tera_type: Optional[str] = None
 
 class Team(BaseModel):
     name: str
-    pokemon: List[PokemonSet] 
\ No newline at end of file
+    pokemon: List[PokemonSet] 
+
+class SavedTeam(Team):
+    id: Optional[str] = None
+    user_id: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
\ No newline at end of file
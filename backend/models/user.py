@@ -1,5 +1,7 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class User(BaseModel):
     id: str
-    email: str 
\ No newline at end of file
+    # Phone and anonymous sign-ins have no email
+    email: Optional[str] = None
\ No newline at end of file
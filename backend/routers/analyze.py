@@ -1,14 +1,104 @@
-from fastapi import APIRouter, Body
-from pydantic import BaseModel
-from services.llm import analyze_team_with_llm
+import json
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from routers.responses import upstream_response
+from services import batch
+from services.llm import analyze_team_with_llm, get_parse_stats, get_usage_totals, stream_team_analysis
+from services.resilience import error_fields
+from services.showdown import parse_showdown_team
+from services.threats import THREATS_TOP_N, get_threat_table, threat_matrix
 
 router = APIRouter()
 
+# "quick" grades come from the offline analyzer, "deep" from the remote model
+AnalysisMode = Literal["quick", "deep"]
+
 class AnalyzeRequest(BaseModel):
     team: str
+    mode: Optional[AnalysisMode] = None
+
+class BatchAnalyzeRequest(BaseModel):
+    teams: List[str] = Field(default_factory=list, description="Showdown-format pastes")
+    urls: List[str] = Field(default_factory=list, description="Pokepaste URLs")
+    pack: int = Field(default=1, ge=1, description="Teams per LLM request; higher is cheaper but slower")
+    mode: Optional[AnalysisMode] = None
+
+class ThreatsRequest(BaseModel):
+    team: str
+    format: str = "ss"
+    top_n: int = Field(default=THREATS_TOP_N, ge=1, le=50)
 
 @router.post("/analyze-team")
-def analyze_team(request: AnalyzeRequest):
+async def analyze_team(request: AnalyzeRequest):
     """Analyze a Pokemon team using LLM."""
-    analysis = analyze_team_with_llm(request.team)
-    return analysis 
\ No newline at end of file
+    analysis = await analyze_team_with_llm(request.team, request.mode)
+    return upstream_response(analysis)
+
+@router.post("/analyze-team/stream")
+async def analyze_team_stream(request: AnalyzeRequest):
+    """Analyze a Pokemon team, streaming the analysis as server-sent events."""
+    return _event_stream(stream_team_analysis(request.team, request.mode))
+
+def _event_stream(source) -> StreamingResponse:
+    events = (
+        f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        async for event, data in source
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/analyze-team/usage")
+async def analysis_usage():
+    """Prompt/completion tokens and latency of analysis requests since startup, per endpoint tier."""
+    return get_usage_totals()
+
+@router.get("/analyze-team/parse-stats")
+async def analysis_parse_stats():
+    """How often model output needed repair, which fields failed validation and what retries recovered."""
+    return get_parse_stats()
+
+@router.post("/analyze-team/batch")
+async def analyze_team_batch(request: BatchAnalyzeRequest):
+    """Start analyzing many teams at once; poll or stream the returned job for results."""
+    try:
+        job = await batch.create_job(request.teams, request.urls, request.pack, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.progress(include_results=False)
+
+@router.get("/analyze-team/batch/{job_id}")
+async def get_batch_job(job_id: str, results: bool = Query(default=True, description="Include per-team results")):
+    """Progress of a batch job, with results for the teams finished so far."""
+    job = await batch.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.progress(include_results=results)
+
+@router.get("/analyze-team/batch/{job_id}/stream")
+async def stream_batch_job(job_id: str, start: int = Query(default=0, ge=0, description="Index of the first event to send")):
+    """Stream a batch job's results as server-sent events, replaying earlier ones first."""
+    job = await batch.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return _event_stream(job.follow(start))
+
+@router.post("/analyze-team/threats")
+async def analyze_team_threats(request: ThreatsRequest):
+    """Score a team against the top-N meta Pokemon and their common sets."""
+    pokemon_list = parse_showdown_team(request.team)
+    if not pokemon_list:
+        return {"error": "Invalid team format. Please use Pokemon Showdown format."}
+    
+    try:
+        table = await get_threat_table(request.format, request.top_n)
+    except Exception as e:
+        return upstream_response({"error": f"Failed to load meta threats: {str(e)}", **error_fields(e), "format": request.format})
+    
+    return threat_matrix(pokemon_list, table)
\ No newline at end of file
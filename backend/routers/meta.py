@@ -1,14 +1,74 @@
+import asyncio
+import time
 from fastapi import APIRouter, Query
-from services.pikalytics import get_usage_stats, scrape_pikalytics_meta
+from routers.responses import upstream_response
+from services import history
+from services.meta_scheduler import scheduler
+from services.pikalytics import get_usage_stats, normalize_pokemon_name, scrape_pikalytics_meta
 
 router = APIRouter()
 
+HISTORY_DISABLED = {"error": "Meta history is disabled (META_HISTORY_PATH is empty)"}
+
+def _with_snapshot_status(data: dict, format: str) -> dict:
+    status = scheduler.status(format)
+    if status is None or "error" in data:
+        return data
+    return {**data, "snapshot": status}
+
 @router.get("/meta")
-def get_meta(format: str = Query(default="ss", description="VGC format to analyze")):
+async def get_meta(format: str = Query(default="ss", description="VGC format to analyze")):
     """Get meta analysis data for the specified format."""
-    return get_usage_stats(format)
+    return upstream_response(_with_snapshot_status(await get_usage_stats(format), format))
 
 @router.get("/meta/raw")
-def get_raw_meta(format: str = Query(default="ss", description="VGC format to analyze")):
+async def get_raw_meta(format: str = Query(default="ss", description="VGC format to analyze")):
     """Get raw meta data from Pikalytics."""
-    return scrape_pikalytics_meta(format) 
\ No newline at end of file
+    return upstream_response(_with_snapshot_status(await scrape_pikalytics_meta(format), format))
+
+@router.get("/meta/history")
+async def get_meta_history(
+    pokemon: str = Query(..., description="Pokemon to chart"),
+    format: str = Query(default="ss", description="VGC format to analyze"),
+    days: float = Query(default=30, gt=0, description="How far back to look"),
+    window: int = Query(default=4, ge=1, le=100, description="Snapshots per moving average")
+):
+    """Get recorded usage over time for one Pokemon, with a moving average."""
+    if history.meta_history is None:
+        return HISTORY_DISABLED
+    
+    since = time.time() - days * 86400
+    points = await asyncio.to_thread(
+        history.meta_history.usage_history, format, normalize_pokemon_name(pokemon), since, None, window
+    )
+    return {
+        "format": format,
+        "pokemon": pokemon,
+        "window": window,
+        "points": points
+    }
+
+@router.get("/meta/diff")
+async def get_meta_diff(
+    format: str = Query(default="ss", description="VGC format to analyze"),
+    days: float = Query(default=7, gt=0, description="Compare against the snapshot this many days ago"),
+    limit: int = Query(default=10, ge=1, le=100, description="Risers and fallers to return")
+):
+    """Get the biggest usage risers and fallers between two recorded snapshots."""
+    if history.meta_history is None:
+        return HISTORY_DISABLED
+    
+    diff = await asyncio.to_thread(history.meta_history.usage_diff, format, time.time() - days * 86400)
+    if diff is None:
+        return {"error": f"No recorded usage history for {format}", "format": format}
+    
+    changes = diff["pokemon"]
+    return {
+        "format": format,
+        "from": diff["from"],
+        "to": diff["to"],
+        "risers": [p for p in changes if p["delta"] > 0][:limit],
+        "fallers": [p for p in reversed(changes) if p["delta"] < 0][:limit],
+        "new": [p for p in changes if p["usage_before"] is None],
+        "dropped": [p for p in changes if p["usage_after"] is None]
+    }
\ No newline at end of file
@@ -0,0 +1,11 @@
+from fastapi.responses import JSONResponse
+
+def upstream_response(data: dict):
+    """
+    Return ``data`` as is, or with its HTTP status when it is an upstream
+    error payload (one carrying "status", and "retry_after" for 503s).
+    """
+    if "error" not in data or "status" not in data:
+        return data
+    headers = {"Retry-After": str(data["retry_after"])} if "retry_after" in data else None
+    return JSONResponse(data, status_code=data["status"], headers=headers)
\ No newline at end of file
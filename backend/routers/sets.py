@@ -1,9 +1,81 @@
+import asyncio
+import time
 from fastapi import APIRouter, Query
-from services.pikalytics import get_pokemon_sets
+from pydantic import BaseModel, Field
+from typing import List
+from routers.responses import upstream_response
+from services import history
+from services.pikalytics import get_pokemon_sets, normalize_pokemon_name
+from services.resilience import error_fields
 
 router = APIRouter()
 
+class BatchSetsRequest(BaseModel):
+    pokemon: List[str] = Field(..., min_length=1, max_length=24)
+    format: str = "ss"
+
+@router.post("/sets/batch")
+async def get_sets_batch(request: BatchSetsRequest):
+    """Get common sets for several Pokemon (e.g. a whole team) in one request."""
+    # Dedupe by normalized name, keeping the first spelling we were given
+    names = {}
+    for name in request.pokemon:
+        if name.strip():
+            names.setdefault(normalize_pokemon_name(name), name)
+    
+    results = await asyncio.gather(
+        *(get_pokemon_sets(name, request.format) for name in names.values()),
+        return_exceptions=True
+    )
+    
+    sets = {}
+    failed = []
+    for name, result in zip(names.values(), results):
+        if isinstance(result, Exception):
+            result = {
+                "error": f"Failed to get sets for {name}: {str(result)}",
+                **error_fields(result),
+                "pokemon": name,
+                "format": request.format,
+                "sets": [],
+                "total_sets": 0
+            }
+        if "error" in result:
+            failed.append(name)
+        sets[name] = result
+    
+    response = {
+        "format": request.format,
+        "sets": sets,
+        "failed": failed
+    }
+    if len(failed) == len(sets):
+        # Nothing to show; report the upstream failure rather than a 200
+        error = sets[failed[0]]
+        return upstream_response({**response, **{k: error[k] for k in ("error", "status", "retry_after") if k in error}})
+    return response
+
 @router.get("/sets/{pokemon}")
-def get_sets(pokemon: str, format: str = Query(default="ss", description="VGC format to analyze")):
+async def get_sets(pokemon: str, format: str = Query(default="ss", description="VGC format to analyze")):
     """Get common sets for a specific Pokemon."""
-    return get_pokemon_sets(pokemon, format) 
\ No newline at end of file
+    return upstream_response(await get_pokemon_sets(pokemon, format))
+
+@router.get("/sets/{pokemon}/history")
+async def get_sets_history(
+    pokemon: str,
+    format: str = Query(default="ss", description="VGC format to analyze"),
+    days: float = Query(default=90, gt=0, description="How far back to look"),
+    limit: int = Query(default=20, ge=1, le=200, description="Maximum recordings to return")
+):
+    """Get previously recorded sets for a Pokemon, newest first."""
+    if history.meta_history is None:
+        return {"error": "Meta history is disabled (META_HISTORY_PATH is empty)"}
+    
+    recordings = await asyncio.to_thread(
+        history.meta_history.sets_history, format, normalize_pokemon_name(pokemon), time.time() - days * 86400, limit
+    )
+    return {
+        "pokemon": pokemon,
+        "format": format,
+        "history": recordings
+    }
\ No newline at end of file
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import httpx
-from bs4 import BeautifulSoup
-import re
+from models.team import SavedTeam
+from models.user import User
+from services.analytics import team_stats
+from services.auth import get_current_user
+from services.showdown import parse_showdown_team
+from services.pokepaste import fetch_pokepaste_team, is_valid_pokepaste_url
+from services.resilience import UpstreamUnavailable, error_fields
+from services.supabase import TEAMS_PAGE_SIZE, TeamConflictError, TeamStoreError, get_team_repository
 
 router = APIRouter()
 
@@ -14,6 +22,12 @@ class PokepasteResponse(BaseModel):
     success: bool
     message: str
 
+class TeamStatsRequest(BaseModel):
+    team: str
+
+class SaveTeamsRequest(BaseModel):
+    teams: List[SavedTeam] = Field(..., min_length=1, max_length=100)
+
 @router.post("/fetch-pokepaste", response_model=PokepasteResponse)
 async def fetch_pokepaste(request: PokepasteRequest):
     """Fetch team data from a Pokepaste URL"""
@@ -22,16 +36,8 @@ async def fetch_pokepaste(request: PokepasteRequest):
         if not is_valid_pokepaste_url(request.url):
             raise HTTPException(status_code=400, detail="Invalid Pokepaste URL format")
         
-        # Fetch the Pokepaste page
-        async with httpx.AsyncClient() as client:
-            response = await client.get(request.url)
-            response.raise_for_status()
-            
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract team data from various possible locations
-        team_data = extract_team_data(soup)
+        # Fetch (or reuse the cached copy of) the Pokepaste team
+        team_data = await fetch_pokepaste_team(request.url)
         
         if not team_data:
             raise HTTPException(status_code=404, detail="Could not find team data in Pokepaste")
@@ -42,94 +48,77 @@ async def fetch_pokepaste(request: PokepasteRequest):
             message="Team data fetched successfully"
         )
         
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(error_fields(e)["retry_after"])})
+    except (httpx.TimeoutException, asyncio.TimeoutError):
+        raise HTTPException(status_code=504, detail="Timed out fetching Pokepaste")
     except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Failed to fetch Pokepaste: {e.response.status_code}")
+        # Pass on 4xx (e.g. a deleted paste); upstream 5xx/429 are our 502/503
+        status = e.response.status_code
+        status = 502 if status >= 500 else error_fields(e)["status"] if status == 429 else status
+        raise HTTPException(status_code=status, detail=f"Failed to fetch Pokepaste: {e.response.status_code}")
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch Pokepaste: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching team data: {str(e)}")
 
-def is_valid_pokepaste_url(url: str) -> bool:
-    """Validate if the URL is a valid Pokepaste URL"""
+@router.post("/team/stats")
+async def get_team_stats(request: TeamStatsRequest):
+    """Type coverage, shared weaknesses and speed tiers for a Showdown-format team, computed locally."""
+    pokemon_list = parse_showdown_team(request.team)
+    if not pokemon_list:
+        return {"error": "Invalid team format. Please use Pokemon Showdown format."}
+    
+    stats = team_stats(pokemon_list)
+    if not stats["pokemon"]:
+        return {"error": f"No data for any of: {', '.join(stats['unknown'])}"}
+    return stats
+
+@router.post("/teams")
+async def save_teams(request: SaveTeamsRequest, user: User = Depends(get_current_user)):
+    """Save teams for the signed-in user; teams that carry an id are updated in place."""
     try:
-        import re
-        pokepaste_pattern = r'https?://(www\.)?(pokepast\.es|pokepaste\.es|pokepaste\.net)/[a-zA-Z0-9]+'
-        return bool(re.match(pokepaste_pattern, url))
-    except:
-        return False
+        saved = await get_team_repository().save_teams(user.id, request.teams)
+    except TeamConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except TeamStoreError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"teams": saved}
 
-def extract_team_data(soup) -> str:
-    """Extract Pokemon team data from BeautifulSoup object"""
-    # Look for team data in various possible locations
-    team_data = None
-    
-    # Try <pre> tags first (most common) - collect ALL pre tags
-    pre_tags = soup.find_all('pre')
-    if pre_tags:
-        # Collect all pre tags that contain Pokemon data
-        pokemon_sections = []
-        for pre in pre_tags:
-            text = pre.get_text().strip()
-            if looks_like_pokemon_team(text):
-                pokemon_sections.append(text)
-        
-        if pokemon_sections:
-            # Join all Pokemon sections with double newlines for separation
-            team_data = '\n\n'.join(pokemon_sections)
-    
-    # Try <code> blocks if no <pre> found
-    if not team_data:
-        code_blocks = soup.find_all('code')
-        for code in code_blocks:
-            text = code.get_text().strip()
-            if looks_like_pokemon_team(text):
-                team_data = text
-                break
-    
-    # Try textarea elements
-    if not team_data:
-        textareas = soup.find_all('textarea')
-        for textarea in textareas:
-            text = textarea.get_text().strip() or textarea.get('value', '').strip()
-            if looks_like_pokemon_team(text):
-                team_data = text
-                break
-    
-    if team_data:
-        return clean_team_data(team_data)
-    
-    return None
+@router.get("/teams")
+async def list_teams(
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    limit: int = Query(default=TEAMS_PAGE_SIZE, ge=1, le=100),
+    user: User = Depends(get_current_user)
+):
+    """Get the signed-in user's saved teams, newest first, one page at a time."""
+    try:
+        return await get_team_repository().list_teams(user.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TeamStoreError as e:
+        raise HTTPException(status_code=502, detail=str(e))
 
-def looks_like_pokemon_team(text: str) -> bool:
-    """Check if the text looks like a Pokemon team"""
-    if not text:
-        return False
-        
-    lines = text.split('\n')
-    pokemon_count = 0
-    has_moves = False
-    
-    for line in lines:
-        trimmed = line.strip()
-        if not trimmed:
-            continue
-        
-        # Check for Pokemon name line (not starting with common prefixes)
-        if (not trimmed.startswith(' ') and 
-            not trimmed.startswith('-') and 
-            not trimmed.startswith('EVs:') and 
-            not trimmed.startswith('IVs:') and 
-            not trimmed.startswith('Ability:') and 
-            not trimmed.startswith('Nature') and 
-            not trimmed.startswith('Level:') and 
-            not trimmed.startswith('Tera Type:')):
-            pokemon_count += 1
-        
-        # Check for moves
-        if trimmed.startswith('-'):
-            has_moves = True
-    
-    # A valid team should have at least 1 Pokemon and some moves
-    return pokemon_count >= 1 and has_moves
+@router.get("/teams/{team_id}")
+async def get_team(team_id: str, user: User = Depends(get_current_user)):
+    """Get one of the signed-in user's saved teams."""
+    try:
+        team = await get_team_repository().get_team(user.id, team_id)
+    except TeamStoreError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if team is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return team
 
-def clean_team_data(data: str) -> str:
-    """Clean up the team data"""
-    return data.strip().replace('\r\n', '\n').replace('\r', '\n') 
\ No newline at end of file
+@router.delete("/teams/{team_id}")
+async def delete_team(team_id: str, user: User = Depends(get_current_user)):
+    """Delete one of the signed-in user's saved teams."""
+    try:
+        deleted = await get_team_repository().delete_team(user.id, team_id)
+    except TeamStoreError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return {"deleted": team_id}
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Production entry point: run the API under uvicorn with several worker processes.
+
+Each worker is a separate process with its own event loop, so in-process
+caches would be cold and duplicated per worker. With more than one worker
+this sets SHARED_CACHE_PATH (unless it is already set), so every worker on
+the host shares scraped meta, sets, pastes, analyses and team pages through
+one SQLite file in WAL mode, and only one worker at a time refreshes a
+given key.
+
+Batch jobs run in the worker that accepted them; their progress and events
+go through the same file, so polling or streaming a job works from any
+worker. A job stops if its worker restarts. /metrics, the profiler,
+/analyze-team/usage and /analyze-team/parse-stats are still per process and
+report on the worker that answered.
+
+    cd backend && python serve.py [--workers N] [--host HOST] [--port PORT] [--shared-cache PATH]
+
+The worker count defaults to WEB_CONCURRENCY, then the number of CPUs.
+"""
+import argparse
+import os
+
+import uvicorn
+
+DEFAULT_SHARED_CACHE_PATH = "shared_cache.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--shared-cache", default=os.getenv("SHARED_CACHE_PATH"),
+                        help=f"SQLite file shared by the workers (default with --workers > 1: {DEFAULT_SHARED_CACHE_PATH})")
+    args = parser.parse_args()
+
+    # Workers import the app themselves and read this from the environment
+    shared_cache = args.shared_cache or (DEFAULT_SHARED_CACHE_PATH if args.workers > 1 else None)
+    if shared_cache:
+        os.environ["SHARED_CACHE_PATH"] = os.path.abspath(shared_cache)
+
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+from typing import List, Optional, Sequence
+import numpy as np
+from services.reference import POKEDEX_PATH, load_data, reference, to_id
+from services.showdown import ShowdownPokemon
+
+STAT_ORDER = ("hp", "atk", "def", "spa", "spd", "spe")
+DEFAULT_LEVEL = 50
+
+
+class Pokedex:
+    """The bundled data as NumPy tables, indexed by species/move/nature id."""
+
+    def __init__(self, data: dict):
+        self.types = tuple(data["types"])
+        # For turning boolean masks over types straight into name lists
+        self.type_names = np.array(self.types, dtype=object)
+        self.type_index = {t: i for i, t in enumerate(self.types)}
+        n = len(self.types)
+
+        # chart[attacking type, defending type]; the extra last column is the
+        # "no second type" slot and is always 1.0
+        self.chart = np.ones((n, n + 1), dtype=np.float32)
+        for attacker, row in data["chart"].items():
+            for defender, multiplier in row.items():
+                self.chart[self.type_index[attacker], self.type_index[defender]] = multiplier
+        self.no_type = n
+
+        names = sorted(data["species"])
+        self.species_names = names
+        self.species_index = {to_id(name): i for i, name in enumerate(names)}
+        self.species_types = np.full((len(names), 2), self.no_type, dtype=np.intp)
+        self.base_stats = np.zeros((len(names), 6), dtype=np.int64)
+        for i, name in enumerate(names):
+            types, stats = data["species"][name]
+            for slot, t in enumerate(types):
+                self.species_types[i, slot] = self.type_index[t]
+            self.base_stats[i] = stats
+
+        # Nature multipliers in percent, so stat math stays in integers
+        self.natures = {}
+        for nature, effect in data["natures"].items():
+            row = np.full(6, 100, dtype=np.int64)
+            if effect:
+                row[STAT_ORDER.index(effect[0])] = 110
+                row[STAT_ORDER.index(effect[1])] = 90
+            self.natures[to_id(nature)] = row
+        self.neutral_nature = np.full(6, 100, dtype=np.int64)
+
+        self.moves = {
+            to_id(name): (name, self.type_index[move_type], category, power)
+            for name, (move_type, category, power) in data["moves"].items()
+        }
+
+    def lookup(self, name: str) -> Optional[int]:
+        species = reference.species(name)
+        return self.species_index.get(to_id(species)) if species else None
+
+
+def load_pokedex(path: str = POKEDEX_PATH) -> Pokedex:
+    return Pokedex(load_data(path))
+
+pokedex = load_pokedex()
+
+
+def member_arrays(members: Sequence[ShowdownPokemon], rows: Sequence[int]) -> dict:
+    """Stat, type and move tables for many Pokemon at once (one row each)."""
+    dex = pokedex
+    n = len(members)
+    rows = np.asarray(rows, dtype=np.intp)
+    evs = np.zeros((n, 6), dtype=np.int64)
+    ivs = np.full((n, 6), 31, dtype=np.int64)
+    natures = np.empty((n, 6), dtype=np.int64)
+    levels = np.empty((n, 1), dtype=np.int64)
+    move_types = np.zeros((n, len(dex.types)), dtype=bool)
+
+    for i, p in enumerate(members):
+        for stat, value in p.evs.items():
+            if stat in STAT_ORDER:
+                evs[i, STAT_ORDER.index(stat)] = value
+        for stat, value in p.ivs.items():
+            if stat in STAT_ORDER:
+                ivs[i, STAT_ORDER.index(stat)] = value
+        natures[i] = dex.natures.get(to_id(p.nature or ""), dex.neutral_nature)
+        levels[i, 0] = p.level or DEFAULT_LEVEL
+        for move in p.moves:
+            entry = dex.moves.get(to_id(move))
+            if entry is None or entry[2] == "status":
+                continue
+            move_type = entry[1]
+            if entry[0] == "Tera Blast" and p.tera_type in dex.type_index:
+                move_type = dex.type_index[p.tera_type]
+            elif entry[0] == "Ivy Cudgel" and dex.species_types[rows[i], 1] != dex.no_type:
+                # Ogerpon's masks change Ivy Cudgel to the form's second type
+                move_type = dex.species_types[rows[i], 1]
+            move_types[i, move_type] = True
+
+    # Standard stat formulas; HP has no nature and adds level + 10
+    core = (2 * dex.base_stats[rows] + ivs + evs // 4) * levels // 100
+    stats = (core + 5) * natures // 100
+    stats[:, 0] = core[:, 0] + levels[:, 0] + 10
+
+    types = dex.species_types[rows]
+    # defense[attacking type, member]: product over the member's two type slots
+    defense = dex.chart[:, types].prod(axis=2)
+    # offense[member, defending type]: best multiplier among its damaging move types
+    offense = np.where(move_types[:, :, None], dex.chart[None, :, :-1], 0.0).max(axis=1)
+
+    return {"stats": stats, "types": types, "defense": defense, "offense": offense, "move_types": move_types}
+
+
+def _team_summary(members: Sequence[ShowdownPokemon], rows: Sequence[int], arrays: dict, unknown: List[str]) -> dict:
+    dex = pokedex
+    types = dex.types
+    names = dex.type_names
+    stats, defense, offense = arrays["stats"], arrays["defense"], arrays["offense"]
+
+    weak = (defense > 1).sum(axis=1)
+    resist = ((defense < 1) & (defense > 0)).sum(axis=1)
+    immune = (defense == 0).sum(axis=1)
+    counts = np.stack([weak, resist, immune], axis=1).tolist()
+    team_offense = offense.max(axis=0) if len(members) else np.zeros(len(types))
+
+    pokemon = []
+    for i, p in enumerate(members):
+        pokemon.append({
+            "name": p.name,
+            "species": dex.species_names[rows[i]],
+            "types": [types[t] for t in arrays["types"][i] if t != dex.no_type],
+            "tera_type": p.tera_type,
+            "stats": dict(zip(STAT_ORDER, stats[i].tolist())),
+            "weak_to": names[defense[:, i] > 1].tolist(),
+            "move_types": names[arrays["move_types"][i]].tolist(),
+        })
+
+    speeds = stats[:, 5]
+    scarf = np.array([(p.item or "") == "Choice Scarf" for p in members], dtype=bool)
+    effective = np.where(scarf, speeds * 3 // 2, speeds)
+    order = np.argsort(-effective, kind="stable")
+    speed_tiers = [
+        {
+            "name": members[i].name,
+            "speed": int(effective[i]),
+            "choice_scarf": bool(scarf[i]),
+            "plus_one": int(effective[i] * 3 // 2),
+            "tailwind": int(effective[i] * 2),
+            "minus_one": int(effective[i] * 2 // 3),
+        }
+        for i in order
+    ]
+
+    return {
+        "pokemon": pokemon,
+        "unknown": unknown,
+        # Close matches for misspelled species, offered but never substituted
+        "did_you_mean": {name: s for name in unknown if (s := reference.suggest("species", name))},
+        "defense": {
+            t: {"weak": w, "resist": r, "immune": z}
+            for t, (w, r, z) in zip(types, counts)
+        },
+        "shared_weaknesses": names[(weak >= 2) & (weak > resist + immune)].tolist(),
+        "offense": {
+            "super_effective": names[team_offense >= 2].tolist(),
+            "resisted": names[(team_offense < 1) & (team_offense > 0)].tolist(),
+            "no_damage": names[team_offense == 0].tolist(),
+        },
+        "speed_tiers": speed_tiers,
+        "trick_room_order": [tier["name"] for tier in reversed(speed_tiers)],
+    }
+
+
+def analyze_teams(teams: Sequence[Sequence[ShowdownPokemon]]) -> List[dict]:
+    """Team stats for many teams, with every member computed in one pass."""
+    known, rows, unknown, sizes = [], [], [], []
+    for team in teams:
+        missing = []
+        count = 0
+        for p in team:
+            row = pokedex.lookup(p.name)
+            if row is None:
+                missing.append(p.name)
+                continue
+            known.append(p)
+            rows.append(row)
+            count += 1
+        sizes.append(count)
+        unknown.append(missing)
+
+    arrays = member_arrays(known, rows)
+    results = []
+    start = 0
+    for size, missing in zip(sizes, unknown):
+        end = start + size
+        team_arrays = {
+            "stats": arrays["stats"][start:end],
+            "types": arrays["types"][start:end],
+            "defense": arrays["defense"][:, start:end],
+            "offense": arrays["offense"][start:end],
+            "move_types": arrays["move_types"][start:end],
+        }
+        results.append(_team_summary(known[start:end], rows[start:end], team_arrays, missing))
+        start = end
+    return results
+
+def team_stats(pokemon_list: Sequence[ShowdownPokemon]) -> dict:
+    """Type coverage, shared weaknesses and speed tiers for one parsed team."""
+    return analyze_teams([pokemon_list])[0]
+
+
+def format_team_stats(stats: dict) -> str:
+    """Compact plain-text rendering of team_stats for the LLM prompt."""
+    lines = []
+    for p in stats["pokemon"]:
+        spread = "/".join(str(p["stats"][s]) for s in STAT_ORDER)
+        lines.append(f"{p['name']}: {'/'.join(p['types'])}, stats {spread}, weak to {', '.join(p['weak_to']) or 'nothing'}")
+
+    defense = stats["defense"]
+    if stats["shared_weaknesses"]:
+        shared = ", ".join(
+            f"{t} ({defense[t]['weak']} weak, {defense[t]['resist'] + defense[t]['immune']} resist)"
+            for t in stats["shared_weaknesses"]
+        )
+        lines.append(f"Shared weaknesses: {shared}")
+    offense = stats["offense"]
+    lines.append(f"Super-effective coverage: {', '.join(offense['super_effective']) or 'none'}")
+    if offense["resisted"] or offense["no_damage"]:
+        lines.append(f"No neutral coverage: {', '.join(offense['resisted'] + offense['no_damage'])}")
+    tiers = ", ".join(
+        f"{t['name']} {t['speed']}{' (Scarf)' if t['choice_scarf'] else ''}" for t in stats["speed_tiers"]
+    )
+    lines.append(f"Speed order: {tiers}")
+    if stats["unknown"]:
+        did_you_mean = stats.get("did_you_mean", {})
+        unknown = (f"{name} (did you mean {did_you_mean[name]}?)" if name in did_you_mean else name for name in stats["unknown"])
+        lines.append(f"No data for: {', '.join(unknown)}")
+    return "\n".join(lines)
@@ -0,0 +1,38 @@
+import os
+import jwt
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from typing import Optional
+from models.user import User
+
+load_dotenv()
+
+# Supabase Auth signs access tokens (HS256) with the project's JWT secret
+# (Settings > API). The user id is the "sub" claim; signed-in users carry the
+# "authenticated" audience.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+_bearer = HTTPBearer(auto_error=False)
+
+_UNAUTHORIZED = {"WWW-Authenticate": "Bearer"}
+
+
+def decode_access_token(token: str, secret: str) -> User:
+    """The user a Supabase access token was issued to; raises jwt.InvalidTokenError if it doesn't verify."""
+    claims = jwt.decode(
+        token, secret, algorithms=["HS256"], audience=SUPABASE_JWT_AUDIENCE, options={"require": ["sub", "exp"]}
+    )
+    return User(id=claims["sub"], email=claims.get("email"))
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> User:
+    """FastAPI dependency: the signed-in user from the Authorization bearer token, or 401."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers=_UNAUTHORIZED)
+    if not SUPABASE_JWT_SECRET:
+        raise HTTPException(status_code=503, detail="Authentication is not configured")
+    try:
+        return decode_access_token(credentials.credentials, SUPABASE_JWT_SECRET)
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}", headers=_UNAUTHORIZED)
\ No newline at end of file
@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from services.cache import SHARED_CACHE_PATH, SharedDB
+from services.llm import analyze_parsed_team, analyze_parsed_teams_packed, get_cached_analysis, get_provider, team_cache_key
+from services.pokepaste import fetch_pokepaste_team, is_valid_pokepaste_url
+from services.showdown import ShowdownPokemon, looks_like_pokemon_team, parse_showdown_team
+
+load_dotenv()
+
+# Per-job concurrency; the global LLM_MAX_CONCURRENCY limit still applies on top
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_TEAMS = int(os.getenv("BATCH_MAX_TEAMS", "500"))
+BATCH_MAX_PACK = int(os.getenv("BATCH_MAX_PACK", "5"))
+# Finished jobs are kept this long for polling, and at most BATCH_MAX_JOBS at once
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL", "3600"))
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "100"))
+# How often a worker streaming another worker's job checks for new events
+BATCH_STREAM_POLL = float(os.getenv("BATCH_STREAM_POLL", "0.25"))
+
+# With SHARED_CACHE_PATH set, each job and its events are also written to the
+# shared file, so whichever worker a poll or stream lands on can answer it.
+# The job itself still runs in the worker that created it.
+_SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    sources TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+_shared: Optional[SharedDB] = SharedDB(SHARED_CACHE_PATH, _SHARED_SCHEMA) if SHARED_CACHE_PATH else None
+
+
+class _JobState:
+    """Progress fields shared by jobs run here and jobs read back from the shared file."""
+
+    id: str
+    created_at: float
+    finished_at: Optional[float]
+    items: List[dict]
+    unique: int
+    completed: int
+
+    @property
+    def status(self) -> str:
+        # The shared file only knows whether a job has finished
+        return "done" if self.finished_at is not None else "running"
+
+    def progress(self, include_results: bool = True) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "unique": self.unique,
+            "completed": self.completed,
+            "failed": sum(1 for item in self.items if item["status"] == "failed"),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if include_results:
+            data["items"] = self.items
+        return data
+
+
+class BatchJob(_JobState):
+    """
+    A batch of team analyses.
+
+    Every input becomes an item; items with the same canonical team share one
+    analysis. Progress is recorded as an append-only list of (event, data)
+    pairs that pollers read from and streamers follow.
+    """
+
+    def __init__(self, inputs: List[Tuple[str, str]], pack: int = 1, mode: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.pack = max(1, min(pack, BATCH_MAX_PACK))
+        self.mode = mode
+        self.items: List[dict] = [
+            {"index": i, "source": source, "status": "pending", "result": None, "error": None}
+            for i, (source, _) in enumerate(inputs)
+        ]
+        self.unique = 0
+        self.completed = 0
+        self.events: List[Tuple[str, dict]] = []
+        self._inputs = inputs
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def status(self) -> str:
+        if self._task is None and self.finished_at is None:
+            return "pending"
+        return super().status
+
+    async def _emit(self, event: str, data: dict) -> None:
+        async with self._changed:
+            self.events.append((event, data))
+            if _shared is not None:
+                await _shared.run(self._share, len(self.events) - 1, event, data)
+            self._changed.notify_all()
+
+    def _share(self, seq: int, event: str, data: dict) -> None:
+        _shared.execute(
+            "INSERT INTO batch_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+            (self.id, seq, event, json.dumps(data))
+        )
+        if event == "done":
+            _shared.execute("UPDATE batch_jobs SET finished_at = ? WHERE id = ?", (self.finished_at, self.id))
+
+    async def follow(self, start: int = 0) -> AsyncIterator[Tuple[str, dict]]:
+        """Yield recorded events from ``start`` on, then new ones until the job finishes."""
+        position = start
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished_at is not None:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events) or self.finished_at is not None)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _finish_items(self, indexes: List[int], result: Optional[dict], error: Optional[str]) -> None:
+        for index in indexes:
+            item = self.items[index]
+            item["status"] = "failed" if error else "done"
+            item["result"] = result
+            item["error"] = error
+        self.completed += 1
+        await self._emit("result", {
+            "indexes": indexes,
+            "status": "failed" if error else "done",
+            "result": result,
+            "error": error,
+            "completed": self.completed,
+            "unique": self.unique,
+        })
+
+    async def _resolve(self, index: int, source: str, value: str) -> Optional[List[ShowdownPokemon]]:
+        """Turn one input into a parsed team, marking the item failed if that isn't possible."""
+        try:
+            if source == "url":
+                if not is_valid_pokepaste_url(value):
+                    raise ValueError("Invalid Pokepaste URL format")
+                value = await fetch_pokepaste_team(value)
+                if not value:
+                    raise ValueError("Could not find team data in Pokepaste")
+            pokemon_list = parse_showdown_team(value)
+            if not pokemon_list or not looks_like_pokemon_team(value):
+                raise ValueError("Invalid team format. Please use Pokemon Showdown format.")
+            return pokemon_list
+        except Exception as e:
+            item = self.items[index]
+            item["status"] = "failed"
+            item["error"] = str(e)
+            await self._emit("result", {"indexes": [index], "status": "failed", "result": None, "error": str(e)})
+            return None
+
+    async def _run(self) -> None:
+        try:
+            semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+            async def resolve(index: int, source: str, value: str):
+                async with semaphore:
+                    return await self._resolve(index, source, value)
+
+            parsed = await asyncio.gather(*(resolve(i, s, v) for i, (s, v) in enumerate(self._inputs)))
+
+            # Dedupe identical teams by their analysis cache key
+            groups: Dict[str, Tuple[List[ShowdownPokemon], List[int]]] = {}
+            for index, pokemon_list in enumerate(parsed):
+                if pokemon_list is not None:
+                    key = team_cache_key(pokemon_list)
+                    groups.setdefault(key, (pokemon_list, []))[1].append(index)
+            self.unique = len(groups)
+            await self._emit("started", {"total": len(self.items), "unique": self.unique})
+
+            pending = []
+            for pokemon_list, indexes in groups.values():
+                cached = await get_cached_analysis(pokemon_list, self.mode)
+                if cached is not None:
+                    await self._finish_items(indexes, cached, None)
+                else:
+                    pending.append((pokemon_list, indexes))
+
+            async def analyze_one(pokemon_list, indexes):
+                async with semaphore:
+                    try:
+                        result = await analyze_parsed_team(pokemon_list, "batch", self.mode)
+                    except Exception as e:
+                        await self._finish_items(indexes, None, f"Analysis failed: {str(e)}")
+                        return
+                await self._finish_items(indexes, result, result.get("error"))
+
+            async def analyze_pack(pack):
+                if len(pack) == 1:
+                    return await analyze_one(*pack[0])
+                async with semaphore:
+                    try:
+                        results = await analyze_parsed_teams_packed([team for team, _ in pack], self.mode)
+                    except Exception:
+                        results = [None] * len(pack)
+                # Teams the packed answer didn't cover are retried one by one
+                retry = []
+                for (pokemon_list, indexes), result in zip(pack, results):
+                    if result is None:
+                        retry.append(analyze_one(pokemon_list, indexes))
+                    else:
+                        await self._finish_items(indexes, result, None)
+                await asyncio.gather(*retry)
+
+            if self.pack > 1:
+                packs = [pending[i:i + self.pack] for i in range(0, len(pending), self.pack)]
+                await asyncio.gather(*(analyze_pack(pack) for pack in packs))
+            else:
+                await asyncio.gather(*(analyze_one(team, indexes) for team, indexes in pending))
+        except Exception as e:
+            await self._emit("error", {"error": f"Batch failed: {str(e)}"})
+        finally:
+            self.finished_at = time.time()
+            await self._emit("done", self.progress(include_results=False))
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class SharedBatchJob(_JobState):
+    """A job another worker is running, rebuilt from the events it wrote to the shared file."""
+
+    def __init__(self, job_id: str, created_at: float, sources: List[str]):
+        self.id = job_id
+        self.created_at = created_at
+        self.finished_at: Optional[float] = None
+        self.items: List[dict] = [
+            {"index": i, "source": source, "status": "pending", "result": None, "error": None}
+            for i, source in enumerate(sources)
+        ]
+        self.unique = 0
+        self.completed = 0
+        self.events: List[Tuple[str, dict]] = []
+
+    def _apply(self, event: str, data: dict) -> None:
+        if event == "started":
+            self.unique = data["unique"]
+        elif event == "result":
+            for index in data["indexes"]:
+                self.items[index].update(status=data["status"], result=data["result"], error=data["error"])
+            if "completed" in data:
+                self.completed = data["completed"]
+                self.unique = data["unique"]
+        elif event == "done":
+            self.finished_at = data["finished_at"]
+        self.events.append((event, data))
+
+    async def refresh(self) -> None:
+        """Apply the events written since the last refresh."""
+        rows = await _shared.run(
+            _shared.execute, "SELECT event, data FROM batch_events WHERE job_id = ? AND seq >= ? ORDER BY seq",
+            (self.id, len(self.events))
+        )
+        for event, data in rows:
+            self._apply(event, json.loads(data))
+
+    async def follow(self, start: int = 0) -> AsyncIterator[Tuple[str, dict]]:
+        """Same as BatchJob.follow, polling the shared file every BATCH_STREAM_POLL seconds."""
+        position = start
+        while True:
+            await self.refresh()
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished_at is not None:
+                return
+            await asyncio.sleep(BATCH_STREAM_POLL)
+
+
+def _share_job(job: BatchJob) -> None:
+    now = time.time()
+    # Drop jobs past their TTL, including ones whose worker died before finishing
+    expired = "SELECT id FROM batch_jobs WHERE COALESCE(finished_at, created_at + ?) < ?"
+    _shared.execute(f"DELETE FROM batch_events WHERE job_id IN ({expired})", (BATCH_JOB_TTL, now - BATCH_JOB_TTL))
+    _shared.execute(f"DELETE FROM batch_jobs WHERE id IN ({expired})", (BATCH_JOB_TTL, now - BATCH_JOB_TTL))
+    _shared.execute(
+        "INSERT INTO batch_jobs (id, created_at, sources) VALUES (?, ?, ?)",
+        (job.id, job.created_at, json.dumps([item["source"] for item in job.items]))
+    )
+
+
+_jobs: Dict[str, BatchJob] = {}
+
+def _evict_jobs() -> None:
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at is not None and now - job.finished_at > BATCH_JOB_TTL:
+            del _jobs[job_id]
+    # Over the cap, drop the oldest finished jobs first
+    finished = sorted((job for job in _jobs.values() if job.finished_at is not None), key=lambda job: job.created_at)
+    while len(_jobs) >= BATCH_MAX_JOBS and finished:
+        del _jobs[finished.pop(0).id]
+
+async def create_job(teams: List[str], urls: List[str], pack: int = 1, mode: Optional[str] = None) -> BatchJob:
+    """Create and start a batch job over pastes and Pokepaste URLs."""
+    # Fails fast on an unknown mode or unconfigured provider
+    get_provider(mode)
+    inputs = [("paste", team) for team in teams] + [("url", url) for url in urls]
+    if not inputs:
+        raise ValueError("No teams given")
+    if len(inputs) > BATCH_MAX_TEAMS:
+        raise ValueError(f"At most {BATCH_MAX_TEAMS} teams per batch")
+    _evict_jobs()
+    if len(_jobs) >= BATCH_MAX_JOBS:
+        raise RuntimeError("Too many batch jobs in progress")
+    job = BatchJob(inputs, pack, mode)
+    _jobs[job.id] = job
+    if _shared is not None:
+        # Before returning, so a poll that lands on another worker finds it
+        await _shared.run(_share_job, job)
+    job.start()
+    return job
+
+async def get_job(job_id: str) -> Optional[_JobState]:
+    """A job started by this worker, or with SHARED_CACHE_PATH set, by any worker on the host."""
+    job = _jobs.get(job_id)
+    if job is not None or _shared is None:
+        return job
+    rows = await _shared.run(_shared.execute, "SELECT created_at, sources FROM batch_jobs WHERE id = ?", (job_id,))
+    if not rows:
+        return None
+    shared = SharedBatchJob(job_id, rows[0][0], json.loads(rows[0][1]))
+    await shared.refresh()
+    return shared
+
+def cancel_jobs() -> None:
+    for job in _jobs.values():
+        job.cancel()
@@ -0,0 +1,580 @@
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+from dotenv import load_dotenv
+from services.metrics import cache_result
+
+load_dotenv()
+
+# Set SHARED_CACHE_PATH (serve.py does when it starts several workers) to
+# share scraped meta, sets, pastes, analyses and team pages between the
+# worker processes on this host through one SQLite file in WAL mode, and to
+# let only one worker at a time load a given key.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+# Seconds a worker may hold a key it is loading before others take over
+SHARED_FLIGHT_LEASE = float(os.getenv("SHARED_FLIGHT_LEASE", "120"))
+SHARED_FLIGHT_POLL = float(os.getenv("SHARED_FLIGHT_POLL", "0.05"))
+
+
+class CacheEntry:
+    """A cached value and the time it was stored."""
+
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one awaited call."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  lookup: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Await ``fn()``, or the call already in flight for ``key``. ``lookup``
+        (async) is only used by SharedSingleFlight, to pick up what another
+        process loaded; this one never waits on other processes.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            # Its own task, so cancelling whichever caller started it doesn't
+            # cancel the call for everyone else waiting on it
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a failure nobody else awaited doesn't warn
+        if not task.cancelled():
+            task.exception()
+
+
+class LRUCache:
+    """
+    Size- and TTL-bounded in-memory cache with least-recently-used eviction.
+    Lookups are counted in the cache metrics when it has a ``name``.
+
+    With a ``stale_ttl``, expired entries are kept that much longer for
+    ``get_stale``, e.g. to fall back on when a refresh fails.
+
+    aget/aget_stale/aset are the same calls for async code that may be
+    handed a SharedCache instead; here they never block.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None, name: Optional[str] = None,
+                 stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        # Also used from threadpool workers, not just the event loop
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def _lookup(self, key: Hashable, max_age: Optional[float]) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = entry.age
+        if self.ttl is not None and age >= self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None
+        if max_age is not None and age >= max_age:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable) -> Any:
+        """Return the value for ``key``, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._lookup(key, self.ttl)
+        cache_result(self.name, "miss" if entry is None else "hit")
+        return None if entry is None else entry.value
+
+    def get_stale(self, key: Hashable) -> Any:
+        """Return the value for ``key`` even if expired, as long as it is within ``stale_ttl``."""
+        with self._lock:
+            entry = self._lookup(key, None)
+        return None if entry is None else entry.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = CacheEntry(value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key: Hashable) -> Any:
+        return self.get(key)
+
+    async def aget_stale(self, key: Hashable) -> Any:
+        return self.get_stale(key)
+
+    async def aset(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    On-disk TTL cache for JSON-serializable values, keyed by strings.
+
+    Same get/set interface as LRUCache so it can sit behind one in a
+    TieredCache and survive restarts.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, table: str = "cache"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if self.ttl is not None and time.time() - stored_at >= self.ttl:
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+
+    async def aget(self, key: str) -> Any:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+
+class TieredCache:
+    """
+    Looks keys up in each layer in order, back-filling the faster layers on a
+    hit. Async code should use aget/aget_stale/aset, which keep file-backed
+    layers off the event loop.
+    """
+
+    def __init__(self, *layers, name: Optional[str] = None):
+        self.layers = [layer for layer in layers if layer is not None]
+        self.name = name
+
+    def get(self, key: Hashable) -> Any:
+        for i, layer in enumerate(self.layers):
+            value = layer.get(key)
+            if value is not None:
+                for faster in self.layers[:i]:
+                    faster.set(key, value)
+                cache_result(self.name, "hit")
+                return value
+        cache_result(self.name, "miss")
+        return None
+
+    def get_stale(self, key: Hashable) -> Any:
+        """The first expired-but-kept value, from layers that keep them (see LRUCache.stale_ttl)."""
+        for layer in self.layers:
+            value = layer.get_stale(key) if hasattr(layer, "get_stale") else None
+            if value is not None:
+                return value
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        for layer in self.layers:
+            layer.set(key, value)
+
+    async def aget(self, key: Hashable) -> Any:
+        for i, layer in enumerate(self.layers):
+            value = await layer.aget(key)
+            if value is not None:
+                for faster in self.layers[:i]:
+                    await faster.aset(key, value)
+                cache_result(self.name, "hit")
+                return value
+        cache_result(self.name, "miss")
+        return None
+
+    async def aget_stale(self, key: Hashable) -> Any:
+        for layer in self.layers:
+            value = await layer.aget_stale(key) if hasattr(layer, "aget_stale") else None
+            if value is not None:
+                return value
+        return None
+
+    async def aset(self, key: Hashable, value: Any) -> None:
+        for layer in self.layers:
+            await layer.aset(key, value)
+
+    def delete(self, key: Hashable) -> None:
+        for layer in self.layers:
+            layer.delete(key)
+
+    def clear(self) -> None:
+        for layer in self.layers:
+            layer.clear()
+
+
+def _shared_key(key: Hashable) -> str:
+    # Tuple keys like (format, pokemon) are stored as JSON arrays
+    return key if isinstance(key, str) else json.dumps(key, default=str)
+
+
+class SharedDB:
+    """
+    A SQLite file opened in WAL mode so several processes can read and write
+    it at once. Each process opens its own connection on first use, so
+    objects created before the server forks its workers stay safe.
+
+    execute/changes block. From async code, ``await db.run(fn, ...)`` runs
+    them on the connection's own single thread instead of the event loop.
+    """
+
+    def __init__(self, path: str, schema: str, timeout: float = 5.0):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Autocommit: every statement below is atomic on its own
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def changes(self, sql: str, params: tuple = ()) -> int:
+        """Run a write and return how many rows it changed."""
+        with self._lock:
+            return self._connection().execute(sql, params).rowcount
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Await a blocking call on this connection's thread."""
+        if self._executor_pid != os.getpid():
+            # Threads don't survive a fork, so each process starts its own
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-db")
+            self._executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+
+class SharedCache:
+    """
+    TTL cache in a SQLite file shared by every worker process on the host.
+
+    Same get/get_stale/set interface as LRUCache; the async aget/aget_stale/
+    aset run on the connection's thread. Keys are strings or tuples
+    of plain values; values are pickled, so anything the app caches in
+    memory can be stored. Rows past ``ttl + stale_ttl`` are purged now and
+    then as new ones are written.
+    """
+
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str, table: str, ttl: Optional[float] = None, stale_ttl: float = 0.0,
+                 name: Optional[str] = None):
+        self.table = table
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.db = SharedDB(
+            path, f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL);"
+        )
+        self._writes = 0
+
+    def _lookup(self, key: Hashable, max_age: Optional[float]) -> Any:
+        rows = self.db.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (_shared_key(key),))
+        if not rows:
+            return None
+        value, stored_at = rows[0]
+        if max_age is not None and time.time() - stored_at >= max_age:
+            return None
+        return pickle.loads(value)
+
+    def get(self, key: Hashable) -> Any:
+        value = self._lookup(key, self.ttl)
+        cache_result(self.name, "miss" if value is None else "hit")
+        return value
+
+    def get_stale(self, key: Hashable) -> Any:
+        return self._lookup(key, None if self.ttl is None else self.ttl + self.stale_ttl)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+            (_shared_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+        )
+        self._writes += 1
+        if self.ttl is not None and self._writes % self.PURGE_EVERY == 0:
+            self.db.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (time.time() - self.ttl - self.stale_ttl,))
+
+    async def aget(self, key: Hashable) -> Any:
+        value = await self.db.run(self._lookup, key, self.ttl)
+        cache_result(self.name, "miss" if value is None else "hit")
+        return value
+
+    async def aget_stale(self, key: Hashable) -> Any:
+        return await self.db.run(self.get_stale, key)
+
+    async def aset(self, key: Hashable, value: Any) -> None:
+        await self.db.run(self.set, key, value)
+
+    def delete(self, key: Hashable) -> None:
+        self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (_shared_key(key),))
+
+    def clear(self) -> None:
+        self.db.execute(f"DELETE FROM {self.table}")
+
+
+class Counters:
+    """Named integer counters in this process."""
+
+    def __init__(self):
+        self._values: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        return self._values.get(key, 0)
+
+    def incr(self, key: Hashable) -> int:
+        with self._lock:
+            value = self._values[key] = self._values.get(key, 0) + 1
+        return value
+
+    async def aget(self, key: Hashable) -> int:
+        return self.get(key)
+
+    async def aincr(self, key: Hashable) -> int:
+        return self.incr(key)
+
+
+class SharedCounters(Counters):
+    """Like Counters, but incremented atomically across every worker process."""
+
+    def __init__(self, path: str, table: str):
+        self.table = table
+        self.db = SharedDB(path, f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value INTEGER NOT NULL);")
+
+    def get(self, key: Hashable) -> int:
+        rows = self.db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (_shared_key(key),))
+        return rows[0][0] if rows else 0
+
+    def incr(self, key: Hashable) -> int:
+        rows = self.db.execute(
+            f"INSERT INTO {self.table} (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value",
+            (_shared_key(key),)
+        )
+        return rows[0][0]
+
+    async def aget(self, key: Hashable) -> int:
+        return await self.db.run(self.get, key)
+
+    async def aincr(self, key: Hashable) -> int:
+        return await self.db.run(self.incr, key)
+
+
+class SharedSingleFlight(SingleFlight):
+    """
+    SingleFlight across worker processes: concurrent calls in this process
+    share one call as before, and a lease row in the shared file lets only
+    one process at a time run the call for a key.
+
+    A process that finds the key leased waits for the lease to go, then
+    returns ``await lookup()`` (what the other process cached) if there is
+    one, or runs the call itself. Lease queries run on the shared file's own
+    thread, off the event loop. Leases expire after ``lease`` seconds so a worker
+    that dies mid-load can't block the key.
+    """
+
+    def __init__(self, path: str, namespace: str, table: str = "flights", lease: float = SHARED_FLIGHT_LEASE,
+                 poll: float = SHARED_FLIGHT_POLL):
+        super().__init__()
+        self.namespace = namespace
+        self.table = table
+        self.lease = lease
+        self.poll = poll
+        self.db = SharedDB(
+            path, f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);"
+        )
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  lookup: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        name = f"{self.namespace}:{_shared_key(key)}"
+        return await super().run(key, lambda: self._run_leased(name, fn, lookup))
+
+    def _acquire(self, name: str, owner: str) -> bool:
+        now = time.time()
+        return self.db.changes(
+            f"INSERT INTO {self.table} (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            f"WHERE {self.table}.expires_at <= ?",
+            (name, owner, now + self.lease, now)
+        ) > 0
+
+    def _held(self, name: str) -> bool:
+        return bool(self.db.execute(f"SELECT 1 FROM {self.table} WHERE key = ? AND expires_at > ?", (name, time.time())))
+
+    def _release(self, name: str, owner: str) -> None:
+        self.db.execute(f"DELETE FROM {self.table} WHERE key = ? AND owner = ?", (name, owner))
+
+    async def _run_leased(self, name: str, fn: Callable[[], Awaitable[Any]],
+                          lookup: Optional[Callable[[], Awaitable[Any]]]) -> Any:
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        while not await self.db.run(self._acquire, name, owner):
+            # Another worker is loading this key; use its result once it's done
+            while await self.db.run(self._held, name):
+                await asyncio.sleep(self.poll)
+            value = await lookup() if lookup is not None else None
+            if value is not None:
+                return value
+        try:
+            return await fn()
+        finally:
+            await asyncio.shield(self.db.run(self._release, name, owner))
+
+
+def shared_cache(table: str, ttl: Optional[float] = None, stale_ttl: float = 0.0,
+                 name: Optional[str] = None) -> Optional[SharedCache]:
+    """A SharedCache table when SHARED_CACHE_PATH is set, else None (in-process caching only)."""
+    return SharedCache(SHARED_CACHE_PATH, table, ttl, stale_ttl, name) if SHARED_CACHE_PATH else None
+
+def single_flight(namespace: str) -> SingleFlight:
+    """A SharedSingleFlight when SHARED_CACHE_PATH is set, else an in-process SingleFlight."""
+    return SharedSingleFlight(SHARED_CACHE_PATH, namespace) if SHARED_CACHE_PATH else SingleFlight()
+
+def counters(table: str) -> Counters:
+    """SharedCounters when SHARED_CACHE_PATH is set, else in-process Counters."""
+    return SharedCounters(SHARED_CACHE_PATH, table) if SHARED_CACHE_PATH else Counters()
+
+
+class SWRCache:
+    """
+    Keyed TTL cache with stale-while-revalidate and single-flight loading.
+
+    - Fresh entries (younger than ``ttl``) are returned directly.
+    - Stale entries (younger than ``ttl + stale_ttl``) are returned immediately
+      while one background task refreshes the key.
+    - Missing or expired keys are loaded by the first caller; concurrent
+      callers for the same key await that single load instead of starting
+      their own.
+
+    Values rejected by ``should_cache`` (e.g. error payloads) are handed to the
+    callers of that load but never replace a previously cached value.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, should_cache: Optional[Callable[[Any], bool]] = None,
+                 name: Optional[str] = None):
+        self.ttl = ttl
+        self.name = name
+        self.stale_ttl = stale_ttl
+        self.should_cache = should_cache or (lambda value: True)
+        self._entries: Dict[Hashable, CacheEntry] = {}
+        self._flights = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for ``key``, awaiting ``loader()`` when needed."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = entry.age
+            if age < self.ttl:
+                cache_result(self.name, "hit")
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                cache_result(self.name, "stale")
+                if key not in self._flights:
+                    task = asyncio.create_task(self._flights.run(key, lambda: self._load(key, loader)))
+                    self._background.add(task)
+                    task.add_done_callback(self._background_done)
+                return entry.value
+
+        cache_result(self.name, "miss")
+        return await self._flights.run(key, lambda: self._load(key, loader))
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the stored entry for ``key`` without loading or refreshing it."""
+        return self._entries.get(key)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled():
+            # A failed background refresh just leaves the stale entry in place
+            task.exception()
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        if value is not None and self.should_cache(value):
+            self._entries[key] = CacheEntry(value, time.time())
+            return value
+        # Keep serving the last good value rather than the failed load
+        previous = self._entries.get(key)
+        return previous.value if previous is not None else value
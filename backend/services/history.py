@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Append-only usage and sets history, opened by the app lifespan. Set
+# META_HISTORY_PATH to an empty string to turn recording (and the history
+# endpoints) off.
+META_HISTORY_PATH = os.getenv("META_HISTORY_PATH", "meta_history.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    format TEXT NOT NULL,
+    ts REAL NOT NULL,
+    total_pokemon INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_format_ts ON snapshots (format, ts);
+
+CREATE TABLE IF NOT EXISTS usage (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    format TEXT NOT NULL,
+    pokemon TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ts REAL NOT NULL,
+    usage REAL NOT NULL,
+    rank INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_format_pokemon_ts ON usage (format, pokemon, ts);
+CREATE INDEX IF NOT EXISTS usage_snapshot ON usage (snapshot_id);
+
+CREATE TABLE IF NOT EXISTS sets (
+    format TEXT NOT NULL,
+    pokemon TEXT NOT NULL,
+    ts REAL NOT NULL,
+    digest TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sets_format_pokemon_ts ON sets (format, pokemon, ts);
+"""
+
+# Moving average and per-point delta for one Pokemon, computed over its whole
+# series so the first points in the requested range still get a full window
+_HISTORY_SQL = """
+SELECT ts, name, usage, rank, moving_average, delta FROM (
+    SELECT ts, name, usage, rank,
+           AVG(usage) OVER (ORDER BY ts ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW) AS moving_average,
+           usage - LAG(usage) OVER (ORDER BY ts) AS delta
+    FROM usage
+    WHERE format = ? AND pokemon = ? AND ts <= ?
+)
+WHERE ts >= ?
+ORDER BY ts
+"""
+
+# Usage in two snapshots side by side; a Pokemon missing from one side had 0%
+_DIFF_SQL = """
+SELECT pokemon, MAX(name) AS name,
+       MAX(CASE WHEN snapshot_id = :before THEN usage END) AS usage_before,
+       MAX(CASE WHEN snapshot_id = :after THEN usage END) AS usage_after,
+       MAX(CASE WHEN snapshot_id = :before THEN rank END) AS rank_before,
+       MAX(CASE WHEN snapshot_id = :after THEN rank END) AS rank_after,
+       COALESCE(MAX(CASE WHEN snapshot_id = :after THEN usage END), 0)
+         - COALESCE(MAX(CASE WHEN snapshot_id = :before THEN usage END), 0) AS delta
+FROM usage
+WHERE snapshot_id IN (:before, :after)
+GROUP BY pokemon
+ORDER BY delta DESC
+"""
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+class MetaHistory:
+    """
+    Append-only SQLite store of usage snapshots and per-Pokemon sets.
+
+    Rows are indexed by (format, pokemon, time). A recording identical to the
+    latest one for the same key is skipped, so frequent refreshes of
+    unchanged data don't grow the store. Calls block; use asyncio.to_thread
+    from async code.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def record_usage(self, format_name: str, rows: Iterable[dict], ts: Optional[float] = None) -> bool:
+        """
+        Append a usage snapshot. ``rows`` are dicts with pokemon (normalized
+        id), name, usage and rank. Returns False if it matched the previous one.
+        """
+        rows = [(r["pokemon"], r["name"], float(r["usage"]), int(r["rank"])) for r in rows]
+        if not rows:
+            return False
+        ts = time.time() if ts is None else ts
+        digest = _digest(rows)
+        with self._lock, self._conn:
+            latest = self._conn.execute(
+                "SELECT digest FROM snapshots WHERE format = ? ORDER BY ts DESC LIMIT 1", (format_name,)
+            ).fetchone()
+            if latest is not None and latest["digest"] == digest:
+                return False
+            snapshot_id = self._conn.execute(
+                "INSERT INTO snapshots (format, ts, total_pokemon, digest) VALUES (?, ?, ?, ?)",
+                (format_name, ts, len(rows), digest)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO usage (snapshot_id, format, pokemon, name, ts, usage, rank) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(snapshot_id, format_name, pokemon, name, ts, usage, rank) for pokemon, name, usage, rank in rows]
+            )
+        return True
+
+    def record_sets(self, format_name: str, pokemon: str, data: dict, ts: Optional[float] = None) -> bool:
+        """Append a sets payload for a normalized Pokemon id. Returns False if unchanged."""
+        sets = data.get("sets", [])
+        digest = _digest(sets)
+        ts = time.time() if ts is None else ts
+        with self._lock, self._conn:
+            latest = self._conn.execute(
+                "SELECT digest FROM sets WHERE format = ? AND pokemon = ? ORDER BY ts DESC LIMIT 1",
+                (format_name, pokemon)
+            ).fetchone()
+            if latest is not None and latest["digest"] == digest:
+                return False
+            self._conn.execute(
+                "INSERT INTO sets (format, pokemon, ts, digest, data) VALUES (?, ?, ?, ?, ?)",
+                (format_name, pokemon, ts, digest, json.dumps(sets))
+            )
+        return True
+
+    def usage_history(self, format_name: str, pokemon: str, since: float = 0.0,
+                      until: Optional[float] = None, window: int = 4) -> List[dict]:
+        """Usage points for one Pokemon with a ``window``-point moving average and delta."""
+        sql = _HISTORY_SQL.format(preceding=max(int(window), 1) - 1)
+        until = time.time() if until is None else until
+        with self._lock:
+            rows = self._conn.execute(sql, (format_name, pokemon, until, since)).fetchall()
+        return [dict(row) for row in rows]
+
+    def usage_diff(self, format_name: str, since: float, until: Optional[float] = None) -> Optional[dict]:
+        """
+        Compare the latest snapshot at or before ``until`` with the latest one
+        at or before ``since`` (or the oldest one, if none is that old).
+        Returns None when the format has no snapshots.
+        """
+        until = time.time() if until is None else until
+        with self._lock:
+            after = self._conn.execute(
+                "SELECT id, ts FROM snapshots WHERE format = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                (format_name, until)
+            ).fetchone()
+            if after is None:
+                return None
+            before = self._conn.execute(
+                "SELECT id, ts FROM snapshots WHERE format = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                (format_name, since)
+            ).fetchone() or self._conn.execute(
+                "SELECT id, ts FROM snapshots WHERE format = ? ORDER BY ts LIMIT 1", (format_name,)
+            ).fetchone()
+            rows = self._conn.execute(_DIFF_SQL, {"before": before["id"], "after": after["id"]}).fetchall()
+        return {
+            "from": before["ts"],
+            "to": after["ts"],
+            "pokemon": [dict(row) for row in rows]
+        }
+
+    def sets_history(self, format_name: str, pokemon: str, since: float = 0.0, limit: int = 20) -> List[dict]:
+        """Recorded sets for one Pokemon, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, data FROM sets WHERE format = ? AND pokemon = ? AND ts >= ? ORDER BY ts DESC LIMIT ?",
+                (format_name, pokemon, since, limit)
+            ).fetchall()
+        return [{"ts": row["ts"], "sets": json.loads(row["data"])} for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# None until open_history(), and whenever history is turned off
+meta_history: Optional[MetaHistory] = None
+
+def open_history(path: str = META_HISTORY_PATH) -> Optional[MetaHistory]:
+    """Open the history store. Called from the app lifespan."""
+    global meta_history
+    if meta_history is None and path:
+        meta_history = MetaHistory(path)
+    return meta_history
+
+def close_history() -> None:
+    global meta_history
+    if meta_history is not None:
+        meta_history.close()
+        meta_history = None
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import httpx
+from dotenv import load_dotenv
+from typing import Optional
+
+load_dotenv()
+
+# Shared outbound HTTP client. One pooled AsyncClient for the whole backend so
+# repeated upstream calls reuse keep-alive (and HTTP/2) connections instead of
+# paying a TCP+TLS handshake per request.
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_client: Optional[httpx.AsyncClient] = None
+
+def create_client(**kwargs) -> httpx.AsyncClient:
+    """Build an AsyncClient with the backend's pooling and timeout settings."""
+    options = dict(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=30.0
+        )
+    )
+    options.update(kwargs)
+    return httpx.AsyncClient(**options)
+
+async def start_client(**kwargs) -> httpx.AsyncClient:
+    """Open the shared client. Called from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client(**kwargs)
+    return _client
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside of the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
@@ -0,0 +1,229 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ',':
+        del out[i]
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Best-effort decode of the first JSON object in model output that isn't clean JSON.
+
+    Skips prose or code fences before the first ``{``, drops trailing commas,
+    fixes mismatched closers, allows raw control characters in strings and
+    closes whatever is still open at the end. If the text was cut off mid-value
+    it falls back to the last complete element before the cut. Returns None if
+    nothing decodes.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    out: List[str] = []
+    stack: List[str] = []
+    # (length of out, closers needed) at each comma, i.e. just after a complete element
+    cuts: List[Tuple[int, str]] = []
+    in_string = escape = False
+    for char in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            out.append(char)
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            _strip_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                break
+            continue
+        elif char == ',':
+            cuts.append((len(out), "".join(reversed(stack))))
+        out.append(char)
+
+    if stack:
+        if escape:
+            out.pop()
+        if in_string:
+            out.append('"')
+        _strip_trailing_comma(out)
+    candidates = ["".join(out) + "".join(reversed(stack))]
+    candidates += ["".join(out[:length]) + closers for length, closers in reversed(cuts)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+def _decode(text: str) -> Any:
+    """json.loads for one completed value, repairing objects and arrays that don't parse as is."""
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        stripped = text.lstrip()
+        if stripped[:1] == '{':
+            repaired = repair_json(stripped)
+        elif stripped[:1] == '[':
+            repaired = repair_json('{"_": ' + stripped + '}')
+            repaired = repaired.get("_") if isinstance(repaired, dict) else None
+        else:
+            repaired = None
+        if repaired is None:
+            raise
+        return repaired
+
+
+class IncrementalJSONParser:
+    """
+    Incrementally scans a streamed JSON object and reports pieces as they close.
+
+    Feed it text chunks as they arrive (e.g. LLM tokens). Leading prose before
+    the first ``{`` is skipped. ``feed`` returns a list of events:
+
+    - ``("field", key, value)`` when a top-level non-array value (e.g. ``grade``) completes
+    - ``("item", key, index, value)`` when an element of a top-level array completes
+    - ``("done", obj)`` when the top-level object closes
+
+    Only completed values are ever decoded; ones that aren't quite valid JSON
+    (e.g. trailing commas) go through repair_json.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._root_start: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_role: Optional[str] = None
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._key_start = 0
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+
+    def feed(self, chunk: str) -> List[Tuple[Any, ...]]:
+        self.buffer += chunk
+        buffer = self.buffer
+        events = []
+        i = self._pos
+
+        while i < len(buffer) and not self.done:
+            char = buffer[i]
+
+            if self._root_start is None:
+                if char == '{':
+                    self._root_start = i
+                    self._stack.append('{')
+                    self._expect_key = True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(buffer, i, events)
+            elif not char.isspace():
+                depth = len(self._stack)
+                if depth == 1:
+                    self._scan_object(buffer, i, char, events)
+                elif depth == 2 and self._stack[-1] == '[':
+                    self._scan_array(buffer, i, char, events)
+                else:
+                    self._scan_nested(buffer, i, char, events)
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _scan_object(self, buffer: str, i: int, char: str, events: list) -> None:
+        """A character directly inside the top-level object."""
+        if char == '"':
+            self._in_string = True
+            if self._expect_key:
+                self._string_role = "key"
+                self._key_start = i
+                self._expect_key = False
+            else:
+                self._string_role = "value"
+                self._value_start = i
+        elif char == ':':
+            self._item_index = 0
+        elif char in ',}':
+            # Numbers, booleans and null end at the next delimiter
+            if self._value_start is not None:
+                events.append(("field", self._key, _decode(buffer[self._value_start:i])))
+                self._value_start = None
+            if char == ',':
+                self._expect_key = True
+            else:
+                self._stack.pop()
+                self.done = True
+                events.append(("done", _decode(buffer[self._root_start:i + 1])))
+        elif char in '{[':
+            self._stack.append(char)
+            self._value_start = i if char == '{' else None
+        elif self._value_start is None:
+            self._value_start = i
+
+    def _scan_array(self, buffer: str, i: int, char: str, events: list) -> None:
+        """A character directly inside a top-level array value."""
+        if char in ',]':
+            if self._item_start is not None:
+                events.append(self._item_event(buffer[self._item_start:i]))
+            if char == ']':
+                self._stack.pop()
+        elif self._item_start is None:
+            self._item_start = i
+            if char == '"':
+                self._in_string = True
+                self._string_role = "item"
+            elif char in '{[':
+                self._stack.append(char)
+
+    def _scan_nested(self, buffer: str, i: int, char: str, events: list) -> None:
+        """A character inside an array element or object value; only track nesting."""
+        if char == '"':
+            self._in_string = True
+            self._string_role = None
+        elif char in '{[':
+            self._stack.append(char)
+        elif char in '}]':
+            self._stack.pop()
+            depth = len(self._stack)
+            if depth == 2 and self._stack[-1] == '[' and self._item_start is not None:
+                events.append(self._item_event(buffer[self._item_start:i + 1]))
+            elif depth == 1 and self._value_start is not None:
+                events.append(("field", self._key, _decode(buffer[self._value_start:i + 1])))
+                self._value_start = None
+
+    def _close_string(self, buffer: str, i: int, events: list) -> None:
+        if self._string_role == "key":
+            self._key = _decode(buffer[self._key_start:i + 1])
+        elif self._string_role == "value":
+            events.append(("field", self._key, _decode(buffer[self._value_start:i + 1])))
+            self._value_start = None
+        elif self._string_role == "item":
+            events.append(self._item_event(buffer[self._item_start:i + 1]))
+        self._string_role = None
+
+    def _item_event(self, text: str) -> Tuple[Any, ...]:
+        event = ("item", self._key, self._item_index, _decode(text))
+        self._item_index += 1
+        self._item_start = None
+        return event
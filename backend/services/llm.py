@@ -1,119 +1,206 @@
+import asyncio
+import hashlib
+import json
 import os
+import random
+import time
 import openai
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from services.analytics import STAT_ORDER, format_team_stats, team_stats
+from services.cache import LRUCache, SQLiteCache, TieredCache, shared_cache, single_flight
+from models.analysis import PackedAnalysis, SECTION_MODELS, TeamAnalysis, response_format, sections_response_format
+from services.json_stream import IncrementalJSONParser, repair_json
+from services.metrics import LLM_ERRORS, LLM_IN_FLIGHT, LLM_LATENCY, LLM_PARSE, LLM_TOKENS
+from services.providers import create_providers
+from services.resilience import UpstreamUnavailable, error_fields, upstream
+from services.showdown import ShowdownPokemon, parse_showdown_team
+from services.threats import format_threats, peek_threat_table, threat_matrix
+from services.tokens import count_message_tokens, count_tokens, is_exact
 
 load_dotenv()
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def parse_showdown_team(team_text: str) -> List[Dict]:
-    """Parse a Pokemon Showdown format team into structured data."""
-    pokemon_list = []
-    current_pokemon = {}
-    
-    lines = team_text.strip().split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # New Pokemon (starts with name and optional @item)
-        if not line.startswith(' ') and not line.startswith('-') and not line.startswith('EVs:') and not line.startswith('IVs:') and not line.startswith('Ability:') and not line.startswith('Nature') and not line.startswith('Level:') and not line.startswith('Tera Type:'):
-            # Save previous Pokemon if exists
-            if current_pokemon:
-                pokemon_list.append(current_pokemon)
-                current_pokemon = {}
-            
-            # Parse new Pokemon line
-            parts = line.split(' @ ')
-            name = parts[0].strip()
-            item = parts[1].strip() if len(parts) > 1 else None
-            
-            current_pokemon = {
-                'name': name,
-                'item': item,
-                'ability': None,
-                'nature': None,
-                'level': None,
-                'tera_type': None,
-                'evs': {},
-                'ivs': {},
-                'moves': []
-            }
-        
-        # Ability
-        elif line.startswith('Ability:'):
-            current_pokemon['ability'] = line.replace('Ability:', '').strip()
-        
-        # Level
-        elif line.startswith('Level:'):
-            level_text = line.replace('Level:', '').strip()
-            try:
-                current_pokemon['level'] = int(level_text)
-            except ValueError:
-                current_pokemon['level'] = None
-        
-        # Tera Type
-        elif line.startswith('Tera Type:'):
-            current_pokemon['tera_type'] = line.replace('Tera Type:', '').strip()
-        
-        # Nature
-        elif line.startswith('Nature'):
-            current_pokemon['nature'] = line.replace('Nature', '').strip()
-        
-        # EVs
-        elif line.startswith('EVs:'):
-            ev_text = line.replace('EVs:', '').strip()
-            evs = {}
-            for ev_part in ev_text.split('/'):
-                ev_part = ev_part.strip()
-                if ' ' in ev_part:
-                    # Extract the number from strings like "252 HP" or "4 SpD"
-                    parts = ev_part.split()
-                    if len(parts) >= 2:
-                        try:
-                            value = int(parts[0])
-                            stat = ' '.join(parts[1:])  # Handle multi-word stats like "Sp. Atk"
-                            evs[stat] = value
-                        except ValueError:
-                            # Skip invalid EV entries
-                            continue
-            current_pokemon['evs'] = evs
-        
-        # IVs (can appear after moves)
-        elif line.startswith('IVs:'):
-            iv_text = line.replace('IVs:', '').strip()
-            ivs = {}
-            for iv_part in iv_text.split('/'):
-                iv_part = iv_part.strip()
-                if ' ' in iv_part:
-                    # Extract the number from strings like "31 HP" or "0 SpD"
-                    parts = iv_part.split()
-                    if len(parts) >= 2:
-                        try:
-                            value = int(parts[0])
-                            stat = ' '.join(parts[1:])  # Handle multi-word stats like "Sp. Atk"
-                            ivs[stat] = value
-                        except ValueError:
-                            # Skip invalid IV entries
-                            continue
-            current_pokemon['ivs'] = ivs
-        
-        # Moves
-        elif line.startswith('-'):
-            move = line.replace('-', '').strip()
-            current_pokemon['moves'].append(move)
-    
-    # Add the last Pokemon
-    if current_pokemon:
-        pokemon_list.append(current_pokemon)
+# Upstream isolation: at most LLM_MAX_CONCURRENCY completions run at once,
+# requests wait up to LLM_QUEUE_TIMEOUT seconds for a slot, each attempt is
+# capped at LLM_TIMEOUT seconds, and 429/5xx/timeouts are retried up to
+# LLM_MAX_RETRIES times with jittered exponential backoff.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMBusyError(UpstreamUnavailable):
+    """Raised when no upstream LLM slot frees up within LLM_QUEUE_TIMEOUT."""
+
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "gpt-4")
+
+# Analysis providers by name: "openai" (ANALYSIS_MODEL, or any compatible
+# server via OPENAI_BASE_URL), "rules" (offline, deterministic) and, when
+# LOCAL_LLM_BASE_URL is set, "local-llm". Retries are handled by _create_completion.
+providers = create_providers(ANALYSIS_MODEL, LLM_TIMEOUT)
+# Which provider serves each analysis mode: quick grades stay local, deep
+# analyses go to the remote model
+ANALYSIS_ROUTES = {
+    "quick": os.getenv("ANALYSIS_QUICK_PROVIDER", "rules"),
+    "deep": os.getenv("ANALYSIS_DEEP_PROVIDER", "openai"),
+}
+ANALYSIS_DEFAULT_MODE = os.getenv("ANALYSIS_DEFAULT_MODE", "deep")
+
+# Structured outputs (a JSON schema response_format) need a model that supports
+# them; "auto" turns them on for everything but the original gpt-4/gpt-3.5 models
+ANALYSIS_STRUCTURED_OUTPUT = os.getenv("ANALYSIS_STRUCTURED_OUTPUT", "auto").lower()
+# Fields still invalid after parsing and repair are re-requested, on their own, up to this many times
+ANALYSIS_SECTION_RETRIES = int(os.getenv("ANALYSIS_SECTION_RETRIES", "1"))
+# Bump whenever the prompt changes so cached analyses from the old prompt are not reused
+PROMPT_VERSION = "4"
+# Type matchups and speed stats are precomputed locally and given to the model,
+# so it only writes commentary and needs far fewer tokens
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "600"))
+ANALYSIS_PROMPT_BUDGET = int(os.getenv("ANALYSIS_PROMPT_BUDGET", "1500"))
+# Meta format whose in-memory threat table is added to the prompt, if loaded
+ANALYSIS_THREATS_FORMAT = os.getenv("ANALYSIS_THREATS_FORMAT", "ss")
+
+
+class TokenBudget(NamedTuple):
+    prompt: int
+    completion: int
+
+# Prompt and completion token budgets per endpoint tier; "batch" is per team
+# of a packed request. Optional prompt sections are left out, meta threats
+# first, when a prompt would go over its budget.
+TOKEN_BUDGETS = {
+    "analyze": TokenBudget(ANALYSIS_PROMPT_BUDGET, ANALYSIS_MAX_TOKENS),
+    "stream": TokenBudget(ANALYSIS_PROMPT_BUDGET, ANALYSIS_MAX_TOKENS),
+    "batch": TokenBudget(int(os.getenv("BATCH_PROMPT_BUDGET", "1000")), int(os.getenv("BATCH_MAX_TOKENS", "500"))),
+}
+
+# The system prompt never changes between requests and always comes first, so
+# the provider can serve it from its prompt cache; the key keeps requests
+# sharing it on the same cache
+ANALYSIS_PROMPT_CACHE_KEY = os.getenv("ANALYSIS_PROMPT_CACHE_KEY", f"vgchat-analysis-{PROMPT_VERSION}")
+
+# Analyses are cached by a canonical hash of the parsed team. The in-process
+# LRU is always on; set ANALYSIS_CACHE_PATH to also persist them in SQLite,
+# and SHARED_CACHE_PATH to share them between worker processes.
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "86400"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH")
+
+_analysis_cache = TieredCache(
+    LRUCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL),
+    shared_cache("analyses", ttl=ANALYSIS_CACHE_TTL),
+    SQLiteCache(ANALYSIS_CACHE_PATH, ttl=ANALYSIS_CACHE_TTL, table="analyses") if ANALYSIS_CACHE_PATH else None,
+    name="analysis"
+)
+
+# Top-level list sections of an analysis, streamed item by item
+ANALYSIS_SECTIONS = ("strengths", "weaknesses", "threats", "suggestions")
+ANALYSIS_FIELDS = ("grade",) + ANALYSIS_SECTIONS
+GRADES = ("A", "B", "C", "D", "F")
+
+# Identical analyses in progress, so concurrent requests (in any worker) share
+# one upstream call
+_analysis_flights = single_flight("analyses")
+
+ANALYSIS_SYSTEM_PROMPT = """You are an expert VGC (Video Game Championships) Pokemon coach and analyst for the Generation 9 (Scarlet and Violet) VGC formats.
+Analyze the given team and give a comprehensive assessment as JSON in this format:
+{"grade": "A/B/C/D/F",
+"strengths": [{"point": "specific strength", "reasoning": "why this is a strength"}],
+"weaknesses": [{"point": "specific weakness", "reasoning": "why this is a weakness"}],
+"threats": [{"point": "specific threat", "reasoning": "why this is a threat"}],
+"suggestions": [{"type": "move_change/item_change/ability_change/pokemon_swap", "description": "specific suggestion", "priority": "high/medium/low"}]}
+
+Each Pokemon is one line: Name @ Item | Ability | Tera type | Nature | EVs | IVs | Level | moves.
+Omitted fields are defaults: no item, no EVs, 31 IVs, level 50. Stat keys are hp/atk/def/spa/spd/spe.
+The type matchups, stats and speed order given with the team are computed exactly; rely on them instead of working them out yourself.
+
+Consider type coverage and synergy, speed control and positioning, common meta threats, item optimization, move coverage, team composition balance and current VGC meta trends.
+For each strength, weakness, and threat, explain WHY it's important in one or two sentences."""
+
+# Sent as a second system message when several teams share one request, so
+# the first one stays identical to single-team requests
+PACKED_ANALYSIS_INSTRUCTIONS = """You will be given several teams, labelled Team 1, Team 2, and so on. Analyze each one independently and respond with a single JSON object of the form {"teams": [<analysis of Team 1>, <analysis of Team 2>, ...]}, one analysis per team, in order, each in the format above."""
+
+def _canonical_text(value: Optional[str]) -> Optional[str]:
+    return ' '.join(value.split()).lower() if value else None
+
+def team_cache_key(pokemon_list: List[ShowdownPokemon], model: str = ANALYSIS_MODEL) -> str:
+    """
+    Content hash of a parsed team for the analysis cache.
     
-    return pokemon_list
+    Ignores Pokemon and move order, whitespace and case, and includes the model
+    and prompt version so a prompt change never serves stale analyses.
+    """
+    team = []
+    for p in pokemon_list:
+        team.append({
+            'name': _canonical_text(p.name),
+            'item': _canonical_text(p.item),
+            'ability': _canonical_text(p.ability),
+            'nature': _canonical_text(p.nature),
+            'level': p.level,
+            'tera_type': _canonical_text(p.tera_type),
+            'evs': sorted(p.evs.items()),
+            'ivs': sorted(p.ivs.items()),
+            'moves': sorted(_canonical_text(m) for m in p.moves)
+        })
+    team.sort(key=lambda p: json.dumps(p, sort_keys=True))
+    payload = json.dumps({'model': model, 'prompt_version': PROMPT_VERSION, 'team': team}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-def analyze_team_with_llm(team_data: str) -> dict:
-    """Analyze a Pokemon team using OpenAI GPT-4."""
+@asynccontextmanager
+async def _llm_slot():
+    """Hold one of the LLM_MAX_CONCURRENCY upstream slots."""
+    try:
+        await asyncio.wait_for(_llm_slots.acquire(), LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMBusyError("Analysis service is busy, please try again shortly")
+    try:
+        with LLM_IN_FLIGHT.track():
+            yield
+    finally:
+        _llm_slots.release()
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def get_provider(mode: Optional[str] = None):
+    """The provider serving an analysis mode (ANALYSIS_DEFAULT_MODE when not given)."""
+    mode = mode or ANALYSIS_DEFAULT_MODE
+    if mode not in ANALYSIS_ROUTES:
+        raise ValueError(f"Unknown analysis mode: {mode}")
+    name = ANALYSIS_ROUTES[mode]
+    if name not in providers:
+        raise ValueError(f"Analysis provider {name} is not configured")
+    return providers[name]
+
+async def _create_completion(provider, **kwargs):
+    """
+    Request a chat completion with jittered backoff retries. Each attempt
+    goes through the provider's rate limit and circuit breaker and is capped
+    at LLM_TIMEOUT seconds; an open circuit fails at once without retrying.
+    """
+    guard = upstream(provider.name, timeout=LLM_TIMEOUT)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return await guard.call(lambda: provider.complete(**kwargs), is_failure=_is_retryable)
+        except Exception as e:
+            LLM_ERRORS.inc(provider=provider.name, error=type(e).__name__)
+            if attempt == LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            # Full jitter keeps retries from a burst of 429s from landing together
+            await asyncio.sleep(random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)))
+
+async def analyze_team_with_llm(team_data: str, mode: Optional[str] = None) -> dict:
+    """Analyze a Pokemon team with the provider for ``mode``, reusing cached analyses of the same team."""
     try:
         # Parse the team
         pokemon_list = parse_showdown_team(team_data)
@@ -128,114 +215,471 @@ def analyze_team_with_llm(team_data: str) -> dict:
                 "suggestions": []
             }
         
-        # Create a structured prompt
-        team_summary = "\n".join([
-            f"{p['name']} @ {p['item'] or 'No Item'}\n" +
-            f"Ability: {p['ability'] or 'Default'}\n" +
-            f"Level: {p['level'] or '50'}\n" +
-            f"Tera Type: {p['tera_type'] or 'None'}\n" +
-            f"Nature: {p['nature'] or 'Default'}\n" +
-            f"Moves: {', '.join(p['moves'])}\n" +
-            f"EVs: {p['evs']}\n" +
-            f"IVs: {p['ivs']}\n"
-            for p in pokemon_list
-        ])
-        
-        system_prompt = """You are an expert VGC (Video Game Championships) Pokemon coach and analyst.
-        Specifically, you are a coach for the Generation 9 (Scarlet and Violet) VGC formats. 
-        Analyze the given team and provide a comprehensive assessment in the following JSON format:
+        return await analyze_parsed_team(pokemon_list, mode=mode)
         
-        {
-            "grade": "A/B/C/D/F",
-            "strengths": [
-                {
-                    "point": "specific strength",
-                    "reasoning": "explanation of why this is a strength"
-                }
-            ],
-            "weaknesses": [
-                {
-                    "point": "specific weakness",
-                    "reasoning": "explanation of why this is a weakness"
-                }
-            ],
-            "threats": [
-                {
-                    "point": "specific threat",
-                    "reasoning": "explanation of why this is a threat"
-                }
-            ],
-            "suggestions": [
-                {
-                    "type": "move_change/item_change/ability_change/pokemon_swap",
-                    "description": "specific suggestion",
-                    "priority": "high/medium/low"
-                }
-            ]
+    except Exception as e:
+        return {
+            "error": f"Analysis failed: {str(e)}",
+            **error_fields(e),
+            "grade": None,
+            "strengths": [],
+            "weaknesses": [],
+            "threats": [],
+            "suggestions": []
         }
+
+async def analyze_parsed_team(pokemon_list: List[ShowdownPokemon], tier: str = "analyze", mode: Optional[str] = None) -> dict:
+    """Analyze an already parsed team through the cache and single-flight; errors propagate."""
+    provider = get_provider(mode)
+    if provider.kind == "rules":
+        return _rules_analysis(provider, pokemon_list, tier)
+    
+    key = team_cache_key(pokemon_list, provider.model)
+    async def cached_result():
+        cached = await _analysis_cache.aget(key)
+        if cached is not None:
+            return {**cached, "usage": {"tier": tier, "provider": provider.name, "cached": True}}
+        return None
+    
+    return await cached_result() or await _analysis_flights.run(
+        key, lambda: _run_analysis(key, pokemon_list, tier, provider), lookup=cached_result
+    )
+
+def _rules_analysis(provider, pokemon_list: List[ShowdownPokemon], tier: str) -> dict:
+    """Offline analyses are cheap enough to recompute, so they skip the cache."""
+    started = time.perf_counter()
+    analysis = provider.analyze(pokemon_list)
+    latency = round((time.perf_counter() - started) * 1000, 2)
+    return {**analysis, "usage": {"tier": tier, "provider": provider.name, "cached": False, "latency_ms": latency}}
+
+async def get_cached_analysis(pokemon_list: List[ShowdownPokemon], mode: Optional[str] = None) -> Optional[dict]:
+    provider = get_provider(mode)
+    if provider.kind == "rules":
+        return None
+    return await _analysis_cache.aget(team_cache_key(pokemon_list, provider.model))
+
+async def analyze_parsed_teams_packed(pokemon_lists: List[List[ShowdownPokemon]], mode: Optional[str] = None) -> List[Optional[dict]]:
+    """
+    Analyze several teams with a single completion. Each result is the
+    team's analysis, or None if the model's answer for it was unusable.
+    """
+    provider = get_provider(mode)
+    if provider.kind == "rules":
+        return [_rules_analysis(provider, pokemon_list, "batch") for pokemon_list in pokemon_lists]
+    
+    messages = _build_packed_messages(pokemon_lists)
+    async with _llm_slot():
+        started = time.perf_counter()
+        response = await _create_completion(
+            provider,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=TOKEN_BUDGETS["batch"].completion * len(pokemon_lists),
+            prompt_cache_key=ANALYSIS_PROMPT_CACHE_KEY,
+            **_format_options(provider, response_format(PackedAnalysis, "packed_team_analysis"))
+        )
+    usage = {**_record_usage("batch", provider, getattr(response, "usage", None), messages, started), "teams": len(pokemon_lists)}
+    
+    data = _decode_response(response.choices[0].message.content or "")
+    teams = data.get("teams") if isinstance(data, dict) else None
+    if not isinstance(teams, list):
+        teams = []
+    
+    results = []
+    for i, pokemon_list in enumerate(pokemon_lists):
+        analysis, invalid = _validate_analysis(teams[i] if i < len(teams) else None)
+        if invalid:
+            for field in invalid:
+                _invalid_fields[field] = _invalid_fields.get(field, 0) + 1
+            results.append(None)
+        else:
+            await _analysis_cache.aset(team_cache_key(pokemon_list, provider.model), analysis)
+            results.append({**analysis, "usage": usage})
+    return results
+
+def _stat_spread(stats: Dict[str, int], default: int) -> str:
+    """Compact spread like "252hp/4atk/252spd", leaving out stats at their default."""
+    keys = [k for k in STAT_ORDER if k in stats] + sorted(k for k in stats if k not in STAT_ORDER)
+    return "/".join(f"{stats[k]}{k}" for k in keys if stats[k] != default)
+
+def _compact_team(pokemon_list: List[ShowdownPokemon]) -> str:
+    """One line per Pokemon, leaving out anything at its default (see ANALYSIS_SYSTEM_PROMPT)."""
+    lines = []
+    for p in pokemon_list:
+        fields = [f"{p.name} @ {p.item}" if p.item else p.name]
+        if p.ability:
+            fields.append(p.ability)
+        if p.tera_type:
+            fields.append(f"Tera {p.tera_type}")
+        if p.nature:
+            fields.append(f"{p.nature} Nature")
+        evs = _stat_spread(p.evs, 0)
+        if evs:
+            fields.append(f"EVs {evs}")
+        ivs = _stat_spread(p.ivs, 31)
+        if ivs:
+            fields.append(f"IVs {ivs}")
+        if p.level and p.level != 50:
+            fields.append(f"Lv {p.level}")
+        fields.append(", ".join(p.moves))
+        lines.append(" | ".join(fields))
+    return "\n".join(lines)
+
+def _team_prompt(pokemon_list: List[ShowdownPokemon], budget: int) -> str:
+    """
+    The team listing plus locally computed stats and meta threats, leaving
+    out the optional sections that would take it over ``budget`` tokens.
+    """
+    sections = [_compact_team(pokemon_list)]
+    optional = [f"Computed team data (Level 50 unless stated):\n{format_team_stats(team_stats(pokemon_list))}"]
+    
+    # Only uses meta data already in memory, so building the prompt never waits on a scrape
+    table = peek_threat_table(ANALYSIS_THREATS_FORMAT) if ANALYSIS_THREATS_FORMAT else None
+    if table is not None and len(table):
+        threats = format_threats(threat_matrix(pokemon_list, table))
+        optional.append(f"Top meta threats by usage-weighted pressure:\n{threats}")
+    
+    used = count_tokens(sections[0], ANALYSIS_MODEL)
+    for section in optional:
+        size = count_tokens(section, ANALYSIS_MODEL)
+        if used + size <= budget:
+            sections.append(section)
+            used += size
+    
+    return "\n\n".join(sections)
+
+def _build_messages(pokemon_list: List[ShowdownPokemon], tier: str = "analyze") -> List[Dict]:
+    """Build the chat messages asking the model to analyze the team."""
+    header = "Please analyze this VGC team:\n\n"
+    system = {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT}
+    budget = TOKEN_BUDGETS[tier].prompt - count_message_tokens([system, {"content": header}], ANALYSIS_MODEL)
+    
+    return [
+        system,
+        {"role": "user", "content": header + _team_prompt(pokemon_list, budget)}
+    ]
+
+def _build_packed_messages(pokemon_lists: List[List[ShowdownPokemon]]) -> List[Dict]:
+    """Build one request that asks for analyses of several teams at once."""
+    budget = TOKEN_BUDGETS["batch"].prompt
+    teams = "\n\n".join(f"Team {i}:\n{_team_prompt(team, budget)}" for i, team in enumerate(pokemon_lists, start=1))
+    user_prompt = f"Please analyze these {len(pokemon_lists)} VGC teams:\n\n{teams}"
+    
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "system", "content": PACKED_ANALYSIS_INSTRUCTIONS},
+        {"role": "user", "content": user_prompt}
+    ]
+
+# Token and latency totals per tier since startup, for measuring prompt savings
+_usage_totals: Dict[str, Dict[str, float]] = {}
+_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_prompt_tokens", "latency_ms")
+
+def _record_usage(tier: str, provider, usage, messages: List[Dict], started: float) -> dict:
+    """
+    Per-request token and latency report, added to the running totals.
+    
+    prompt/completion tokens come from the provider's usage block when it
+    sends one; estimated_prompt_tokens is the local count made before sending.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    estimated = count_message_tokens(messages, provider.model)
+    report = {
+        "tier": tier,
+        "provider": provider.name,
+        "cached": False,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "cached_prompt_tokens": getattr(details, "cached_tokens", None) or 0,
+        "estimated_prompt_tokens": estimated,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    
+    totals = _usage_totals.setdefault(tier, {"requests": 0, **dict.fromkeys(_USAGE_FIELDS, 0)})
+    totals["requests"] += 1
+    totals["prompt_tokens"] += report["prompt_tokens"] if report["prompt_tokens"] is not None else estimated
+    totals["completion_tokens"] += report["completion_tokens"] or 0
+    totals["cached_prompt_tokens"] += report["cached_prompt_tokens"]
+    totals["latency_ms"] += report["latency_ms"]
+    
+    LLM_LATENCY.observe(report["latency_ms"] / 1000, provider=provider.name, tier=tier)
+    LLM_TOKENS.inc(report["prompt_tokens"] if report["prompt_tokens"] is not None else estimated,
+                   provider=provider.name, tier=tier, kind="prompt")
+    LLM_TOKENS.inc(report["completion_tokens"] or 0, provider=provider.name, tier=tier, kind="completion")
+    LLM_TOKENS.inc(report["cached_prompt_tokens"], provider=provider.name, tier=tier, kind="cached_prompt")
+    return report
+
+def get_usage_totals() -> dict:
+    """Token and latency totals per tier, with per-request averages."""
+    tiers = {}
+    for tier, totals in _usage_totals.items():
+        requests = totals["requests"] or 1
+        tiers[tier] = {
+            **totals,
+            "latency_ms": round(totals["latency_ms"], 1),
+            "avg_prompt_tokens": round(totals["prompt_tokens"] / requests, 1),
+            "avg_completion_tokens": round(totals["completion_tokens"] / requests, 1),
+            "avg_latency_ms": round(totals["latency_ms"] / requests, 1),
+        }
+    return {
+        "routes": ANALYSIS_ROUTES,
+        "models": {name: provider.model for name, provider in providers.items()},
+        "tokenizer": "tiktoken" if is_exact(ANALYSIS_MODEL) else "estimate",
+        "budgets": {tier: budget._asdict() for tier, budget in TOKEN_BUDGETS.items()},
+        "tiers": tiers,
+    }
+
+def _use_structured_output(model: str) -> bool:
+    if ANALYSIS_STRUCTURED_OUTPUT == "auto":
+        return not (model == "gpt-4" or model.startswith(("gpt-4-", "gpt-3.5")))
+    return ANALYSIS_STRUCTURED_OUTPUT in ("1", "true", "yes", "on")
+
+def _format_options(provider, format: dict) -> dict:
+    """Extra completion arguments requesting ``format`` when structured outputs are on."""
+    return {"response_format": format} if _use_structured_output(provider.model) else {}
+
+# How model output fared, so wasted completions show up: responses that were
+# clean JSON, needed repair or were unusable, fields that failed validation,
+# section retries and what they recovered, and analyses returned incomplete
+_parse_stats = dict.fromkeys(
+    ("responses", "clean", "repaired", "unparseable", "section_retries", "recovered_fields", "incomplete"), 0
+)
+_invalid_fields: Dict[str, int] = {}
+
+def get_parse_stats() -> dict:
+    return {
+        **_parse_stats,
+        "invalid_fields": dict(_invalid_fields),
+        "structured_output": {
+            name: _use_structured_output(provider.model) for name, provider in providers.items() if provider.kind == "chat"
+        },
+    }
+
+def _decode_response(text: str):
+    """Decode model output as JSON, repairing it if needed; None if nothing usable."""
+    _parse_stats["responses"] += 1
+    try:
+        data = json.loads(text)
+        _parse_stats["clean"] += 1
+        LLM_PARSE.inc(result="clean")
+        return data
+    except json.JSONDecodeError:
+        pass
+    data = repair_json(text)
+    result = "repaired" if data is not None else "unparseable"
+    _parse_stats[result] += 1
+    LLM_PARSE.inc(result=result)
+    return data
+
+def _validate_analysis(data, fields: Tuple[str, ...] = ANALYSIS_FIELDS) -> Tuple[dict, List[str]]:
+    """
+    Keep the valid parts of a decoded analysis. Items that don't match the
+    response models are dropped; a field is invalid if it is missing, has
+    the wrong shape, or every one of its items was dropped.
+    Returns (analysis, invalid fields).
+    """
+    if not isinstance(data, dict):
+        return {}, list(fields)
+    analysis, invalid = {}, []
+    for field in fields:
+        value = data.get(field)
+        if field == "grade":
+            grade = value.strip().upper() if isinstance(value, str) else None
+            if grade in GRADES:
+                analysis[field] = grade
+            else:
+                invalid.append(field)
+            continue
+        if not isinstance(value, list):
+            invalid.append(field)
+            continue
+        items = []
+        for item in value:
+            try:
+                items.append(SECTION_MODELS[field].model_validate(item).model_dump())
+            except Exception:
+                continue
+        if value and not items:
+            invalid.append(field)
+        else:
+            analysis[field] = items
+    return analysis, invalid
+
+def _parse_analysis(text: str, fields: Tuple[str, ...] = ANALYSIS_FIELDS) -> Tuple[dict, List[str]]:
+    analysis, invalid = _validate_analysis(_decode_response(text), fields)
+    for field in invalid:
+        _invalid_fields[field] = _invalid_fields.get(field, 0) + 1
+    return analysis, invalid
+
+async def _retry_sections(provider, messages: List[Dict], analysis: dict, invalid: List[str], tier: str) -> Tuple[dict, List[str]]:
+    """Re-request only the invalid fields of an analysis, keeping the valid ones."""
+    analysis = dict(analysis)
+    for _ in range(ANALYSIS_SECTION_RETRIES):
+        if not invalid:
+            break
+        _parse_stats["section_retries"] += 1
+        retry_messages = messages + [{
+            "role": "user",
+            "content": f"Respond with only a JSON object with these fields, in the format above: {', '.join(invalid)}"
+        }]
+        try:
+            async with _llm_slot():
+                started = time.perf_counter()
+                response = await _create_completion(
+                    provider,
+                    messages=retry_messages,
+                    temperature=0.7,
+                    max_tokens=max(150, TOKEN_BUDGETS[tier].completion * len(invalid) // len(ANALYSIS_FIELDS)),
+                    prompt_cache_key=ANALYSIS_PROMPT_CACHE_KEY,
+                    **_format_options(provider, sections_response_format(invalid))
+                )
+        except Exception:
+            # Keep what the first answer got right rather than failing the whole analysis
+            break
+        _record_usage(tier, provider, getattr(response, "usage", None), retry_messages, started)
         
-        Consider:
-        - Type coverage and synergy
-        - Speed control and positioning
-        - Common meta threats
-        - Item optimization
-        - Move coverage
-        - Team composition balance
-        - Current VGC meta trends
-        
-        For each strength, weakness, and threat, provide a clear explanation of WHY it's important."""
-        
-        user_prompt = f"Please analyze this VGC team:\n\n{team_summary}"
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        part, still_invalid = _parse_analysis(response.choices[0].message.content or "", tuple(invalid))
+        analysis.update(part)
+        _parse_stats["recovered_fields"] += len(part)
+        invalid = still_invalid
+    return analysis, invalid
+
+def _complete_analysis(analysis: dict, invalid: List[str]) -> dict:
+    """Fill fields that could not be recovered so the response keeps its shape, and flag them."""
+    if not invalid:
+        return analysis
+    _parse_stats["incomplete"] += 1
+    analysis = {"grade": None, **{section: [] for section in ANALYSIS_SECTIONS}, **analysis, "incomplete": invalid}
+    if len(invalid) == len(ANALYSIS_FIELDS):
+        analysis["error"] = "Could not parse the analysis"
+    return analysis
+
+async def _run_analysis(key: str, pokemon_list: List[ShowdownPokemon], tier: str, provider) -> dict:
+    """Ask the model for an analysis, re-requesting invalid sections, and cache it if complete."""
+    messages = _build_messages(pokemon_list, tier)
+    async with _llm_slot():
+        started = time.perf_counter()
+        response = await _create_completion(
+            provider,
+            messages=messages,
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=TOKEN_BUDGETS[tier].completion,
+            prompt_cache_key=ANALYSIS_PROMPT_CACHE_KEY,
+            **_format_options(provider, response_format(TeamAnalysis, "team_analysis"))
         )
+    usage = _record_usage(tier, provider, getattr(response, "usage", None), messages, started)
+    
+    analysis, invalid = _parse_analysis(response.choices[0].message.content or "")
+    if invalid:
+        analysis, invalid = await _retry_sections(provider, messages, analysis, invalid, tier)
+    
+    # Incomplete analyses are not worth keeping; a later request may get a full one
+    if not invalid:
+        await _analysis_cache.aset(key, analysis)
+    
+    return {**_complete_analysis(analysis, invalid), "usage": usage}
+
+async def stream_team_analysis(team_data: str, mode: Optional[str] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Analyze a team, yielding (event, data) pairs as the model streams its answer.
+    
+    Events are "token" for each raw text delta, "grade" once the grade is known,
+    "item" for each completed strengths/weaknesses/threats/suggestions entry,
+    and finally "done" with the full analysis (or "error"). Fields the streamed
+    answer got wrong are re-requested afterwards and re-sent from index 0.
+    """
+    try:
+        pokemon_list = parse_showdown_team(team_data)
         
-        # Parse the response
-        analysis_text = response.choices[0].message.content
+        if not pokemon_list:
+            yield "error", {"error": "Invalid team format. Please use Pokemon Showdown format."}
+            return
         
-        # Try to extract JSON from the response
-        try:
-            import json
-            # Find JSON in the response
-            start_idx = analysis_text.find('{')
-            end_idx = analysis_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_str = analysis_text[start_idx:end_idx]
-                analysis = json.loads(json_str)
-            else:
-                # Fallback if no JSON found
-                analysis = {
-                    "grade": "B",
-                    "strengths": [{"point": "Team analysis completed", "reasoning": "Basic analysis was successful"}],
-                    "weaknesses": [{"point": "Could not parse detailed analysis", "reasoning": "LLM response format was unclear"}],
-                    "threats": [{"point": "Common meta threats", "reasoning": "Standard VGC meta considerations apply"}],
-                    "suggestions": [{"type": "general", "description": "Consider reviewing team composition", "priority": "medium"}]
-                }
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            analysis = {
-                "grade": "B",
-                "strengths": [{"point": "Team analysis completed", "reasoning": "Basic analysis was successful"}],
-                "weaknesses": [{"point": "Could not parse detailed analysis", "reasoning": "LLM response format was unclear"}],
-                "threats": [{"point": "Common meta threats", "reasoning": "Standard VGC meta considerations apply"}],
-                "suggestions": [{"type": "general", "description": "Consider reviewing team composition", "priority": "medium"}]
-            }
+        provider = get_provider(mode)
+        if provider.kind == "rules":
+            for event in _replay_analysis(_rules_analysis(provider, pokemon_list, "stream")):
+                yield event
+            return
         
-        return analysis
+        key = team_cache_key(pokemon_list, provider.model)
+        cached = await _analysis_cache.aget(key)
+        if cached is not None:
+            for event in _replay_analysis({**cached, "usage": {"tier": "stream", "provider": provider.name, "cached": True}}):
+                yield event
+            return
+        
+        parser = IncrementalJSONParser()
+        text_parts = []
+        usage = None
+        messages = _build_messages(pokemon_list, "stream")
+        # The slot is held for the whole stream, not just until the first token
+        async with _llm_slot():
+            started = time.perf_counter()
+            stream = await _create_completion(
+                provider,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=TOKEN_BUDGETS["stream"].completion,
+                prompt_cache_key=ANALYSIS_PROMPT_CACHE_KEY,
+                stream=True,
+                stream_options={"include_usage": True},
+                **_format_options(provider, response_format(TeamAnalysis, "team_analysis"))
+            )
+            async for chunk in stream:
+                # The usage block arrives on a final chunk with no choices
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                text_parts.append(delta)
+                yield "token", {"text": delta}
+                
+                if parser is None:
+                    continue
+                try:
+                    events = parser.feed(delta)
+                except json.JSONDecodeError:
+                    # Malformed output; the final parse below decides what to return
+                    parser = None
+                    continue
+                for event in events:
+                    for stream_event in _stream_event(event):
+                        yield stream_event
+        
+        usage = _record_usage("stream", provider, usage, messages, started)
+        analysis, invalid = _parse_analysis("".join(text_parts))
+        if invalid:
+            retried = invalid
+            analysis, invalid = await _retry_sections(provider, messages, analysis, invalid, "stream")
+            for event in _replay_analysis(analysis, [f for f in retried if f not in invalid]):
+                yield event
+        if not invalid:
+            await _analysis_cache.aset(key, analysis)
+        yield "done", {**_complete_analysis(analysis, invalid), "usage": usage}
         
     except Exception as e:
-        return {
-            "error": f"Analysis failed: {str(e)}",
-            "grade": None,
-            "strengths": [],
-            "weaknesses": [],
-            "threats": [],
-            "suggestions": []
-        } 
\ No newline at end of file
+        yield "error", {"error": f"Analysis failed: {str(e)}", **error_fields(e)}
+
+def _stream_event(event: tuple) -> Iterator[Tuple[str, dict]]:
+    """Translate an IncrementalJSONParser event into an analysis stream event."""
+    if event[0] == "field" and event[1] == "grade":
+        grade, _ = _validate_analysis({"grade": event[2]}, ("grade",))
+        if grade:
+            yield "grade", grade
+    elif event[0] == "item" and event[1] in ANALYSIS_SECTIONS:
+        yield "item", {"section": event[1], "index": event[2], "item": event[3]}
+
+def _replay_analysis(analysis: dict, fields: Optional[List[str]] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Stream an already complete analysis using the same events as a live one.
+    With ``fields``, only send those (no "done"), e.g. sections recovered by a retry.
+    """
+    for field in ANALYSIS_FIELDS if fields is None else fields:
+        if field == "grade":
+            yield "grade", {"grade": analysis.get("grade")}
+            continue
+        for index, item in enumerate(analysis.get(field) or []):
+            yield "item", {"section": field, "index": index, "item": item}
+    if fields is None:
+        yield "done", analysis
\ No newline at end of file
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from services import history, pikalytics
+from services.metrics import HISTORY_WRITE_ERRORS
+
+load_dotenv()
+
+# Formats kept warm in memory and how often (seconds) each is re-scraped
+META_FORMATS = [f.strip() for f in os.getenv("META_FORMATS", "ss").split(",") if f.strip()]
+META_REFRESH_INTERVAL = float(os.getenv("META_REFRESH_INTERVAL", "900"))
+# Retry a failing format sooner than the normal interval
+META_RETRY_INTERVAL = float(os.getenv("META_RETRY_INTERVAL", "60"))
+
+
+class FormatHealth:
+    """Refresh bookkeeping for one format."""
+
+    __slots__ = ("last_attempt", "last_success", "last_error", "consecutive_failures")
+
+    def __init__(self):
+        self.last_attempt: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+
+
+class MetaScheduler:
+    """
+    Re-scrapes each configured format on an interval and publishes an
+    immutable MetaSnapshot, so /meta requests never wait on Pikalytics.
+    
+    A failed refresh keeps the previous snapshot in place.
+    """
+
+    def __init__(self, formats: List[str], interval: float = META_REFRESH_INTERVAL,
+                 retry_interval: float = META_RETRY_INTERVAL):
+        self.formats = list(formats)
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.health: Dict[str, FormatHealth] = {f: FormatHealth() for f in self.formats}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def refresh(self, format_name: str) -> bool:
+        """Scrape one format and publish a new snapshot. Returns True on success."""
+        health = self.health.setdefault(format_name, FormatHealth())
+        health.last_attempt = time.time()
+        try:
+            meta = await pikalytics.load_pikalytics_meta(format_name)
+            if "error" in meta:
+                raise RuntimeError(meta["error"])
+            snapshot = await asyncio.to_thread(pikalytics.build_meta_snapshot, format_name, meta)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            health.last_error = str(e)
+            health.consecutive_failures += 1
+            return False
+
+        pikalytics.publish_snapshot(snapshot)
+        health.last_success = snapshot.created_at
+        health.last_error = None
+        health.consecutive_failures = 0
+        await self._record(snapshot)
+        return True
+
+    async def _record(self, snapshot: pikalytics.MetaSnapshot) -> None:
+        """Append the snapshot to the usage history; history is best-effort."""
+        if history.meta_history is None:
+            return
+        rows = [
+            {"pokemon": pikalytics.normalize_pokemon_name(p["name"]), "name": p["name"], "usage": p["usage"], "rank": rank}
+            for rank, p in enumerate(snapshot.ranking, start=1)
+        ]
+        try:
+            await asyncio.to_thread(history.meta_history.record_usage, snapshot.format, rows, snapshot.created_at)
+        except Exception as e:
+            HISTORY_WRITE_ERRORS.inc(kind="usage", error=type(e).__name__)
+
+    async def refresh_all(self) -> bool:
+        results = await asyncio.gather(*(self.refresh(f) for f in self.formats))
+        return all(results)
+
+    async def run(self) -> None:
+        while True:
+            ok = await self.refresh_all()
+            self._ready.set()
+            await asyncio.sleep(self.interval if ok else min(self.interval, self.retry_interval))
+
+    def start(self) -> None:
+        if self._task is None and self.formats:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def wait_ready(self) -> None:
+        """Wait until the first refresh round has finished (successfully or not)."""
+        await self._ready.wait()
+
+    def status(self, format_name: str) -> Optional[dict]:
+        """Snapshot age and refresh health for a format, or None if it isn't scheduled."""
+        health = self.health.get(format_name)
+        if health is None:
+            return None
+        snapshot = pikalytics.get_snapshot(format_name)
+        return {
+            "age_seconds": round(snapshot.age, 1) if snapshot is not None else None,
+            "created_at": snapshot.created_at if snapshot is not None else None,
+            "refresh_interval": self.interval,
+            "last_attempt": health.last_attempt,
+            "last_success": health.last_success,
+            "last_error": health.last_error,
+            "consecutive_failures": health.consecutive_failures,
+            "healthy": health.consecutive_failures == 0 and snapshot is not None
+        }
+
+
+scheduler = MetaScheduler(META_FORMATS)
\ No newline at end of file
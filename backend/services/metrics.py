@@ -0,0 +1,272 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Opt-in profiling: requests carrying "X-Profile: <PROFILE_TOKEN>" are run
+# under cProfile, and PROFILE_SAMPLE_RATE (0-1) samples requests at random.
+# Both are off unless configured. Dumps are written to PROFILE_DIR as .prof
+# files (open with pstats or snakeviz), and the file name is returned in the
+# X-Profile-File response header.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_HEADER = b"x-profile"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """A named metric with a fixed set of label names, in Prometheus text format."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], object] = {}
+        # Observed from threadpool workers as well as the event loop
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield f"{self.name}{self._labels(key)} {_format_value(value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield f"{self.name}_bucket{self._labels(key, (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_value(state[-1])}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+
+registry: List[Metric] = []
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+HTTP_REQUESTS = Counter("vgchat_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("vgchat_http_request_duration_seconds", "Time to serve a request, including streamed bodies.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("vgchat_http_requests_in_flight", "Requests being served.", ("method",))
+UPSTREAM_LATENCY = Histogram("vgchat_upstream_request_duration_seconds", "Outbound fetches (Pikalytics, Pokepaste).", ("upstream", "outcome"))
+UPSTREAM_IN_FLIGHT = Gauge("vgchat_upstream_requests_in_flight", "Outbound fetches in progress.", ("upstream",))
+UPSTREAM_REJECTED = Counter("vgchat_upstream_rejected_total", "Upstream calls refused locally (circuit_open, rate_limited).", ("upstream", "reason"))
+UPSTREAM_CIRCUIT_OPEN = Gauge("vgchat_upstream_circuit_open", "1 while an upstream's circuit breaker is open.", ("upstream",))
+PARSE_LATENCY = Histogram("vgchat_parse_duration_seconds", "HTML and text extraction time.", ("parser",))
+LLM_LATENCY = Histogram("vgchat_llm_request_duration_seconds", "Completed model requests, start to last token.", ("provider", "tier"))
+LLM_IN_FLIGHT = Gauge("vgchat_llm_requests_in_flight", "Model requests holding an upstream slot.")
+LLM_ERRORS = Counter("vgchat_llm_errors_total", "Failed model request attempts.", ("provider", "error"))
+LLM_TOKENS = Counter("vgchat_llm_tokens_total", "Model tokens by kind (prompt, completion, cached_prompt).", ("provider", "tier", "kind"))
+LLM_PARSE = Counter("vgchat_llm_responses_total", "Model responses by how they parsed.", ("result",))
+HISTORY_WRITE_ERRORS = Counter("vgchat_history_write_errors_total", "Meta history writes that failed (sets, usage).", ("kind", "error"))
+CACHE_REQUESTS = Counter("vgchat_cache_requests_total", "Cache lookups by result (hit, stale, miss).", ("cache", "result"))
+
+
+def cache_result(cache: Optional[str], result: str) -> None:
+    if cache is not None:
+        CACHE_REQUESTS.inc(cache=cache, result=result)
+
+@contextmanager
+def track_upstream(upstream: str):
+    """Time one outbound fetch and count it as in flight; outcome is "error" if it raises."""
+    started = time.perf_counter()
+    outcome = "error"
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, upstream=upstream, outcome=outcome)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route request counts, latency and in-flight
+    requests. Latency runs until the last body chunk is sent, so streamed
+    responses are measured in full. Routes are labelled by their path template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=status)
+
+
+_profiling = threading.Lock()
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware running opted-in requests under cProfile.
+
+    cProfile sees everything on the event loop thread, so a dump also
+    includes other requests that were served at the same time; only one
+    request is profiled at a time.
+    """
+
+    def __init__(self, app, token: str = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 directory: str = PROFILE_DIR):
+        self.app = app
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.directory = directory
+
+    def _wanted(self, scope) -> bool:
+        if self.token:
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER and value == self.token:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope) or not _profiling.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{random.randrange(16 ** 6):06x}.prof"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-file", filename.encode())]}
+            await send(message)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(profile.dump_stats, os.path.join(self.directory, filename))
+        finally:
+            _profiling.release()
@@ -1,8 +1,142 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import os
+import httpx
+from bs4 import BeautifulSoup, UnicodeDammit
+from dotenv import load_dotenv
 import json
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 import time
+from services import history
+from services.cache import LRUCache, SWRCache, TieredCache, shared_cache, single_flight
+from services.http_client import BROWSER_HEADERS, get_client
+from services.metrics import HISTORY_WRITE_ERRORS, PARSE_LATENCY, track_upstream
+from services.reference import reference, species_name
+from services.resilience import error_fields, upstream
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - lxml is optional, bs4 is the fallback
+    etree = None
+
+load_dotenv()
+
+# Usage data changes roughly daily; serve cached snapshots for META_CACHE_TTL
+# seconds and keep serving them (while refreshing in the background) for up to
+# META_CACHE_STALE_TTL more seconds.
+META_CACHE_TTL = float(os.getenv("META_CACHE_TTL", "900"))
+META_CACHE_STALE_TTL = float(os.getenv("META_CACHE_STALE_TTL", "86400"))
+
+_meta_cache = SWRCache(
+    ttl=META_CACHE_TTL,
+    stale_ttl=META_CACHE_STALE_TTL,
+    should_cache=lambda data: "error" not in data,
+    name="pikalytics_meta"
+)
+# With SHARED_CACHE_PATH set, one worker's scrape serves the others' refreshes
+# for META_CACHE_TTL seconds
+_shared_meta = shared_cache("pikalytics_meta", ttl=META_CACHE_TTL)
+_meta_flights = single_flight("pikalytics_meta")
+
+# Per-Pokemon sets, keyed by (format, normalized name). Bounded so a crawl of
+# obscure Pokemon can't grow memory without limit.
+SETS_CACHE_SIZE = int(os.getenv("SETS_CACHE_SIZE", "512"))
+SETS_CACHE_TTL = float(os.getenv("SETS_CACHE_TTL", "21600"))
+# Expired sets are kept this much longer to serve when Pikalytics is failing
+SETS_CACHE_STALE_TTL = float(os.getenv("SETS_CACHE_STALE_TTL", "86400"))
+SETS_PREFETCH_TOP_N = int(os.getenv("SETS_PREFETCH_TOP_N", "50"))
+SETS_PREFETCH_CONCURRENCY = int(os.getenv("SETS_PREFETCH_CONCURRENCY", "8"))
+SETS_PREFETCH_FORMAT = os.getenv("SETS_PREFETCH_FORMAT", "ss")
+
+# HTML extraction backend: "lxml" (compiled XPath, single pass) or "bs4"
+PIKALYTICS_PARSER = os.getenv("PIKALYTICS_PARSER", "lxml" if etree is not None else "bs4")
+
+_sets_cache = TieredCache(
+    LRUCache(maxsize=SETS_CACHE_SIZE, ttl=SETS_CACHE_TTL, stale_ttl=SETS_CACHE_STALE_TTL),
+    shared_cache("pikalytics_sets", ttl=SETS_CACHE_TTL, stale_ttl=SETS_CACHE_STALE_TTL),
+    name="pikalytics_sets"
+)
+_sets_flights = single_flight("pikalytics_sets")
+
+# Default size of the /meta usage table
+META_TOP_N = int(os.getenv("META_TOP_N", "20"))
+
+
+@dataclass(frozen=True)
+class MetaSnapshot:
+    """
+    An immutable, fully precomputed view of one format's usage data.
+    
+    Built once per refresh by services/meta_scheduler.py so request handlers
+    only ever read prebuilt payloads.
+    """
+
+    format: str
+    meta: dict
+    ranking: Tuple[dict, ...]
+    rank_index: Mapping[str, int]
+    top: Mapping[int, dict] = field(repr=False)
+    created_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def usage_stats(self, limit: int = META_TOP_N) -> dict:
+        """The get_usage_stats payload, prebuilt for the common limits."""
+        payload = self.top.get(limit)
+        if payload is None:
+            payload = self._usage_payload(self.format, self.meta, self.ranking, limit)
+        return payload
+
+    @staticmethod
+    def _usage_payload(format_name: str, meta: dict, ranking: Tuple[dict, ...], limit: int) -> dict:
+        return {
+            "format": format_name,
+            "top_pokemon": list(ranking[:limit]),
+            "total_pokemon": meta["total_pokemon"],
+            "scraped_at": meta["scraped_at"]
+        }
+
+def build_meta_snapshot(format_name: str, meta: dict, limits: Tuple[int, ...] = ()) -> MetaSnapshot:
+    """Precompute the sorted ranking, name index and top-N payloads for a scrape."""
+    ranking = tuple(sorted(meta["pokemon"], key=lambda x: x["usage"], reverse=True))
+    rank_index = {}
+    for rank, pokemon in enumerate(ranking, start=1):
+        rank_index.setdefault(normalize_pokemon_name(pokemon["name"]), rank)
+    top = {
+        limit: MetaSnapshot._usage_payload(format_name, meta, ranking, limit)
+        for limit in {META_TOP_N, SETS_PREFETCH_TOP_N, *limits}
+    }
+    return MetaSnapshot(
+        format=format_name,
+        meta=meta,
+        ranking=ranking,
+        rank_index=MappingProxyType(rank_index),
+        top=MappingProxyType(top),
+        created_at=time.time()
+    )
+
+# Latest snapshot per format, published by the background refresher. Formats
+# with a snapshot are served from it with no upstream I/O.
+_snapshots: Dict[str, MetaSnapshot] = {}
+
+def publish_snapshot(snapshot: MetaSnapshot) -> None:
+    _snapshots[snapshot.format] = snapshot
+
+def get_snapshot(format_name: str) -> Optional[MetaSnapshot]:
+    return _snapshots.get(format_name)
+
+def normalize_pokemon_name(pokemon_name: str) -> str:
+    """
+    Normalize a Pokemon name for cache keys and Pikalytics URLs. Nicknames
+    and aliases resolve to the species first, so "Bob (Urshifu-R)" and
+    "Urshifu-Rapid-Strike" share one cache entry. Misspellings are left as
+    they are rather than guessed at, so they never fetch another Pokemon's page.
+    """
+    return (reference.species(pokemon_name) or species_name(pokemon_name)).strip().lower()
 
 def get_data(tag, num_spaces=1):
     """
@@ -32,81 +166,48 @@ def format_data(element_tag, desired_length=2, num_spaces=1, start_index=0, end_
             prelim_data[i].insert(1, ' ')
     return prelim_data
 
-def scrape_pikalytics_meta(format_name: str = "sv") -> dict:
+async def _get_page(url: str) -> httpx.Response:
+    """GET a Pikalytics page through the shared rate limit, timeout and circuit breaker."""
+    async def get():
+        with track_upstream("pikalytics"):
+            response = await get_client().get(url, headers=BROWSER_HEADERS)
+            response.raise_for_status()
+            return response
+    return await upstream("pikalytics").call(get)
+
+async def scrape_pikalytics_meta(format_name: str = "sv") -> dict:
+    """Get meta data for the specified format, served from its snapshot or the per-format cache."""
+    snapshot = _snapshots.get(format_name)
+    if snapshot is not None:
+        return snapshot.meta
+    return await _meta_cache.get(format_name, lambda: load_pikalytics_meta(format_name))
+
+async def load_pikalytics_meta(format_name: str = "sv") -> dict:
+    """Scrape meta data, reusing a recent scrape by another worker when the cache is shared."""
+    if _shared_meta is None:
+        return await fetch_pikalytics_meta(format_name)
+    meta = await _shared_meta.aget(format_name)
+    if meta is None:
+        meta = await _meta_flights.run(format_name, lambda: _fetch_shared_meta(format_name),
+                                       lookup=lambda: _shared_meta.aget(format_name))
+    return meta
+
+async def _fetch_shared_meta(format_name: str) -> dict:
+    meta = await fetch_pikalytics_meta(format_name)
+    if "error" not in meta:
+        await _shared_meta.aset(format_name, meta)
+    return meta
+
+async def fetch_pikalytics_meta(format_name: str = "sv") -> dict:
     """Scrape meta data from Pikalytics for the specified format."""
     try:
         # Use the main Pikalytics page which shows current VGC format
         url = "https://www.pikalytics.com/"
         
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
+        response = await _get_page(url)
         
-        # Extract Pokemon data from the main page
-        pokemon_data = []
-        
-        # Look for Pokemon entries in the main content area
-        # Based on the page structure, we need to find the Pokemon list
-        pokemon_elements = soup.find_all('div', class_='pokemon-entry') or soup.find_all('div', class_='pokemon')
-        
-        if not pokemon_elements:
-            # Try alternative selectors based on the page structure
-            pokemon_elements = soup.find_all('div', {'data-pokemon': True}) or soup.find_all('span', class_='pokemon-name')
-        
-        for element in pokemon_elements:
-            try:
-                # Extract Pokemon name and usage from the element
-                name_element = element.find('span', class_='pokemon-name') or element.find('div', class_='name')
-                usage_element = element.find('span', class_='usage') or element.find('div', class_='usage')
-                
-                if name_element:
-                    name = name_element.text.strip()
-                    usage = 0.0
-                    
-                    if usage_element:
-                        usage_text = usage_element.text.strip()
-                        try:
-                            usage = float(usage_text.replace('%', ''))
-                        except ValueError:
-                            usage = 0.0
-                    
-                    pokemon_data.append({
-                        'name': name,
-                        'usage': usage,
-                        'rank': len(pokemon_data) + 1
-                    })
-            except (AttributeError, ValueError) as e:
-                continue
-        
-        # If we couldn't find structured data, try to extract from text content
-        if not pokemon_data:
-            # Look for patterns in the page text that indicate Pokemon usage
-            page_text = soup.get_text()
-            # This is a fallback - we might need to adjust based on actual page structure
-            lines = page_text.split('\n')
-            for line in lines:
-                if '%' in line and any(char.isalpha() for char in line):
-                    # Try to extract Pokemon name and usage from text
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if '%' in part and i > 0:
-                            try:
-                                usage = float(part.replace('%', ''))
-                                name = ' '.join(parts[:i])
-                                if len(name) > 0 and usage > 0:
-                                    pokemon_data.append({
-                                        'name': name,
-                                        'usage': usage,
-                                        'rank': len(pokemon_data) + 1
-                                    })
-                            except ValueError:
-                                continue
+        # Parsing is CPU-bound; keep it off the event loop
+        pokemon_data = await asyncio.to_thread(parse_meta_page, response.content)
         
         return {
             "format": "VGC 2025 Regulation Set I",  # Current format from the page
@@ -115,9 +216,10 @@ def scrape_pikalytics_meta(format_name: str = "sv") -> dict:
             "scraped_at": time.time()
         }
         
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         return {
             "error": f"HTTP Error {e.response.status_code}: {str(e)}",
+            **error_fields(e),
             "format": format_name,
             "pokemon": [],
             "total_pokemon": 0,
@@ -126,104 +228,117 @@ def scrape_pikalytics_meta(format_name: str = "sv") -> dict:
     except Exception as e:
         return {
             "error": f"Failed to scrape Pikalytics: {str(e)}",
+            **error_fields(e),
             "format": format_name,
             "pokemon": [],
             "total_pokemon": 0,
             "scraped_at": time.time()
         }
 
-def get_pokemon_sets(pokemon_name: str, format_name: str = "sv") -> dict:
+def _parse_meta_page_bs4(content: bytes) -> List[Dict]:
+    """Extract the usage list from the Pikalytics landing page with BeautifulSoup."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Extract Pokemon data from the main page
+    pokemon_data = []
+
+    # Look for Pokemon entries in the main content area
+    # Based on the page structure, we need to find the Pokemon list
+    pokemon_elements = soup.find_all('div', class_='pokemon-entry') or soup.find_all('div', class_='pokemon')
+
+    if not pokemon_elements:
+        # Try alternative selectors based on the page structure
+        pokemon_elements = soup.find_all('div', {'data-pokemon': True}) or soup.find_all('span', class_='pokemon-name')
+
+    for element in pokemon_elements:
+        try:
+            # Extract Pokemon name and usage from the element
+            name_element = element.find('span', class_='pokemon-name') or element.find('div', class_='name')
+            usage_element = element.find('span', class_='usage') or element.find('div', class_='usage')
+
+            if name_element:
+                name = name_element.text.strip()
+                usage = 0.0
+
+                if usage_element:
+                    usage_text = usage_element.text.strip()
+                    try:
+                        usage = float(usage_text.replace('%', ''))
+                    except ValueError:
+                        usage = 0.0
+
+                pokemon_data.append({
+                    'name': name,
+                    'usage': usage,
+                    'rank': len(pokemon_data) + 1
+                })
+        except (AttributeError, ValueError):
+            continue
+
+    # If we couldn't find structured data, try to extract from text content
+    if not pokemon_data:
+        # Look for patterns in the page text that indicate Pokemon usage
+        page_text = soup.get_text()
+        # This is a fallback - we might need to adjust based on actual page structure
+        lines = page_text.split('\n')
+        for line in lines:
+            if '%' in line and any(char.isalpha() for char in line):
+                # Try to extract Pokemon name and usage from text
+                parts = line.split()
+                for i, part in enumerate(parts):
+                    if '%' in part and i > 0:
+                        try:
+                            usage = float(part.replace('%', ''))
+                            name = ' '.join(parts[:i])
+                            if len(name) > 0 and usage > 0:
+                                pokemon_data.append({
+                                    'name': name,
+                                    'usage': usage,
+                                    'rank': len(pokemon_data) + 1
+                                })
+                        except ValueError:
+                            continue
+
+    return pokemon_data
+
+async def get_pokemon_sets(pokemon_name: str, format_name: str = "sv") -> dict:
+    """Get common sets for a specific Pokemon, served from the LRU cache when possible."""
+    key = (format_name, normalize_pokemon_name(pokemon_name))
+    cached = await _sets_cache.aget(key)
+    if cached is None:
+        cached = await _sets_flights.run(key, lambda: _load_pokemon_sets(key, pokemon_name, format_name),
+                                         lookup=lambda: _sets_cache.aget(key))
+    if cached.get("pokemon") != pokemon_name:
+        cached = {**cached, "pokemon": pokemon_name}
+    return cached
+
+def peek_pokemon_sets(pokemon_name: str, format_name: str = "sv") -> Optional[dict]:
+    """Sets for a Pokemon from this process's cache, or None; never fetches or reads the shared file."""
+    return _sets_cache.layers[0].get((format_name, normalize_pokemon_name(pokemon_name)))
+
+async def _load_pokemon_sets(key: tuple, pokemon_name: str, format_name: str) -> dict:
+    data = await fetch_pokemon_sets(pokemon_name, format_name)
+    if "error" in data:
+        # Serve the last good sets rather than the failure
+        return await _sets_cache.aget_stale(key) or data
+    await _sets_cache.aset(key, data)
+    if history.meta_history is not None:
+        try:
+            await asyncio.to_thread(history.meta_history.record_sets, format_name, key[1], data)
+        except Exception as e:
+            # History is best-effort, but a failing store should show up
+            HISTORY_WRITE_ERRORS.inc(kind="sets", error=type(e).__name__)
+    return data
+
+async def fetch_pokemon_sets(pokemon_name: str, format_name: str = "sv") -> dict:
     """Get common sets for a specific Pokemon from Pikalytics."""
     try:
         # URL for specific Pokemon page
-        url = f"https://www.pikalytics.com/pokedex/sv/{pokemon_name.lower()}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        sets = []
-        
-        # Extract moves data - look for moves section
-        moves_section = soup.find('div', string=lambda text: text and 'Moves' in text)
-        if moves_section:
-            moves_container = moves_section.find_parent().find_all('div', class_='move') or moves_section.find_parent().find_all('span', class_='move')
-            for move_element in moves_container:
-                try:
-                    move_name = move_element.find('span', class_='move-name') or move_element
-                    move_type = move_element.find('span', class_='move-type')
-                    move_usage = move_element.find('span', class_='move-usage')
-                    
-                    if move_name:
-                        sets.append({
-                            'type': 'move',
-                            'name': move_name.text.strip(),
-                            'move_type': move_type.text.strip() if move_type else 'Unknown',
-                            'usage': move_usage.text.strip() if move_usage else '0%'
-                        })
-                except (AttributeError, ValueError):
-                    continue
+        url = f"https://www.pikalytics.com/pokedex/sv/{normalize_pokemon_name(pokemon_name)}"
         
-        # Extract items data
-        items_section = soup.find('div', string=lambda text: text and 'Item' in text)
-        if items_section:
-            items_container = items_section.find_parent().find_all('div', class_='item') or items_section.find_parent().find_all('span', class_='item')
-            for item_element in items_container:
-                try:
-                    item_name = item_element.find('span', class_='item-name') or item_element
-                    item_usage = item_element.find('span', class_='item-usage')
-                    
-                    if item_name:
-                        sets.append({
-                            'type': 'item',
-                            'name': item_name.text.strip(),
-                            'usage': item_usage.text.strip() if item_usage else '0%'
-                        })
-                except (AttributeError, ValueError):
-                    continue
+        response = await _get_page(url)
         
-        # Extract abilities data
-        abilities_section = soup.find('div', string=lambda text: text and 'Ability' in text)
-        if abilities_section:
-            abilities_container = abilities_section.find_parent().find_all('div', class_='ability') or abilities_section.find_parent().find_all('span', class_='ability')
-            for ability_element in abilities_container:
-                try:
-                    ability_name = ability_element.find('span', class_='ability-name') or ability_element
-                    ability_usage = ability_element.find('span', class_='ability-usage')
-                    
-                    if ability_name:
-                        sets.append({
-                            'type': 'ability',
-                            'name': ability_name.text.strip(),
-                            'usage': ability_usage.text.strip() if ability_usage else '0%'
-                        })
-                except (AttributeError, ValueError):
-                    continue
-        
-        # Extract EV spreads data
-        spreads_section = soup.find('div', string=lambda text: text and 'EV Spreads' in text)
-        if spreads_section:
-            spreads_container = spreads_section.find_parent().find_all('div', class_='spread') or spreads_section.find_parent().find_all('span', class_='spread')
-            for spread_element in spreads_container:
-                try:
-                    nature_element = spread_element.find('span', class_='nature')
-                    evs_element = spread_element.find('span', class_='evs')
-                    usage_element = spread_element.find('span', class_='usage')
-                    
-                    if nature_element:
-                        sets.append({
-                            'type': 'spread',
-                            'nature': nature_element.text.strip(),
-                            'evs': evs_element.text.strip() if evs_element else 'Unknown',
-                            'usage': usage_element.text.strip() if usage_element else '0%'
-                        })
-                except (AttributeError, ValueError):
-                    continue
+        sets = await asyncio.to_thread(parse_pokemon_sets_page, response.content)
         
         return {
             "pokemon": pokemon_name,
@@ -235,15 +350,316 @@ def get_pokemon_sets(pokemon_name: str, format_name: str = "sv") -> dict:
     except Exception as e:
         return {
             "error": f"Failed to get sets for {pokemon_name}: {str(e)}",
+            **error_fields(e),
             "pokemon": pokemon_name,
             "format": "VGC 2025 Regulation Set I",
             "sets": [],
             "total_sets": 0
         }
 
-def get_usage_stats(format_name: str = "sv") -> dict:
+def _parse_pokemon_sets_page_bs4(content: bytes) -> List[Dict]:
+    """Extract moves, items, abilities and EV spreads from a pokedex page with BeautifulSoup."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    sets = []
+
+    # Extract moves data - look for moves section
+    moves_section = soup.find('div', string=lambda text: text and 'Moves' in text)
+    if moves_section:
+        moves_container = moves_section.find_parent().find_all('div', class_='move') or moves_section.find_parent().find_all('span', class_='move')
+        for move_element in moves_container:
+            try:
+                move_name = move_element.find('span', class_='move-name') or move_element
+                move_type = move_element.find('span', class_='move-type')
+                move_usage = move_element.find('span', class_='move-usage')
+
+                if move_name:
+                    sets.append({
+                        'type': 'move',
+                        'name': move_name.text.strip(),
+                        'move_type': move_type.text.strip() if move_type else 'Unknown',
+                        'usage': move_usage.text.strip() if move_usage else '0%'
+                    })
+            except (AttributeError, ValueError):
+                continue
+
+    # Extract items data
+    items_section = soup.find('div', string=lambda text: text and 'Item' in text)
+    if items_section:
+        items_container = items_section.find_parent().find_all('div', class_='item') or items_section.find_parent().find_all('span', class_='item')
+        for item_element in items_container:
+            try:
+                item_name = item_element.find('span', class_='item-name') or item_element
+                item_usage = item_element.find('span', class_='item-usage')
+
+                if item_name:
+                    sets.append({
+                        'type': 'item',
+                        'name': item_name.text.strip(),
+                        'usage': item_usage.text.strip() if item_usage else '0%'
+                    })
+            except (AttributeError, ValueError):
+                continue
+
+    # Extract abilities data
+    abilities_section = soup.find('div', string=lambda text: text and 'Ability' in text)
+    if abilities_section:
+        abilities_container = abilities_section.find_parent().find_all('div', class_='ability') or abilities_section.find_parent().find_all('span', class_='ability')
+        for ability_element in abilities_container:
+            try:
+                ability_name = ability_element.find('span', class_='ability-name') or ability_element
+                ability_usage = ability_element.find('span', class_='ability-usage')
+
+                if ability_name:
+                    sets.append({
+                        'type': 'ability',
+                        'name': ability_name.text.strip(),
+                        'usage': ability_usage.text.strip() if ability_usage else '0%'
+                    })
+            except (AttributeError, ValueError):
+                continue
+
+    # Extract EV spreads data
+    spreads_section = soup.find('div', string=lambda text: text and 'EV Spreads' in text)
+    if spreads_section:
+        spreads_container = spreads_section.find_parent().find_all('div', class_='spread') or spreads_section.find_parent().find_all('span', class_='spread')
+        for spread_element in spreads_container:
+            try:
+                nature_element = spread_element.find('span', class_='nature')
+                evs_element = spread_element.find('span', class_='evs')
+                usage_element = spread_element.find('span', class_='usage')
+
+                if nature_element:
+                    sets.append({
+                        'type': 'spread',
+                        'nature': nature_element.text.strip(),
+                        'evs': evs_element.text.strip() if evs_element else 'Unknown',
+                        'usage': usage_element.text.strip() if usage_element else '0%'
+                    })
+            except (AttributeError, ValueError):
+                continue
+
+    return sets
+
+# --- lxml backend -----------------------------------------------------------
+#
+# Produces exactly the same dicts as the BeautifulSoup functions above, but
+# locates every section in one walk over the document and uses compiled XPath
+# for the per-section lookups instead of repeated full-tree find() scans.
+
+def _class_xpath(tag: str, class_name: str, prefix: str = ".//") -> str:
+    return f"{prefix}{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+# Section headers searched for on pokedex pages, with the tag/class pairs of
+# their entries (primary selector first, fallback second)
+_SET_SECTIONS = (
+    ("Moves", "move"),
+    ("Item", "item"),
+    ("Ability", "ability"),
+    ("EV Spreads", "spread"),
+)
+
+if etree is not None:
+    # Text as BeautifulSoup's .text sees it: no comments, scripts or styles
+    _xp_text = etree.XPath(
+        "descendant-or-self::text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]"
+    )
+    _xp_first = {
+        (tag, class_name): etree.XPath(f"({_class_xpath(tag, class_name)})[1]")
+        for tag, class_name in (
+            ("span", "pokemon-name"), ("div", "name"), ("span", "usage"), ("div", "usage"),
+            ("span", "move-name"), ("span", "move-type"), ("span", "move-usage"),
+            ("span", "item-name"), ("span", "item-usage"),
+            ("span", "ability-name"), ("span", "ability-usage"),
+            ("span", "nature"), ("span", "evs"),
+        )
+    }
+    _xp_all = {
+        (tag, class_name): etree.XPath(_class_xpath(tag, class_name))
+        for _, class_name in _SET_SECTIONS
+        for tag in ("div", "span")
+    }
+
+def _lxml_root(content):
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8")
+        except UnicodeDecodeError:
+            content = UnicodeDammit(content).unicode_markup
+    try:
+        return lxml_html.document_fromstring(content)
+    except (etree.ParserError, ValueError):
+        return None
+
+def _lxml_text(element) -> str:
+    return "".join(_xp_text(element))
+
+def _lxml_first(element, tag: str, class_name: str):
+    found = _xp_first[(tag, class_name)](element)
+    return found[0] if found else None
+
+def _lxml_string(element) -> Optional[str]:
+    """Mirror BeautifulSoup's Tag.string: the text of a node with exactly one child."""
+    children = len(element) + (1 if element.text else 0) + sum(1 for child in element if child.tail)
+    if children != 1:
+        return None
+    if element.text:
+        return element.text
+    child = element[0]
+    if not isinstance(child.tag, str):
+        # Comments count as a single string child in BeautifulSoup
+        return child.text if child.tag is etree.Comment else None
+    return _lxml_string(child)
+
+def _lxml_classes(element) -> List[str]:
+    return (element.get("class") or "").split()
+
+def _parse_meta_page_lxml(content: bytes) -> List[Dict]:
+    """Extract the usage list from the Pikalytics landing page with lxml."""
+    root = _lxml_root(content)
+    if root is None:
+        return []
+    
+    # One walk over the tree fills every candidate selector at once
+    entries, pokemon_divs, data_divs, name_spans = [], [], [], []
+    for element in root.iter("div", "span"):
+        classes = _lxml_classes(element)
+        if element.tag == "div":
+            if "pokemon-entry" in classes:
+                entries.append(element)
+            if "pokemon" in classes:
+                pokemon_divs.append(element)
+            if element.get("data-pokemon") is not None:
+                data_divs.append(element)
+        elif "pokemon-name" in classes:
+            name_spans.append(element)
+    
+    pokemon_elements = entries or pokemon_divs or data_divs or name_spans
+    
+    pokemon_data = []
+    for element in pokemon_elements:
+        name_element = _lxml_first(element, "span", "pokemon-name")
+        if name_element is None:
+            name_element = _lxml_first(element, "div", "name")
+        usage_element = _lxml_first(element, "span", "usage")
+        if usage_element is None:
+            usage_element = _lxml_first(element, "div", "usage")
+        
+        if name_element is not None:
+            usage = 0.0
+            if usage_element is not None:
+                try:
+                    usage = float(_lxml_text(usage_element).strip().replace('%', ''))
+                except ValueError:
+                    usage = 0.0
+            pokemon_data.append({
+                'name': _lxml_text(name_element).strip(),
+                'usage': usage,
+                'rank': len(pokemon_data) + 1
+            })
+    
+    if not pokemon_data:
+        for line in _lxml_text(root).split('\n'):
+            if '%' in line and any(char.isalpha() for char in line):
+                parts = line.split()
+                for i, part in enumerate(parts):
+                    if '%' in part and i > 0:
+                        try:
+                            usage = float(part.replace('%', ''))
+                        except ValueError:
+                            continue
+                        name = ' '.join(parts[:i])
+                        if len(name) > 0 and usage > 0:
+                            pokemon_data.append({
+                                'name': name,
+                                'usage': usage,
+                                'rank': len(pokemon_data) + 1
+                            })
+    
+    return pokemon_data
+
+def _lxml_usage(element, class_name: str) -> str:
+    usage = _lxml_first(element, "span", class_name)
+    return _lxml_text(usage).strip() if usage is not None else '0%'
+
+def _parse_pokemon_sets_page_lxml(content: bytes) -> List[Dict]:
+    """Extract moves, items, abilities and EV spreads from a pokedex page with lxml."""
+    root = _lxml_root(content)
+    if root is None:
+        return []
+    
+    # One walk finds the first header div for every section
+    headers = {}
+    for element in root.iter("div"):
+        if len(headers) == len(_SET_SECTIONS):
+            break
+        text = _lxml_string(element)
+        if not text:
+            continue
+        for title, _ in _SET_SECTIONS:
+            if title not in headers and title in text:
+                headers[title] = element
+    
+    sets = []
+    for title, class_name in _SET_SECTIONS:
+        header = headers.get(title)
+        if header is None:
+            continue
+        parent = header.getparent()
+        if parent is None:
+            continue
+        elements = _xp_all[("div", class_name)](parent) or _xp_all[("span", class_name)](parent)
+        
+        for element in elements:
+            if class_name == "spread":
+                nature = _lxml_first(element, "span", "nature")
+                if nature is None:
+                    continue
+                evs = _lxml_first(element, "span", "evs")
+                sets.append({
+                    'type': 'spread',
+                    'nature': _lxml_text(nature).strip(),
+                    'evs': _lxml_text(evs).strip() if evs is not None else 'Unknown',
+                    'usage': _lxml_usage(element, "usage")
+                })
+                continue
+            
+            name = _lxml_first(element, "span", f"{class_name}-name")
+            entry = {
+                'type': class_name,
+                'name': _lxml_text(name if name is not None else element).strip()
+            }
+            if class_name == "move":
+                move_type = _lxml_first(element, "span", "move-type")
+                entry['move_type'] = _lxml_text(move_type).strip() if move_type is not None else 'Unknown'
+            entry['usage'] = _lxml_usage(element, f"{class_name}-usage")
+            sets.append(entry)
+    
+    return sets
+
+PARSERS = {
+    "bs4": (_parse_meta_page_bs4, _parse_pokemon_sets_page_bs4),
+}
+if etree is not None:
+    PARSERS["lxml"] = (_parse_meta_page_lxml, _parse_pokemon_sets_page_lxml)
+
+def parse_meta_page(content: bytes, parser: Optional[str] = None) -> List[Dict]:
+    """Extract the usage list from the Pikalytics landing page."""
+    with PARSE_LATENCY.time(parser="pikalytics_meta"):
+        return PARSERS[parser or PIKALYTICS_PARSER][0](content)
+
+def parse_pokemon_sets_page(content: bytes, parser: Optional[str] = None) -> List[Dict]:
+    """Extract moves, items, abilities and EV spreads from a Pikalytics pokedex page."""
+    with PARSE_LATENCY.time(parser="pikalytics_sets"):
+        return PARSERS[parser or PIKALYTICS_PARSER][1](content)
+
+async def get_usage_stats(format_name: str = "sv", limit: int = META_TOP_N) -> dict:
     """Get usage statistics for the current format."""
-    meta_data = scrape_pikalytics_meta(format_name)
+    snapshot = _snapshots.get(format_name)
+    if snapshot is not None:
+        return snapshot.usage_stats(limit)
+    
+    meta_data = await scrape_pikalytics_meta(format_name)
     
     if "error" in meta_data:
         return meta_data
@@ -253,7 +669,24 @@ def get_usage_stats(format_name: str = "sv") -> dict:
     
     return {
         "format": format_name,
-        "top_pokemon": sorted_pokemon[:20],  # Top 20
+        "top_pokemon": sorted_pokemon[:limit],
         "total_pokemon": meta_data["total_pokemon"],
         "scraped_at": meta_data["scraped_at"]
-    } 
\ No newline at end of file
+    }
+
+async def prefetch_top_sets(format_name: str = "sv", top_n: int = SETS_PREFETCH_TOP_N,
+                            concurrency: int = SETS_PREFETCH_CONCURRENCY) -> int:
+    """Warm the sets cache with the current top-N meta Pokemon. Returns how many were cached."""
+    usage = await get_usage_stats(format_name, limit=top_n)
+    if "error" in usage:
+        return 0
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def prefetch(name: str) -> bool:
+        async with semaphore:
+            data = await get_pokemon_sets(name, format_name)
+            return "error" not in data
+    
+    results = await asyncio.gather(*(prefetch(p["name"]) for p in usage["top_pokemon"]))
+    return sum(results)
\ No newline at end of file
@@ -0,0 +1,244 @@
+import asyncio
+import html
+import os
+import re
+import time
+import httpx
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from services.cache import LRUCache, SQLiteCache, TieredCache, shared_cache, single_flight
+from services.http_client import get_client
+from services.metrics import PARSE_LATENCY, track_upstream
+from services.resilience import UpstreamUnavailable, upstream
+from services.showdown import looks_like_pokemon_team
+
+load_dotenv()
+
+# Paste contents are immutable, so extracted team text is cached by URL.
+# Entries younger than PASTE_CACHE_TTL are served without any I/O; older ones
+# are revalidated with a conditional GET (ETag / Last-Modified) when the host
+# supplied validators. Set PASTE_CACHE_PATH to persist entries in SQLite, and
+# SHARED_CACHE_PATH to share them between worker processes.
+PASTE_CACHE_TTL = float(os.getenv("PASTE_CACHE_TTL", "604800"))
+PASTE_CACHE_SIZE = int(os.getenv("PASTE_CACHE_SIZE", "2048"))
+PASTE_CACHE_PATH = os.getenv("PASTE_CACHE_PATH")
+
+_paste_cache = TieredCache(
+    LRUCache(maxsize=PASTE_CACHE_SIZE),
+    shared_cache("pastes"),
+    SQLiteCache(PASTE_CACHE_PATH, table="pastes") if PASTE_CACHE_PATH else None,
+    name="pokepaste"
+)
+_paste_flights = single_flight("pastes")
+
+# Hosts that serve a plain-text export of each paste at <paste url>/raw
+RAW_TEXT_HOSTS = ("pokepast.es", "www.pokepast.es")
+
+_PRE_BLOCK = re.compile(r"<pre\b[^>]*>(.*?)</pre\s*>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]*>")
+_CONTAINER_END = re.compile(r"</(?:article|main|body)\s*>", re.IGNORECASE)
+_PASTE_URL = re.compile(r'https?://(www\.)?(pokepast\.es|pokepaste\.es|pokepaste\.net)/[a-zA-Z0-9]+')
+
+def is_valid_pokepaste_url(url: str) -> bool:
+    """Validate if the URL is a valid Pokepaste URL"""
+    return bool(_PASTE_URL.match(url))
+
+def normalize_paste_url(url: str) -> str:
+    """Cache key for a paste URL: lowercased host, no trailing slash, query or fragment."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+async def fetch_pokepaste_team(url: str) -> Optional[str]:
+    """Return the team text of a Pokepaste URL, fetching it only when not cached."""
+    key = normalize_paste_url(url)
+    entry = await _paste_cache.aget(key)
+    if _is_fresh(entry):
+        return entry["team_data"]
+    try:
+        return await _paste_flights.run(key, lambda: _load_paste(key, url, entry), lookup=lambda: _fresh_team_data(key))
+    except (UpstreamUnavailable, httpx.HTTPError, asyncio.TimeoutError):
+        # Pastes don't change, so an old copy is as good as a fresh one
+        if entry is not None:
+            return entry["team_data"]
+        raise
+
+def _is_fresh(entry: Optional[dict]) -> bool:
+    return entry is not None and time.time() - entry["fetched_at"] < PASTE_CACHE_TTL
+
+async def _fresh_team_data(key: str) -> Optional[str]:
+    """Team text another worker just stored, if any."""
+    entry = await _paste_cache.aget(key)
+    return entry["team_data"] if _is_fresh(entry) else None
+
+def raw_paste_url(key: str) -> Optional[str]:
+    """The plain-text export URL for hosts that provide one (pokepast.es serves /raw)."""
+    if urlsplit(key).netloc in RAW_TEXT_HOSTS:
+        return f"{key}/raw"
+    return None
+
+def _validators(entry: Optional[dict], url: str) -> dict:
+    """Conditional GET headers, if the cached copy came from this URL."""
+    headers = {}
+    if entry is not None and entry.get("source") == url:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+async def _store(key: str, team_data: Optional[str], response: httpx.Response, source: str) -> Optional[str]:
+    if team_data:
+        await _paste_cache.aset(key, {
+            "team_data": team_data,
+            "source": source,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time()
+        })
+    return team_data
+
+async def _refresh(key: str, entry: dict) -> str:
+    await _paste_cache.aset(key, {**entry, "fetched_at": time.time()})
+    return entry["team_data"]
+
+async def _load_paste(key: str, url: str, entry: Optional[dict]) -> Optional[str]:
+    """
+    Fetch a paste through progressively more expensive extraction tiers:
+    the plain-text /raw export, then a streaming scan of the page's <pre>
+    blocks, then a full DOM parse as a last resort.
+    """
+    client = get_client()
+    guard = upstream("pokepaste")
+    
+    raw_url = raw_paste_url(key)
+    if raw_url is not None:
+        async def get_raw():
+            with track_upstream("pokepaste_raw"):
+                return await client.get(raw_url, headers=_validators(entry, raw_url))
+        try:
+            response = await guard.call(get_raw)
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            response = None
+        if response is not None and response.status_code == 304 and entry is not None:
+            return await _refresh(key, entry)
+        if response is not None and response.is_success:
+            text = response.text.strip()
+            if looks_like_pokemon_team(text):
+                return await _store(key, clean_team_data(text), response, raw_url)
+    
+    scanner = PreBlockScanner()
+    
+    async def scan_page():
+        # Includes the streaming <pre> scan, which runs as chunks arrive
+        with track_upstream("pokepaste"):
+            async with client.stream("GET", url, headers=_validators(entry, url)) as response:
+                if response.status_code != 304 or entry is None:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_text():
+                        if scanner.feed(chunk):
+                            # Team blocks are complete; skip the rest of the page
+                            break
+                return response
+    
+    response = await guard.call(scan_page)
+    if response.status_code == 304 and entry is not None:
+        return await _refresh(key, entry)
+    
+    team_data = scanner.team_data()
+    if team_data is None:
+        # Parsing is CPU-bound; keep it off the event loop
+        team_data = await asyncio.to_thread(_extract_team_from_dom, scanner.buffer)
+    return await _store(key, team_data, response, url)
+
+
+class PreBlockScanner:
+    """
+    Pulls team text out of <pre> blocks as HTML streams in, without a DOM.
+    
+    ``feed`` returns True once team blocks have been found and their
+    enclosing container has closed, so the caller can stop reading.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.sections = []
+        self.done = False
+        self._pos = 0
+
+    def feed(self, chunk: str) -> bool:
+        self.buffer += chunk
+        while True:
+            match = _PRE_BLOCK.search(self.buffer, self._pos)
+            if match is None:
+                break
+            text = html.unescape(_TAG.sub("", match.group(1))).strip()
+            if looks_like_pokemon_team(text):
+                self.sections.append(text)
+            self._pos = match.end()
+        if self.sections and _CONTAINER_END.search(self.buffer, self._pos):
+            self.done = True
+        return self.done
+
+    def team_data(self) -> Optional[str]:
+        if not self.sections:
+            return None
+        return clean_team_data('\n\n'.join(self.sections))
+
+
+def extract_team_from_html(page: str) -> Optional[str]:
+    """Extract team data from a Pokepaste page, scanning <pre> blocks before falling back to the DOM."""
+    scanner = PreBlockScanner()
+    scanner.feed(page)
+    return scanner.team_data() or _extract_team_from_dom(page)
+
+def _extract_team_from_dom(page: str) -> Optional[str]:
+    with PARSE_LATENCY.time(parser="pokepaste_dom"):
+        return extract_team_data(BeautifulSoup(page, 'html.parser'))
+
+def extract_team_data(soup) -> str:
+    """Extract Pokemon team data from BeautifulSoup object"""
+    # Look for team data in various possible locations
+    team_data = None
+    
+    # Try <pre> tags first (most common) - collect ALL pre tags
+    pre_tags = soup.find_all('pre')
+    if pre_tags:
+        # Collect all pre tags that contain Pokemon data
+        pokemon_sections = []
+        for pre in pre_tags:
+            text = pre.get_text().strip()
+            if looks_like_pokemon_team(text):
+                pokemon_sections.append(text)
+        
+        if pokemon_sections:
+            # Join all Pokemon sections with double newlines for separation
+            team_data = '\n\n'.join(pokemon_sections)
+    
+    # Try <code> blocks if no <pre> found
+    if not team_data:
+        code_blocks = soup.find_all('code')
+        for code in code_blocks:
+            text = code.get_text().strip()
+            if looks_like_pokemon_team(text):
+                team_data = text
+                break
+    
+    # Try textarea elements
+    if not team_data:
+        textareas = soup.find_all('textarea')
+        for textarea in textareas:
+            text = textarea.get_text().strip() or textarea.get('value', '').strip()
+            if looks_like_pokemon_team(text):
+                team_data = text
+                break
+    
+    if team_data:
+        return clean_team_data(team_data)
+    
+    return None
+
+def clean_team_data(data: str) -> str:
+    """Clean up the team data"""
+    return data.strip().replace('\r\n', '\n').replace('\r', '\n') 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+from typing import Dict, List, Optional
+import httpx
+import openai
+from dotenv import load_dotenv
+from services.showdown import ShowdownPokemon
+from services.team_rules import rule_based_analysis
+from services.threats import peek_threat_table, threat_matrix
+
+load_dotenv()
+
+# OPENAI_BASE_URL points the "openai" provider at any server speaking the same
+# chat completions API (e.g. benchmarks/fake_openai.py for offline runs)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# An OpenAI-compatible model server on this machine (llama.cpp's llama-server,
+# vLLM, Ollama); registered as the "local-llm" provider when set
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL") or None
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+RULES_THREATS_FORMAT = os.getenv("RULES_THREATS_FORMAT", "ss")
+
+
+class ChatProvider:
+    """A model behind the OpenAI chat completions API; retries are handled by the caller."""
+
+    kind = "chat"
+
+    def __init__(self, name: str, model: str, api_key: Optional[str], base_url: Optional[str], timeout: float,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        self.name = name
+        self.model = model
+        # The client refuses to start without a key, which local servers don't need
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or "none", base_url=base_url, timeout=timeout, max_retries=0, http_client=http_client
+        )
+
+    async def complete(self, **kwargs):
+        return await self.client.chat.completions.create(model=self.model, **kwargs)
+
+
+class RuleBasedProvider:
+    """Offline analyzer built on the parsed team and local stats; no network and no tokens."""
+
+    kind = "rules"
+    model = "rules"
+
+    def __init__(self, name: str = "rules", threats_format: Optional[str] = RULES_THREATS_FORMAT):
+        self.name = name
+        self.threats_format = threats_format
+
+    def analyze(self, pokemon_list: List[ShowdownPokemon]) -> dict:
+        # Meta threats only from memory, so an offline analysis never waits on a scrape
+        table = peek_threat_table(self.threats_format) if self.threats_format else None
+        threats = threat_matrix(pokemon_list, table) if table is not None and len(table) else None
+        return rule_based_analysis(pokemon_list, threats)
+
+
+def create_providers(model: str, timeout: float) -> Dict[str, object]:
+    providers = {
+        "openai": ChatProvider("openai", model, os.getenv("OPENAI_API_KEY"), OPENAI_BASE_URL, timeout),
+        "rules": RuleBasedProvider(),
+    }
+    if LOCAL_LLM_BASE_URL:
+        providers["local-llm"] = ChatProvider("local-llm", LOCAL_LLM_MODEL, None, LOCAL_LLM_BASE_URL, timeout)
+    return providers
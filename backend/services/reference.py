@@ -0,0 +1,86 @@
+import difflib
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Bundled species, forms, moves, items, abilities, types, natures and aliases
+POKEDEX_PATH = os.getenv(
+    "POKEDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "pokedex.json")
+)
+# How close a misspelling must be (0-1) for suggest() to offer a name
+FUZZY_CUTOFF = float(os.getenv("REFERENCE_FUZZY_CUTOFF", "0.85"))
+
+_NON_ID = re.compile(r"[^a-z0-9]")
+_NICKNAME = re.compile(r"\(([^()]+)\)$")
+_GENDER = re.compile(r"\s*\((?:M|F)\)$")
+
+
+@lru_cache(maxsize=4096)
+def to_id(name: str) -> str:
+    """Lowercase alphanumeric id, so "Urshifu-Rapid-Strike" and "urshifu rapid strike" match."""
+    return _NON_ID.sub("", name.lower())
+
+def species_name(name: str) -> str:
+    """Strip a gender marker and nickname: "Dusty (Incineroar) (M)" -> "Incineroar"."""
+    name = _GENDER.sub("", name.strip())
+    match = _NICKNAME.search(name)
+    return match.group(1).strip() if match else name
+
+
+@lru_cache(maxsize=None)
+def load_data(path: str = POKEDEX_PATH) -> dict:
+    """The bundled data file, read once per path."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ReferenceIndex:
+    """
+    Canonical names by id for each kind of name, with aliases.
+
+    Lookups are exact (by id or alias) and are what names get normalized
+    with. suggest() finds close misspellings, but only for names that aren't
+    known at all: "other_species" lists real Pokemon the bundled data has no
+    stats for, so "Porygon-Z" is recognized rather than taken for "Porygon2".
+    """
+
+    KINDS = ("species", "moves", "items", "abilities", "types", "natures")
+
+    def __init__(self, data: dict):
+        self.names: Dict[str, Dict[str, str]] = {
+            kind: {to_id(name): name for name in data.get(kind, ())} for kind in self.KINDS
+        }
+        for name in data.get("other_species", ()):
+            self.names["species"].setdefault(to_id(name), name)
+        # Aliases point at a canonical name; "Lando-T" -> "Landorus-Therian"
+        self.aliases: Dict[str, Dict[str, str]] = {
+            kind: {to_id(alias): name for alias, name in data.get("aliases", {}).get(kind, {}).items()}
+            for kind in self.KINDS
+        }
+        self._ids = {kind: list(names) for kind, names in self.names.items()}
+
+    def lookup(self, kind: str, name: str) -> Optional[str]:
+        """Canonical name for an exact id or alias match, or None."""
+        name_id = to_id(name)
+        return self.names[kind].get(name_id) or self.aliases[kind].get(name_id)
+
+    def suggest(self, kind: str, name: str) -> Optional[str]:
+        """A known name close to an unknown one ("Incinaroar" -> "Incineroar"); None if ``name`` is known."""
+        return self._suggest(kind, to_id(name))
+
+    @lru_cache(maxsize=4096)
+    def _suggest(self, kind: str, name_id: str) -> Optional[str]:
+        if not name_id or name_id in self.names[kind] or name_id in self.aliases[kind]:
+            return None
+        # Only near-misses with the same first letter
+        candidates = [i for i in self._ids[kind] if i[0] == name_id[0]]
+        close = difflib.get_close_matches(name_id, candidates, n=1, cutoff=FUZZY_CUTOFF)
+        return self.names[kind][close[0]] if close else None
+
+    def species(self, name: str) -> Optional[str]:
+        """Canonical species for a Showdown header or free text: "Bob (Urshifu-R) (M)" -> "Urshifu-Rapid-Strike"."""
+        return self.lookup("species", species_name(name))
+
+reference = ReferenceIndex(load_data())
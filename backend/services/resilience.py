@@ -0,0 +1,222 @@
+import asyncio
+import math
+import os
+import time
+import httpx
+import openai
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from services.metrics import UPSTREAM_CIRCUIT_OPEN, UPSTREAM_REJECTED
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Outbound protection shared by every upstream (Pikalytics, Pokepaste and the
+# LLM providers). Each one gets a token bucket of <NAME>_RATE_LIMIT requests/s
+# with bursts of <NAME>_BURST, a hard <NAME>_TIMEOUT per call and a circuit
+# breaker. Callers wait up to UPSTREAM_MAX_WAIT seconds for a token before
+# being turned away. The breaker opens after UPSTREAM_BREAKER_FAILURES
+# failures in a row and lets one trial call through every
+# UPSTREAM_BREAKER_RESET seconds until one succeeds.
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "5"))
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+
+UPSTREAM_DEFAULTS = {
+    "pikalytics": {"rate": 5.0, "burst": 10, "timeout": 15.0},
+    "pokepaste": {"rate": 10.0, "burst": 20, "timeout": 15.0},
+    "openai": {"rate": 20.0, "burst": 40, "timeout": 60.0},
+}
+FALLBACK_DEFAULTS = {"rate": 10.0, "burst": 20, "timeout": 60.0}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling the upstream when its circuit is open or it is rate limited."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average, with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take a token, returning how long to wait before using it, or None
+        (taking nothing) if that would be longer than ``max_wait``. Tokens go
+        negative while reserved, so waiting callers are served in order.
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        wait = max(0.0, (1 - self._tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self._tokens -= 1
+        return wait
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` failures in a row; one trial call is let through every ``reset_timeout`` seconds."""
+
+    def __init__(self, failure_threshold: int = UPSTREAM_BREAKER_FAILURES, reset_timeout: float = UPSTREAM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.retry_after() == 0 else "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.retry_after() > 0 or self._trial:
+            return False
+        self._trial = True
+        return True
+
+    def release(self) -> None:
+        """End a trial call that neither succeeded nor failed (e.g. it was cancelled)."""
+        self._trial = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy: timeouts, connection errors, 429 and 5xx."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class Upstream:
+    """Rate limit, hard timeout and circuit breaker around calls to one upstream."""
+
+    def __init__(self, name: str, rate: float, burst: int, timeout: float, max_wait: float = UPSTREAM_MAX_WAIT,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker()
+
+    async def call(self, fn: Callable[[], Awaitable[T]],
+                   is_failure: Callable[[BaseException], bool] = is_failure) -> T:
+        """Await ``fn()`` once the upstream allows it, within ``timeout`` seconds."""
+        if not self.breaker.allow():
+            UPSTREAM_REJECTED.inc(upstream=self.name, reason="circuit_open")
+            raise UpstreamUnavailable(f"{self.name} is unavailable, retrying shortly", self.breaker.retry_after())
+        wait = self.bucket.reserve(self.max_wait)
+        if wait is None:
+            self.breaker.release()
+            UPSTREAM_REJECTED.inc(upstream=self.name, reason="rate_limited")
+            raise UpstreamUnavailable(f"Too many requests to {self.name}", self.max_wait)
+
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                result = await asyncio.wait_for(fn(), self.timeout)
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"{self.name} did not respond within {self.timeout:g}s") from None
+        except Exception as e:
+            if is_failure(e):
+                self.breaker.record_failure()
+            else:
+                # The upstream answered (e.g. a 404), so it is healthy
+                self.breaker.record_success()
+            self._publish()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        self._publish()
+        return result
+
+    def _publish(self) -> None:
+        UPSTREAM_CIRCUIT_OPEN.set(0 if self.breaker.opened_at is None else 1, upstream=self.name)
+
+    def status(self) -> dict:
+        return {"state": self.breaker.state, "failures": self.breaker.failures, "retry_after": self.breaker.retry_after()}
+
+
+_upstreams: Dict[str, Upstream] = {}
+
+def _setting(name: str, key: str, default: float) -> float:
+    return float(os.getenv(f"{name.upper().replace('-', '_')}_{key}", default))
+
+def upstream(name: str, **defaults) -> Upstream:
+    """
+    The shared guard for an upstream, created on first use. Settings come
+    from <NAME>_RATE_LIMIT, <NAME>_BURST and <NAME>_TIMEOUT, then
+    ``defaults``, then UPSTREAM_DEFAULTS.
+    """
+    guard = _upstreams.get(name)
+    if guard is None:
+        settings = {**UPSTREAM_DEFAULTS.get(name, FALLBACK_DEFAULTS), **defaults}
+        guard = _upstreams[name] = Upstream(
+            name,
+            rate=_setting(name, "RATE_LIMIT", settings["rate"]),
+            burst=int(_setting(name, "BURST", settings["burst"])),
+            timeout=_setting(name, "TIMEOUT", settings["timeout"]),
+        )
+    return guard
+
+def upstream_status() -> dict:
+    return {name: guard.status() for name, guard in _upstreams.items()}
+
+
+def error_fields(error: BaseException) -> dict:
+    """
+    HTTP status for a failed request, to merge into an error payload: 503
+    (with retry_after) when the upstream turned us away or asked us to back
+    off, 504 on timeouts, an upstream page's 4xx (404 for an unknown Pokemon)
+    as is and 502 for any other upstream error response or connection error.
+    Anything else failed on our side: 400 for a ValueError, otherwise 500.
+    """
+    if isinstance(error, UpstreamUnavailable):
+        return {"status": 503, "retry_after": math.ceil(error.retry_after or 1)}
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, openai.APITimeoutError)):
+        return {"status": 504}
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status == 429:
+        retry_after = response.headers.get("Retry-After", "")
+        return {"status": 503, "retry_after": int(retry_after) if retry_after.isdigit() else 1}
+    if isinstance(error, httpx.HTTPStatusError) and 400 <= status < 500:
+        return {"status": status}
+    if status is not None or isinstance(error, (httpx.TransportError, openai.APIConnectionError)):
+        return {"status": 502}
+    if isinstance(error, ValueError):
+        return {"status": 400}
+    return {"status": 500}
\ No newline at end of file
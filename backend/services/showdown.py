@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from models.team import PokemonSet
+from services.reference import reference, species_name
+
+# Canonical stat keys, looked up by the lowercased stat label with spaces and
+# dots removed ("Sp. Atk", "SpA" and "spatk" all map to "spa")
+STAT_KEYS = {
+    "hp": "hp",
+    "atk": "atk", "attack": "atk",
+    "def": "def", "defense": "def",
+    "spa": "spa", "spatk": "spa", "specialattack": "spa",
+    "spd": "spd", "spdef": "spd", "specialdefense": "spd",
+    "spe": "spe", "speed": "spe",
+}
+
+# Field lines are "<Label>: value"; the label picks the record attribute.
+# Lines starting with "-" are moves, "<Nature> Nature" sets the nature, and
+# any other line starts a new Pokemon.
+_FIELDS = {
+    "Ability": "ability",
+    "Level": "level",
+    "Tera Type": "tera_type",
+    "EVs": "evs",
+    "IVs": "ivs",
+    "Nature": "nature",
+    # Export metadata with no bearing on analysis
+    "Shiny": None,
+    "Happiness": None,
+    "Gigantamax": None,
+    "Dynamax Level": None,
+    "Hidden Power": None,
+    "Pokeball": None,
+}
+_NATURE_SUFFIX = " Nature"
+
+# Record attributes whose values are spelled the bundled data's way when it
+# knows them ("choice specs" -> "Choice Specs"); unknown names are kept as typed
+_CANONICAL = {
+    "ability": "abilities",
+    "nature": "natures",
+    "tera_type": "types",
+}
+
+# Parsed lines by raw text. Pastes repeat the same lines ("- Protect",
+# "Level: 50", common spreads) over and over, so each is classified and
+# canonicalized once and costs one dict lookup afterwards. Capped so arbitrary
+# input can't grow it without limit.
+_LINE_CACHE_SIZE = 16384
+_lines: Dict[str, tuple] = {}
+
+
+@dataclass(slots=True)
+class ShowdownPokemon:
+    """
+    One Pokemon from a Showdown export, with stat keys normalized to
+    hp/atk/def/spa/spd/spe and names spelled as in the bundled data. ``name``
+    is the species; a nickname from the header is kept in ``nickname``.
+    Species the data doesn't know keep the spelling they were given and are
+    flagged ``unresolved``; they are never guessed at.
+    """
+
+    name: str
+    item: Optional[str] = None
+    ability: Optional[str] = None
+    nature: Optional[str] = None
+    level: Optional[int] = None
+    tera_type: Optional[str] = None
+    evs: Dict[str, int] = field(default_factory=dict)
+    ivs: Dict[str, int] = field(default_factory=dict)
+    moves: List[str] = field(default_factory=list)
+    nickname: Optional[str] = None
+    unresolved: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'item': self.item,
+            'ability': self.ability,
+            'nature': self.nature,
+            'level': self.level,
+            'tera_type': self.tera_type,
+            'evs': dict(self.evs),
+            'ivs': dict(self.ivs),
+            'moves': list(self.moves)
+        }
+
+    def to_model(self) -> PokemonSet:
+        return PokemonSet(**self.to_dict())
+
+
+def parse_stats(text: str) -> Dict[str, int]:
+    """Parse an EV/IV spread like "252 HP / 4 Sp. Atk" into {"hp": 252, "spa": 4}."""
+    stats = {}
+    for part in text.split('/'):
+        value, _, label = part.strip().partition(' ')
+        if not value.isdigit() or not label:
+            continue
+        label = label.strip().lower()
+        stats[STAT_KEYS.get(label.replace(' ', '').replace('.', ''), label)] = int(value)
+    return stats
+
+def _canonical(kind: str, value: str) -> str:
+    return reference.lookup(kind, value) or value
+
+def _parse_header(value: str) -> Tuple[str, Optional[str], bool, Optional[str]]:
+    """Split a header like "Bob (Urshifu-R) (M) @ Focus Sash" into (species, nickname, unresolved, item)."""
+    name, _, item = value.partition(' @ ')
+    species = species_name(name)
+    nickname = name.rpartition(f"({species})")[0].strip() or None
+    canonical = reference.lookup("species", species)
+    item = item.strip()
+    return canonical or species, nickname, canonical is None, _canonical("items", item) if item else None
+
+def _classify(line: str):
+    """Return (kind, value) for a stripped, non-empty line."""
+    if line[0] == '-':
+        return 'move', line[1:].strip()
+    label, sep, value = line.partition(':')
+    if sep and label in _FIELDS:
+        return _FIELDS[label], value.strip()
+    if line.endswith(_NATURE_SUFFIX) and ' ' not in line[:-len(_NATURE_SUFFIX)]:
+        return 'nature', line[:-len(_NATURE_SUFFIX)]
+    return 'header', line
+
+def _parse_line(line: str):
+    """(kind, value) for a stripped, non-empty line, with the value parsed and canonicalized."""
+    kind, value = _classify(line)
+    if kind == 'header':
+        return kind, _parse_header(value)
+    if kind == 'move':
+        return kind, _canonical("moves", value) if value else None
+    if kind == 'evs' or kind == 'ivs':
+        return kind, parse_stats(value)
+    if kind == 'level':
+        return kind, int(value) if value.isdigit() else None
+    if kind in _CANONICAL:
+        return kind, _canonical(_CANONICAL[kind], value)
+    return kind, value
+
+def parse_showdown_team(team_text: str) -> List[ShowdownPokemon]:
+    """Parse a Pokemon Showdown format team into structured data."""
+    pokemon_list = []
+    current = None
+
+    for line in team_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        parsed = _lines.get(line)
+        if parsed is None:
+            parsed = _parse_line(line)
+            if len(_lines) < _LINE_CACHE_SIZE:
+                _lines[line] = parsed
+        kind, value = parsed
+        if kind == 'header':
+            name, nickname, unresolved, item = value
+            current = ShowdownPokemon(name=name, item=item, nickname=nickname, unresolved=unresolved)
+            pokemon_list.append(current)
+        elif current is None or kind is None:
+            continue
+        elif kind == 'move':
+            if value:
+                current.moves.append(value)
+        elif kind == 'evs' or kind == 'ivs':
+            # Parsed spreads are shared; each Pokemon gets its own copy
+            setattr(current, kind, dict(value))
+        else:
+            setattr(current, kind, value)
+
+    return pokemon_list
+
+def looks_like_pokemon_team(text: str) -> bool:
+    """Check if the text looks like a Pokemon team: at least one Pokemon and some moves."""
+    if not text:
+        return False
+
+    has_pokemon = False
+    has_moves = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        kind = _classify(line)[0]
+        if kind == 'header':
+            has_pokemon = True
+        elif kind == 'move':
+            has_moves = True
+        if has_pokemon and has_moves:
+            return True
+    return False
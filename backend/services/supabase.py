@@ -1,9 +1,359 @@
-# Placeholder for Supabase integration
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+from dotenv import load_dotenv
+from models.team import SavedTeam, Team
+from services.cache import Counters, LRUCache, counters, shared_cache
+from services.http_client import get_client
 
-def save_team_to_supabase(team_data: dict, user_id: str):
-    # TODO: Save team to Supabase
-    pass
+load_dotenv()
 
-def get_teams_from_supabase(user_id: str):
-    # TODO: Get teams from Supabase
-    return [] 
\ No newline at end of file
+# Teams are stored in Supabase through its PostgREST API when SUPABASE_URL is
+# set; otherwise in a local SQLite file with the same table layout.
+SUPABASE_URL = os.getenv("SUPABASE_URL", "").rstrip("/")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+TEAMS_TABLE = os.getenv("TEAMS_TABLE", "teams")
+TEAMS_SQLITE_PATH = os.getenv("TEAMS_SQLITE_PATH", "teams.db")
+TEAMS_PAGE_SIZE = int(os.getenv("TEAMS_PAGE_SIZE", "20"))
+TEAMS_MAX_PAGE_SIZE = int(os.getenv("TEAMS_MAX_PAGE_SIZE", "100"))
+TEAMS_BATCH_SIZE = int(os.getenv("TEAMS_BATCH_SIZE", "500"))
+TEAMS_CACHE_SIZE = int(os.getenv("TEAMS_CACHE_SIZE", "1024"))
+TEAMS_CACHE_TTL = float(os.getenv("TEAMS_CACHE_TTL", "300"))
+
+# Column layout shared by both stores. Pages are ordered newest first by
+# (updated_at, id) so keyset cursors stay stable while teams are added.
+#
+#   create table teams (
+#       id text primary key,
+#       user_id text not null,
+#       name text not null,
+#       pokemon jsonb not null,
+#       created_at timestamptz not null default now(),
+#       updated_at timestamptz not null
+#   );
+#   create index teams_user_updated on teams (user_id, updated_at desc, id desc);
+#
+# Requests use SUPABASE_KEY rather than the user's token, so row level security
+# doesn't see the user; every query here filters on user_id itself.
+_COLUMNS = "id,user_id,name,pokemon,created_at,updated_at"
+
+
+class TeamStoreError(Exception):
+    """The team store could not complete a request."""
+
+
+class TeamConflictError(Exception):
+    """Teams with these ids exist and belong to another user."""
+
+    def __init__(self, team_ids: List[str]):
+        self.team_ids = team_ids
+        super().__init__(f"Team ids belong to another user: {', '.join(team_ids)}")
+
+
+def _now() -> str:
+    # Fixed-width UTC timestamps so they also sort correctly as text in SQLite
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["updated_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, team_id = json.loads(raw)
+        return str(updated_at), str(team_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class PostgrestTeamStore:
+    """Teams table accessed through Supabase's PostgREST API on the shared HTTP client."""
+
+    def __init__(self, url: str, key: str, table: str = TEAMS_TABLE):
+        self.endpoint = f"{url}/rest/v1/{table}"
+        self.headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+        }
+
+    async def _request(self, method: str, params: dict, **kwargs) -> Any:
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+        try:
+            response = await get_client().request(method, self.endpoint, params=params, headers=headers, **kwargs)
+            response.raise_for_status()
+        except Exception as e:
+            raise TeamStoreError(f"Supabase {method} failed: {str(e)}") from e
+        return response.json() if response.content else None
+
+    async def foreign_ids(self, user_id: str, team_ids: List[str]) -> List[str]:
+        quoted = ",".join(f'"{team_id}"' for team_id in team_ids)
+        rows = await self._request("GET", {"select": "id", "id": f"in.({quoted})", "user_id": f"neq.{user_id}"})
+        return [row["id"] for row in rows]
+
+    async def upsert(self, rows: List[dict]) -> List[dict]:
+        # Insert the new ids; ignore-duplicates leaves existing rows alone and
+        # returns only the rows it inserted
+        inserted = await self._request(
+            "POST", {"on_conflict": "id", "select": _COLUMNS}, json=rows,
+            headers={"Prefer": "resolution=ignore-duplicates,return=representation"}
+        )
+        done = {row["id"] for row in inserted}
+        # Update the rest only where they belong to this user, so an id another
+        # user took since foreign_ids() was checked updates nothing
+        updated = await asyncio.gather(*(
+            self._request(
+                "PATCH", {"id": f"eq.{row['id']}", "user_id": f"eq.{row['user_id']}", "select": _COLUMNS},
+                json={"name": row["name"], "pokemon": row["pokemon"], "updated_at": row["updated_at"]},
+                headers={"Prefer": "return=representation"}
+            )
+            for row in rows if row["id"] not in done
+        ))
+        stored = inserted + [found[0] for found in updated if found]
+        if len(stored) < len(rows):
+            if inserted:
+                # Undo this batch's inserts; updates to the user's own teams stay
+                quoted = ",".join(f'"{team_id}"' for team_id in done)
+                await self._request("DELETE", {"id": f"in.({quoted})", "user_id": f"eq.{rows[0]['user_id']}"})
+            found = {row["id"] for row in stored}
+            raise TeamConflictError([row["id"] for row in rows if row["id"] not in found])
+        return stored
+
+    async def list_page(self, user_id: str, after: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        params = {
+            "select": _COLUMNS,
+            "user_id": f"eq.{user_id}",
+            "order": "updated_at.desc,id.desc",
+            "limit": str(limit),
+        }
+        if after is not None:
+            updated_at, team_id = after
+            params["or"] = f'(updated_at.lt."{updated_at}",and(updated_at.eq."{updated_at}",id.lt."{team_id}"))'
+        return await self._request("GET", params)
+
+    async def get(self, user_id: str, team_id: str) -> Optional[dict]:
+        rows = await self._request("GET", {"select": _COLUMNS, "user_id": f"eq.{user_id}", "id": f"eq.{team_id}"})
+        return rows[0] if rows else None
+
+    async def delete(self, user_id: str, team_id: str) -> bool:
+        rows = await self._request(
+            "DELETE", {"user_id": f"eq.{user_id}", "id": f"eq.{team_id}"},
+            headers={"Prefer": "return=representation"}
+        )
+        return bool(rows)
+
+
+class SQLiteTeamStore:
+    """Local stand-in for the Supabase teams table, used when SUPABASE_URL is unset."""
+
+    def __init__(self, path: str, table: str = TEAMS_TABLE):
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, name TEXT NOT NULL, "
+                "pokemon TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_user_updated ON {table} (user_id, updated_at DESC, id DESC)"
+            )
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        data = dict(row)
+        data["pokemon"] = json.loads(data["pokemon"])
+        return data
+
+    def _foreign_ids(self, user_id: str, team_ids: List[str]) -> List[str]:
+        placeholders = ",".join("?" * len(team_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM {self.table} WHERE user_id != ? AND id IN ({placeholders})", [user_id, *team_ids]
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def _upsert(self, rows: List[dict]) -> List[dict]:
+        with self._lock, self._conn:
+            # Never let an upsert move a team to a different user
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (id, user_id, name, pokemon, created_at, updated_at) "
+                "VALUES (:id, :user_id, :name, :pokemon, :created_at, :updated_at) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, pokemon = excluded.pokemon, "
+                f"updated_at = excluded.updated_at WHERE {self.table}.user_id = excluded.user_id",
+                [{**row, "pokemon": json.dumps(row["pokemon"])} for row in rows]
+            )
+            placeholders = ",".join("?" * len(rows))
+            stored = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM {self.table} WHERE user_id = ? AND id IN ({placeholders})",
+                [rows[0]["user_id"], *(row["id"] for row in rows)]
+            ).fetchall()
+            if len(stored) < len(rows):
+                # Another user's row got in first; raising rolls the batch back
+                found = {row["id"] for row in stored}
+                raise TeamConflictError([row["id"] for row in rows if row["id"] not in found])
+        return [self._row(row) for row in stored]
+
+    def _list_page(self, user_id: str, after: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        sql = f"SELECT {_COLUMNS} FROM {self.table} WHERE user_id = ?"
+        params: list = [user_id]
+        if after is not None:
+            sql += " AND (updated_at < ? OR (updated_at = ? AND id < ?))"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def _get(self, user_id: str, team_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM {self.table} WHERE user_id = ? AND id = ?", (user_id, team_id)
+            ).fetchone()
+        return self._row(row) if row is not None else None
+
+    def _delete(self, user_id: str, team_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE user_id = ? AND id = ?", (user_id, team_id))
+        return cursor.rowcount > 0
+
+    async def foreign_ids(self, user_id: str, team_ids: List[str]) -> List[str]:
+        return await asyncio.to_thread(self._foreign_ids, user_id, team_ids)
+
+    async def upsert(self, rows: List[dict]) -> List[dict]:
+        return await asyncio.to_thread(self._upsert, rows)
+
+    async def list_page(self, user_id: str, after: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        return await asyncio.to_thread(self._list_page, user_id, after, limit)
+
+    async def get(self, user_id: str, team_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, user_id, team_id)
+
+    async def delete(self, user_id: str, team_id: str) -> bool:
+        return await asyncio.to_thread(self._delete, user_id, team_id)
+
+
+class TeamRepository:
+    """
+    Saved teams per user on top of a store, with a read-through page cache.
+
+    Cached pages are tagged with the user's write generation; any write bumps
+    it, so pages read before the write (even ones still loading) are never
+    served afterwards. With SHARED_CACHE_PATH set, pages and generations
+    live in the shared file, so a write in one worker invalidates every
+    worker's pages.
+    """
+
+    def __init__(self, store, cache: Optional[LRUCache] = None, batch_size: int = TEAMS_BATCH_SIZE,
+                 generations: Optional[Counters] = None):
+        self.store = store
+        self.cache = cache or shared_cache("teams", ttl=TEAMS_CACHE_TTL, name="teams") or LRUCache(
+            maxsize=TEAMS_CACHE_SIZE, ttl=TEAMS_CACHE_TTL, name="teams"
+        )
+        self.batch_size = batch_size
+        self._generations = generations or counters("team_generations")
+
+    async def _invalidate(self, user_id: str) -> None:
+        await self._generations.aincr(user_id)
+
+    async def save_teams(self, user_id: str, teams: List[Team]) -> List[SavedTeam]:
+        """
+        Insert or update many teams for one user, in batched upserts. Raises
+        TeamConflictError, before writing anything, if an id is another user's.
+        """
+        now = _now()
+        rows = []
+        # Only ids the client sent can clash; fresh uuids can't
+        given = []
+        for team in teams:
+            data = team.model_dump()
+            if data.get("id"):
+                given.append(data["id"])
+            rows.append({
+                "id": data.get("id") or str(uuid.uuid4()),
+                "user_id": user_id,
+                "name": data["name"],
+                "pokemon": data["pokemon"],
+                "created_at": data.get("created_at") or now,
+                "updated_at": now,
+            })
+
+        foreign = []
+        for start in range(0, len(given), self.batch_size):
+            foreign += await self.store.foreign_ids(user_id, given[start:start + self.batch_size])
+        if foreign:
+            raise TeamConflictError(foreign)
+
+        saved = []
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                saved.extend(await self.store.upsert(rows[start:start + self.batch_size]))
+        finally:
+            await self._invalidate(user_id)
+        return [SavedTeam(**row) for row in saved]
+
+    async def list_teams(self, user_id: str, cursor: Optional[str] = None, limit: int = TEAMS_PAGE_SIZE) -> dict:
+        """One page of a user's teams, newest first, plus the cursor for the next page."""
+        limit = max(1, min(limit, TEAMS_MAX_PAGE_SIZE))
+        key = (user_id, cursor, limit)
+        generation = await self._generations.aget(user_id)
+        cached = await self.cache.aget(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        after = decode_cursor(cursor) if cursor else None
+        # Fetch one extra row to know whether another page exists
+        rows = await self.store.list_page(user_id, after, limit + 1)
+        page = {
+            "teams": [SavedTeam(**row) for row in rows[:limit]],
+            "next_cursor": encode_cursor(rows[limit - 1]) if len(rows) > limit else None,
+        }
+        if await self._generations.aget(user_id) == generation:
+            await self.cache.aset(key, (generation, page))
+        return page
+
+    async def get_team(self, user_id: str, team_id: str) -> Optional[SavedTeam]:
+        row = await self.store.get(user_id, team_id)
+        return SavedTeam(**row) if row is not None else None
+
+    async def delete_team(self, user_id: str, team_id: str) -> bool:
+        try:
+            return await self.store.delete(user_id, team_id)
+        finally:
+            await self._invalidate(user_id)
+
+
+def create_store():
+    if SUPABASE_URL:
+        return PostgrestTeamStore(SUPABASE_URL, SUPABASE_KEY)
+    return SQLiteTeamStore(TEAMS_SQLITE_PATH)
+
+_team_repository: Optional[TeamRepository] = None
+
+def get_team_repository() -> TeamRepository:
+    """The app's team repository, created on first use so importing this module opens no files."""
+    global _team_repository
+    if _team_repository is None:
+        _team_repository = TeamRepository(create_store())
+    return _team_repository
+
+
+async def save_team_to_supabase(team_data: dict, user_id: str) -> SavedTeam:
+    """Save (or update, when it has an id) one team for a user."""
+    saved = await get_team_repository().save_teams(user_id, [SavedTeam(**team_data)])
+    return saved[0]
+
+async def get_teams_from_supabase(user_id: str, cursor: Optional[str] = None, limit: int = TEAMS_PAGE_SIZE) -> dict:
+    """Get one page of a user's saved teams."""
+    return await get_team_repository().list_teams(user_id, cursor, limit)
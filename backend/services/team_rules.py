@@ -0,0 +1,184 @@
+from typing import List, Optional, Sequence
+from services.analytics import team_stats
+from services.reference import to_id
+from services.showdown import ShowdownPokemon
+
+# Move and item groups the rules look for, by id
+SPEED_CONTROL_MOVES = {to_id(m) for m in (
+    "Tailwind", "Trick Room", "Icy Wind", "Electroweb", "Thunder Wave", "Scary Face",
+    "Bleakwind Storm", "Glaciate", "Bulldoze", "Rock Tomb", "String Shot",
+)}
+PROTECT_MOVES = {to_id(m) for m in (
+    "Protect", "Detect", "Spiky Shield", "King's Shield", "Baneful Bunker", "Silk Trap",
+    "Burning Bulwark", "Obstruct", "Max Guard",
+)}
+REDIRECTION_MOVES = {to_id(m) for m in ("Follow Me", "Rage Powder", "Spotlight", "Ally Switch")}
+CHOICE_ITEMS = {to_id(i) for i in ("Choice Scarf", "Choice Specs", "Choice Band")}
+
+# Points taken off a perfect 100 for each problem found, and the grade cutoffs
+PENALTIES = {
+    "shared_weakness": 8,
+    "no_speed_control": 12,
+    "no_board_support": 6,
+    "uncovered_type": 4,
+    "missing_protect": 6,
+    "choice_protect": 4,
+    "unanswered_threat": 5,
+}
+GRADE_CUTOFFS = (("A", 85), ("B", 70), ("C", 55), ("D", 40))
+# Only the worst few shared weaknesses count, so one team isn't penalized for every overlap
+MAX_SHARED_WEAKNESSES = 3
+
+
+def _point(point: str, reasoning: str) -> dict:
+    return {"point": point, "reasoning": reasoning}
+
+def _suggestion(kind: str, description: str, priority: str) -> dict:
+    return {"type": kind, "description": description, "priority": priority}
+
+def _names(names: Sequence[str]) -> str:
+    return ", ".join(names[:-1]) + f" and {names[-1]}" if len(names) > 1 else "".join(names)
+
+def _teammates(count: int) -> str:
+    if count == 0:
+        return "no teammates resist"
+    return "only 1 teammate resists" if count == 1 else f"only {count} teammates resist"
+
+def _grade(score: int) -> str:
+    for grade, cutoff in GRADE_CUTOFFS:
+        if score >= cutoff:
+            return grade
+    return "F"
+
+
+def rule_based_analysis(pokemon_list: Sequence[ShowdownPokemon], threats: Optional[dict] = None) -> dict:
+    """
+    Deterministic team analysis in the same shape as the LLM's, from the
+    locally computed team stats and, if given, a threat_matrix result.
+
+    It only knows what the numbers and a few move/item lists show (coverage,
+    shared weaknesses, speed control, Protect and support moves), so it is
+    meant for quick grades rather than strategic advice.
+    """
+    stats = team_stats(pokemon_list)
+    known = {p["name"] for p in stats["pokemon"]}
+    members = [p for p in pokemon_list if p.name in known]
+    move_ids = {p.name: {to_id(m) for m in p.moves} for p in members}
+    strengths: List[dict] = []
+    weaknesses: List[dict] = []
+    threat_points: List[dict] = []
+    suggestions: List[dict] = []
+    score = 100
+
+    offense = stats["offense"]
+    covered = offense["super_effective"]
+    if len(covered) >= 12:
+        strengths.append(_point(
+            "Wide offensive coverage",
+            f"The team hits {len(covered)} of 18 types super effectively, so few opponents can switch in safely."
+        ))
+    uncovered = offense["resisted"] + offense["no_damage"]
+    if uncovered:
+        score -= PENALTIES["uncovered_type"] * len(uncovered)
+        weaknesses.append(_point(
+            f"No neutral damage on {_names(uncovered)}",
+            "Every damaging move on the team is resisted or blocked by these types, so they can wall it."
+        ))
+        suggestions.append(_suggestion("move_change", f"Add a move that hits {_names(uncovered)} at least neutrally.", "medium"))
+
+    defense = stats["defense"]
+    walls = [t for t, counts in defense.items() if counts["weak"] == 0 and counts["resist"] + counts["immune"] >= 3]
+    if walls:
+        strengths.append(_point(
+            f"Solid defensive answers to {_names(walls[:4])}",
+            "At least three members resist or are immune to these types and none are weak to them."
+        ))
+    # Worst first: most members weak relative to those that resist
+    shared = sorted(
+        stats["shared_weaknesses"],
+        key=lambda t: defense[t]["weak"] - defense[t]["resist"] - defense[t]["immune"], reverse=True
+    )[:MAX_SHARED_WEAKNESSES]
+    for t in shared:
+        score -= PENALTIES["shared_weakness"]
+        weak = [p["name"] for p in stats["pokemon"] if t in p["weak_to"]]
+        weaknesses.append(_point(
+            f"Shared {t} weakness",
+            f"{_names(weak)} are all weak to {t} and {_teammates(defense[t]['resist'] + defense[t]['immune'])} it, "
+            f"so one {t} spread move can pressure several slots."
+        ))
+        suggestions.append(_suggestion(
+            "pokemon_swap", f"Add a teammate or Tera type that resists {t} to cover {_names(weak)}.", "high"
+        ))
+
+    speed_control = sorted({p.name for p in members if move_ids[p.name] & SPEED_CONTROL_MOVES})
+    if speed_control:
+        strengths.append(_point(
+            "Speed control",
+            f"{_names(speed_control)} can change turn order, which lets slower attackers move first."
+        ))
+    else:
+        score -= PENALTIES["no_speed_control"]
+        weaknesses.append(_point(
+            "No speed control",
+            "Without Tailwind, Trick Room or speed-dropping moves the team can't swing turn order against faster teams."
+        ))
+        suggestions.append(_suggestion("move_change", "Give one member Tailwind, Icy Wind or Trick Room.", "high"))
+
+    support = sorted({
+        p.name for p in members
+        if "fakeout" in move_ids[p.name] or move_ids[p.name] & REDIRECTION_MOVES or to_id(p.ability or "") == "intimidate"
+    })
+    if support:
+        strengths.append(_point(
+            "Board support",
+            f"{_names(support)} provide Fake Out, redirection or Intimidate to protect their partner on key turns."
+        ))
+    else:
+        score -= PENALTIES["no_board_support"]
+        suggestions.append(_suggestion(
+            "pokemon_swap", "Consider a Fake Out, redirection or Intimidate user to support setup turns.", "low"
+        ))
+
+    without_protect = [p.name for p in members if not move_ids[p.name] & PROTECT_MOVES and to_id(p.item or "") not in CHOICE_ITEMS]
+    if len(without_protect) >= 3:
+        score -= PENALTIES["missing_protect"]
+        weaknesses.append(_point(
+            "Few Protect users",
+            f"{_names(without_protect)} can't Protect, which makes double targets and scouting harder to play around."
+        ))
+        suggestions.append(_suggestion("move_change", f"Add Protect to some of {_names(without_protect)}.", "medium"))
+    for p in members:
+        if to_id(p.item or "") in CHOICE_ITEMS and move_ids[p.name] & PROTECT_MOVES:
+            score -= PENALTIES["choice_protect"]
+            suggestions.append(_suggestion(
+                "item_change", f"{p.name} holds {p.item} with Protect; drop one, since the item locks it into Protect.", "medium"
+            ))
+
+    if threats is not None:
+        for threat in threats["threats"][:3]:
+            if threat["pressure"] <= 0:
+                continue
+            if not threat["answered_by"]:
+                score -= PENALTIES["unanswered_threat"]
+            answered = f"only {_names(threat['answered_by'])} can answer it" if threat["answered_by"] else "nothing on the team answers it"
+            threat_points.append(_point(
+                threat["name"],
+                f"At {threat['usage']:.1f}% usage it hits {_names(threat['threatens']) or 'nobody'} super effectively and {answered}."
+            ))
+        answered = [t["name"] for t in threats["threats"] if len(t["answered_by"]) >= 2]
+        if answered:
+            strengths.append(_point(
+                f"Multiple answers to {_names(answered[:3])}",
+                "Two or more members hit these common threats super effectively without being weak to them."
+            ))
+    else:
+        for t in shared:
+            threat_points.append(_point(f"Strong {t}-type attackers", "They hit several members super effectively at once."))
+
+    return {
+        "grade": _grade(score),
+        "strengths": strengths,
+        "weaknesses": weaknesses,
+        "threats": threat_points,
+        "suggestions": suggestions,
+    }
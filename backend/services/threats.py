@@ -0,0 +1,200 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from services import pikalytics
+from services.analytics import STAT_ORDER, member_arrays, pokedex, to_id
+from services.resilience import UpstreamUnavailable
+from services.showdown import ShowdownPokemon
+
+THREATS_TOP_N = int(os.getenv("THREATS_TOP_N", "12"))
+# Moves used by at least this share of a threat's sets count toward its coverage
+THREAT_MOVE_MIN_USAGE = float(os.getenv("THREAT_MOVE_MIN_USAGE", "10"))
+THREAT_MOVES = int(os.getenv("THREAT_MOVES", "6"))
+
+
+def _usage_percent(value) -> float:
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return 0.0
+
+
+class ThreatTable:
+    """
+    Top-N meta Pokemon as arrays: types, likely attacking move types, an
+    estimated speed and usage. Built once per meta snapshot and reused for
+    every team scored against it.
+    """
+
+    def __init__(self, format_name: str, usage: List[dict], sets: Dict[str, dict]):
+        dex = pokedex
+        self.format = format_name
+        self.names: List[str] = []
+        self.unknown: List[str] = []
+        rows, usages, move_types, from_sets = [], [], [], []
+
+        for entry in usage:
+            row = dex.lookup(entry["name"])
+            if row is None:
+                self.unknown.append(entry["name"])
+                continue
+            mask = np.zeros(len(dex.types), dtype=bool)
+            data = sets.get(pikalytics.normalize_pokemon_name(entry["name"]))
+            moves = sorted(
+                (s for s in (data or {}).get("sets", []) if s.get("type") == "move"),
+                key=lambda s: _usage_percent(s.get("usage")), reverse=True
+            )
+            for move in moves[:THREAT_MOVES]:
+                if _usage_percent(move.get("usage")) < THREAT_MOVE_MIN_USAGE:
+                    break
+                known = dex.moves.get(to_id(move.get("name", "")))
+                if known is not None:
+                    if known[2] != "status":
+                        mask[known[1]] = True
+                elif move.get("move_type") in dex.type_index:
+                    mask[dex.type_index[move["move_type"]]] = True
+            # Without set data, assume it attacks with its own types
+            from_sets.append(bool(mask.any()))
+            if not mask.any():
+                mask[[t for t in dex.species_types[row] if t != dex.no_type]] = True
+
+            self.names.append(entry["name"])
+            rows.append(row)
+            usages.append(float(entry.get("usage", 0.0)))
+            move_types.append(mask)
+
+        rows = np.asarray(rows, dtype=np.intp)
+        self.types = dex.species_types[rows]
+        self.usage = np.asarray(usages, dtype=np.float64)
+        self.move_types = np.asarray(move_types, dtype=bool).reshape(len(rows), len(dex.types))
+        self.from_sets = from_sets
+        # Speed with 252 EVs and a neutral nature at level 50, the usual benchmark
+        base_speed = dex.base_stats[rows, STAT_ORDER.index("spe")]
+        self.speed = (2 * base_speed + 31 + 63) * 50 // 100 + 5
+        # defense_by_type[attacking type, threat]
+        self.defense_by_type = dex.chart[:, self.types].prod(axis=2)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def threat_matrix(pokemon_list: Sequence[ShowdownPokemon], table: ThreatTable) -> dict:
+    """
+    Score a team against every threat in one pass.
+
+    For each (member, threat) pair:
+    - offense: best multiplier of the member's damaging moves on the threat
+    - defense: best multiplier of the threat's common moves on the member
+    - speed: +1 if the member outspeeds the threat's benchmark speed, -1 if slower
+
+    A member "answers" a threat when it hits it super effectively without
+    being hit super effectively back; a threat's pressure is its usage share
+    times the members it threatens minus the members that answer it.
+    """
+    dex = pokedex
+    members, rows, unknown = [], [], []
+    for p in pokemon_list:
+        row = dex.lookup(p.name)
+        if row is None:
+            unknown.append(p.name)
+        else:
+            members.append(p)
+            rows.append(row)
+
+    arrays = member_arrays(members, rows)
+    # offense[member, threat] = max over the member's move types
+    offense = np.where(arrays["move_types"][:, :, None], table.defense_by_type[None, :, :], 0.0).max(axis=1)
+    # defense[member, threat] = max over the threat's move types, against the member
+    defense = np.where(table.move_types[:, :, None], arrays["defense"][None, :, :], 0.0).max(axis=1).T
+    speed = np.sign(arrays["stats"][:, 5, None] - table.speed[None, :])
+
+    threatened = defense >= 2
+    answers = (offense >= 2) & ~threatened
+    pressure = table.usage / 100 * (threatened.sum(axis=0) - answers.sum(axis=0))
+    order = np.argsort(-pressure, kind="stable")
+
+    member_names = [p.name for p in members]
+    threats = []
+    for j in order:
+        threats.append({
+            "name": table.names[j],
+            "usage": float(table.usage[j]),
+            "pressure": round(float(pressure[j]), 3),
+            "threatens": [member_names[i] for i in np.flatnonzero(threatened[:, j])],
+            "answered_by": [member_names[i] for i in np.flatnonzero(answers[:, j])],
+            "outsped_by": [member_names[i] for i in np.flatnonzero(speed[:, j] > 0)],
+            "moves_from_sets": table.from_sets[j],
+        })
+
+    return {
+        "format": table.format,
+        "team": member_names,
+        "threats": threats,
+        "matrix": {
+            "offense": offense.round(2).tolist(),
+            "defense": defense.round(2).tolist(),
+            "speed": speed.astype(int).tolist(),
+        },
+        "unknown": unknown,
+        "unknown_threats": table.unknown,
+    }
+
+
+# One table per (format, top N), rebuilt when the meta scrape or the set of
+# Pokemon with cached sets changes
+_tables: Dict[Tuple[str, int], Tuple[Tuple, ThreatTable]] = {}
+
+def _cached_table(format_name: str, usage: dict, sets: Dict[str, dict], top_n: int) -> ThreatTable:
+    version = (usage.get("scraped_at"), tuple(sorted(sets)))
+    cached = _tables.get((format_name, top_n))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    table = ThreatTable(format_name, usage["top_pokemon"], sets)
+    _tables[(format_name, top_n)] = (version, table)
+    return table
+
+async def get_threat_table(format_name: str = "ss", top_n: int = THREATS_TOP_N) -> ThreatTable:
+    """Threat table for the top-N meta, fetching any common sets not yet cached."""
+    usage = await pikalytics.get_usage_stats(format_name, limit=top_n)
+    if "error" in usage:
+        if usage.get("status") == 503:
+            raise UpstreamUnavailable(usage["error"], usage.get("retry_after"))
+        raise RuntimeError(usage["error"])
+
+    names = [p["name"] for p in usage["top_pokemon"]]
+    semaphore = asyncio.Semaphore(pikalytics.SETS_PREFETCH_CONCURRENCY)
+
+    async def load(name: str) -> dict:
+        async with semaphore:
+            return await pikalytics.get_pokemon_sets(name, format_name)
+
+    results = await asyncio.gather(*(load(name) for name in names))
+    sets = {
+        pikalytics.normalize_pokemon_name(name): data
+        for name, data in zip(names, results) if "error" not in data
+    }
+    return _cached_table(format_name, usage, sets, top_n)
+
+def peek_threat_table(format_name: str = "ss", top_n: int = THREATS_TOP_N) -> Optional[ThreatTable]:
+    """Threat table from in-memory data only (meta snapshot plus cached sets), or None."""
+    snapshot = pikalytics.get_snapshot(format_name)
+    if snapshot is None:
+        return None
+    usage = snapshot.usage_stats(top_n)
+    sets = {}
+    for p in usage["top_pokemon"]:
+        data = pikalytics.peek_pokemon_sets(p["name"], format_name)
+        if data is not None:
+            sets[pikalytics.normalize_pokemon_name(p["name"])] = data
+    return _cached_table(format_name, usage, sets, top_n)
+
+
+def format_threats(result: dict, limit: int = 8) -> str:
+    """Compact plain-text rendering of threat_matrix for the LLM prompt."""
+    lines = []
+    for threat in result["threats"][:limit]:
+        threatens = ", ".join(threat["threatens"]) or "nobody"
+        answers = ", ".join(threat["answered_by"]) or "nothing"
+        lines.append(f"{threat['name']} ({threat['usage']:.1f}% usage): threatens {threatens}; answered by {answers}")
+    return "\n".join(lines)
@@ -0,0 +1,50 @@
+import asyncio
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Without tiktoken (or its encoding files) counts are estimated at about four
+# characters per token, which is close for English and JSON
+CHARS_PER_TOKEN = 4
+# Chat formatting adds a few tokens per message and for the reply primer
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        # Encodings are downloaded on first use and may be unavailable offline
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+async def warm_encodings(models: Iterable[str]) -> None:
+    """Load the encodings for ``models`` in threads, since the first load can download its BPE file."""
+    await asyncio.gather(*(asyncio.to_thread(_encoding, model) for model in set(models)))
+
+def is_exact(model: str) -> bool:
+    """Whether counts for this model come from the real tokenizer rather than an estimate."""
+    return _encoding(model) is not None
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+def count_message_tokens(messages: List[Dict], model: str) -> int:
+    """Prompt tokens for a list of chat messages, including the chat format overhead."""
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Run from backend/ or the repo root; no real services or keys are needed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["META_HISTORY_PATH"] = ""
+os.environ["META_FORMATS"] = ""
+os.environ.pop("SHARED_CACHE_PATH", None)
+os.environ.pop("SUPABASE_URL", None)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from services import batch
+from services.cache import SharedDB
+
+PASTES = [path.read_text() for path in sorted((Path(__file__).parent.parent / "benchmarks" / "fixtures" / "pastes").glob("*.txt"))]
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_shared", SharedDB(str(tmp_path / "shared.db"), batch._SHARED_SCHEMA))
+    monkeypatch.setattr(batch, "_jobs", {})
+    monkeypatch.setattr(batch, "BATCH_STREAM_POLL", 0.01)
+
+
+def test_other_workers_see_a_finished_job(shared, monkeypatch):
+    async def main():
+        job = await batch.create_job(PASTES[:3] + ["not a team"], [], mode="quick")
+        events = [event async for event in job.follow()]
+        # A worker that didn't start the job has nothing for it in memory
+        monkeypatch.setattr(batch, "_jobs", {})
+        return job, events, await batch.get_job(job.id)
+
+    job, events, other = asyncio.run(main())
+    assert isinstance(other, batch.SharedBatchJob)
+    assert other.progress() == job.progress()
+    assert other.progress()["failed"] == 1
+    assert other.events == events
+
+def test_other_workers_can_stream_a_running_job(shared, monkeypatch):
+    async def main():
+        job = await batch.create_job(PASTES, [], mode="quick")
+        local = batch._jobs
+        monkeypatch.setattr(batch, "_jobs", {})
+        other = await batch.get_job(job.id)
+        monkeypatch.setattr(batch, "_jobs", local)
+        streamed = [event async for event in other.follow()]
+        return job, streamed
+
+    job, streamed = asyncio.run(main())
+    assert streamed == job.events
+    assert streamed[-1][0] == "done"
+
+def test_unknown_job(shared):
+    assert asyncio.run(batch.get_job("missing")) is None
\ No newline at end of file
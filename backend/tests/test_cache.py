@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from services.cache import LRUCache, SharedCache, SharedCounters, SharedSingleFlight, SingleFlight, TieredCache
+
+
+def test_shared_cache_queries_run_off_the_event_loop(tmp_path):
+    cache = SharedCache(str(tmp_path / "shared.db"), "items", ttl=60)
+    lookup = cache._lookup
+    threads = []
+
+    def recording_lookup(*args):
+        threads.append(threading.current_thread().name)
+        return lookup(*args)
+
+    cache._lookup = recording_lookup
+
+    async def main():
+        await cache.aset(("sv", "Incineroar"), {"sets": [1, 2]})
+        return await cache.aget(("sv", "Incineroar")), threading.current_thread().name
+
+    value, loop_thread = asyncio.run(main())
+    assert value == {"sets": [1, 2]}
+    assert threads and all(name.startswith("shared-db") and name != loop_thread for name in threads)
+
+def test_tiered_cache_backfills_from_shared_layer(tmp_path):
+    path = str(tmp_path / "shared.db")
+    SharedCache(path, "items").set("key", "value")
+    memory = LRUCache()
+    cache = TieredCache(memory, SharedCache(path, "items"))
+
+    assert asyncio.run(cache.aget("key")) == "value"
+    assert memory.get("key") == "value"
+
+def test_shared_counters(tmp_path):
+    first, second = (SharedCounters(str(tmp_path / "shared.db"), "generations") for _ in range(2))
+
+    async def main():
+        await first.aincr("alice")
+        await second.aincr("alice")
+        return await first.aget("alice"), await second.aget("bob")
+
+    assert asyncio.run(main()) == (2, 0)
+
+def test_single_flight_survives_the_first_caller_being_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append("load")
+        await asyncio.sleep(0.05)
+        return "loaded"
+
+    async def main():
+        leader = asyncio.create_task(flights.run("key", load))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.run("key", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        value = await follower
+        return leader.cancelled(), value, "key" in flights
+
+    assert asyncio.run(main()) == (True, "loaded", False)
+    assert calls == ["load"]
+
+def test_shared_single_flight_waits_for_the_lease_holder(tmp_path):
+    # Two instances on one file stand in for two worker processes
+    path = str(tmp_path / "shared.db")
+    first, second = SharedSingleFlight(path, "sets", poll=0.01), SharedSingleFlight(path, "sets", poll=0.01)
+    store = SharedCache(path, "sets")
+    calls = []
+
+    async def load():
+        calls.append("load")
+        await asyncio.sleep(0.1)
+        await store.aset("key", "loaded")
+        return "loaded"
+
+    async def main():
+        leader = asyncio.create_task(first.run("key", load, lookup=lambda: store.aget("key")))
+        await asyncio.sleep(0.02)
+        follower = await second.run("key", load, lookup=lambda: store.aget("key"))
+        return await leader, follower
+
+    assert asyncio.run(main()) == ("loaded", "loaded")
+    assert calls == ["load"]
\ No newline at end of file
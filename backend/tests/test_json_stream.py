@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from services.json_stream import IncrementalJSONParser, repair_json
+
+ANALYSIS = {
+    "grade": "B",
+    "strengths": [
+        {"point": "Braces {like} these", "reasoning": "Quoted \"text\", a backslash \\ and ]brackets["},
+        {"point": "Unicode é and a\nnewline", "reasoning": "Escaped \\\" at the end\\"},
+    ],
+    "weaknesses": [],
+    "threats": ["Urshifu", {"nested": {"deep": [1, 2, {"x": "}"}]}}],
+    "score": 7.5,
+    "final": True,
+    "note": None,
+}
+TEXT = "Here is the analysis:\n```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events += parser.feed(text[start:start + size])
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 3, 16, len(TEXT)])
+def test_events_do_not_depend_on_chunk_size(size):
+    parser, events = feed_in_chunks(TEXT, size)
+
+    assert parser.done
+    assert events[-1] == ("done", ANALYSIS)
+    assert [e for e in events if e[0] == "field"] == [
+        ("field", "grade", "B"), ("field", "score", 7.5), ("field", "final", True), ("field", "note", None)
+    ]
+    assert [e for e in events if e[0] == "item"] == [
+        ("item", "strengths", 0, ANALYSIS["strengths"][0]),
+        ("item", "strengths", 1, ANALYSIS["strengths"][1]),
+        ("item", "threats", 0, "Urshifu"),
+        ("item", "threats", 1, ANALYSIS["threats"][1]),
+    ]
+
+def test_nothing_after_the_object_is_read():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"grade": "A"}') == [("field", "grade", "A"), ("done", {"grade": "A"})]
+    assert parser.feed('{"grade": "F"}') == []
+
+def test_trailing_commas_are_repaired_per_value():
+    _, events = feed_in_chunks('{"strengths": [{"point": "a", "reasoning": "b",},], "grade": "C",}', 1)
+    assert ("item", "strengths", 0, {"point": "a", "reasoning": "b"}) in events
+    assert events[-1] == ("done", {"strengths": [{"point": "a", "reasoning": "b"}], "grade": "C"})
+
+
+def test_repair_json_leaves_valid_json_alone():
+    assert repair_json(TEXT) == ANALYSIS
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"grade": "B", "strengths": [{"point": "a", "reasoning": "b"}', {"grade": "B", "strengths": [{"point": "a", "reasoning": "b"}]}),
+    ('{"grade": "B", "note": "cut {off', {"grade": "B", "note": "cut {off"}),
+    ('{"note": "ends on an escape \\', {"note": "ends on an escape "}),
+    ('{"grade": "B", "strengths": [', {"grade": "B", "strengths": []}),
+    ('{"grade": "B", "strengths": [{"point": "a", "reasoning": "b"}, {"point": "c", "reas',
+     {"grade": "B", "strengths": [{"point": "a", "reasoning": "b"}, {"point": "c"}]}),
+    ('{"grade": "B", "score": 7.', {"grade": "B"}),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": [1, 2}', {"a": [1, 2]}),
+])
+def test_repair_json_closes_truncated_objects(text, expected):
+    assert repair_json(text) == expected
+
+def test_repair_json_without_an_object():
+    assert repair_json("no json here") is None
+    assert repair_json('{"a": tru') is None
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks import fake_openai as fake
+from benchmarks.fake_openai import fake_provider, make_app
+from models.analysis import TeamAnalysis
+from services import llm, providers
+from services.providers import RuleBasedProvider
+from services.showdown import parse_showdown_team
+
+PASTES = [path.read_text() for path in sorted((Path(__file__).parent.parent / "benchmarks" / "fixtures" / "pastes").glob("*.txt"))]
+
+
+def analysis_fields(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k != "usage"}
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Route quick to the rule-based provider and deep to OpenAI, served by the in-process fake."""
+    app = make_app(latency=0, chunk_delay=0)
+    monkeypatch.setitem(llm.providers, "openai", fake_provider(app))
+    monkeypatch.setattr(llm, "ANALYSIS_ROUTES", {"quick": "rules", "deep": "openai"})
+    llm._analysis_cache.clear()
+    yield app
+    llm._analysis_cache.clear()
+
+@pytest.fixture
+def missing_threats(monkeypatch):
+    """Make the fake leave "threats" out of its first answer; returns the last message of each request."""
+    answer, asked = fake._answer, []
+
+    def without_threats(messages):
+        asked.append(messages[-1]["content"])
+        data = json.loads(answer(messages))
+        if len(asked) == 1:
+            data.pop("threats")
+        return json.dumps(data)
+
+    monkeypatch.setattr(fake, "_answer", without_threats)
+    return asked
+
+
+def test_validate_analysis_reports_invalid_fields():
+    data = dict(fake.ANALYSIS, grade=" b ", threats="not a list")
+    data["weaknesses"] = [{"point": "kept", "reasoning": "ok"}, {"point": "dropped"}]
+    analysis, invalid = llm._validate_analysis(data)
+
+    assert invalid == ["threats"]
+    assert analysis["grade"] == "B"
+    assert analysis["weaknesses"] == [{"point": "kept", "reasoning": "ok"}]
+    assert llm._validate_analysis(None) == ({}, list(llm.ANALYSIS_FIELDS))
+
+def test_only_the_missing_sections_are_retried(fake_openai, missing_threats):
+    result = asyncio.run(llm.analyze_parsed_team(parse_showdown_team(PASTES[0]), mode="deep"))
+
+    assert fake_openai.state.requests == 2
+    assert missing_threats[1].endswith("in the format above: threats")
+    TeamAnalysis.model_validate(analysis_fields(result))
+    assert result["threats"] == fake.ANALYSIS["threats"]
+    assert "incomplete" not in result
+
+def test_streamed_analysis_resends_retried_sections(fake_openai, missing_threats):
+    async def collect():
+        return [event async for event in llm.stream_team_analysis(PASTES[0], mode="deep")]
+
+    events = asyncio.run(collect())
+    assert fake_openai.state.requests == 2
+    assert missing_threats[1].endswith("in the format above: threats")
+    threats = [data["item"] for name, data in events if name == "item" and data["section"] == "threats"]
+    assert threats == fake.ANALYSIS["threats"]
+    name, done = events[-1]
+    assert name == "done" and "incomplete" not in done
+    TeamAnalysis.model_validate(analysis_fields(done))
+
+
+@pytest.mark.parametrize("paste", PASTES)
+def test_rules_output_matches_team_analysis(paste):
+    analysis = RuleBasedProvider().analyze(parse_showdown_team(paste))
+    TeamAnalysis.model_validate(analysis)
+    assert analysis["strengths"] or analysis["weaknesses"]
+
+def test_rules_analysis_is_never_cached(fake_openai):
+    team = parse_showdown_team(PASTES[0])
+    first = asyncio.run(llm.analyze_parsed_team(team, mode="quick"))
+    second = asyncio.run(llm.analyze_parsed_team(team, mode="quick"))
+
+    assert first["usage"]["provider"] == second["usage"]["provider"] == "rules"
+    assert first["usage"]["cached"] is second["usage"]["cached"] is False
+    assert analysis_fields(first) == analysis_fields(second)
+    TeamAnalysis.model_validate(analysis_fields(first))
+    assert fake_openai.state.requests == 0
+
+def test_openai_provider_through_fake(fake_openai):
+    team = parse_showdown_team(PASTES[0])
+    first = asyncio.run(llm.analyze_parsed_team(team, mode="deep"))
+    second = asyncio.run(llm.analyze_parsed_team(team, mode="deep"))
+
+    TeamAnalysis.model_validate(analysis_fields(first))
+    assert first["usage"]["provider"] == "openai"
+    assert first["usage"]["cached"] is False and second["usage"]["cached"] is True
+    assert first["usage"]["prompt_tokens"] > 0
+    assert fake_openai.state.requests == 1
+
+def test_openai_stream_through_fake(fake_openai):
+    async def collect():
+        return [event async for event in llm.stream_team_analysis(PASTES[1], mode="deep")]
+
+    events = asyncio.run(collect())
+    name, done = events[-1]
+    assert name == "done"
+    TeamAnalysis.model_validate(analysis_fields(done))
+    assert fake_openai.state.requests == 1
+
+def test_packed_analysis_is_one_request(fake_openai):
+    teams = [parse_showdown_team(paste) for paste in PASTES[:3]]
+    results = asyncio.run(llm.analyze_parsed_teams_packed(teams, mode="deep"))
+
+    assert len(results) == 3
+    for result in results:
+        TeamAnalysis.model_validate(analysis_fields(result))
+    assert fake_openai.state.requests == 1
+
+def test_local_llm_provider_is_routable(fake_openai, monkeypatch):
+    monkeypatch.setattr(providers, "LOCAL_LLM_BASE_URL", "http://127.0.0.1:8080/v1")
+    assert "local-llm" not in llm.providers
+    assert providers.create_providers("gpt-4", 10)["local-llm"].kind == "chat"
+
+    local = make_app(latency=0, chunk_delay=0)
+    monkeypatch.setitem(llm.providers, "local-llm", fake_provider(local, name="local-llm", model="local"))
+    monkeypatch.setitem(llm.ANALYSIS_ROUTES, "deep", "local-llm")
+    result = asyncio.run(llm.analyze_parsed_team(parse_showdown_team(PASTES[2]), mode="deep"))
+
+    assert result["usage"]["provider"] == "local-llm"
+    assert (local.state.requests, fake_openai.state.requests) == (1, 0)
+
+def test_routing(fake_openai):
+    assert llm.get_provider("quick").kind == "rules"
+    assert llm.get_provider("deep").name == "openai"
+    with pytest.raises(ValueError):
+        llm.get_provider("unknown")
+    llm.ANALYSIS_ROUTES["deep"] = "missing"
+    with pytest.raises(ValueError):
+        llm.get_provider("deep")
\ No newline at end of file
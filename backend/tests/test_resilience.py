@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from benchmarks import fake_upstreams
+from routers import sets
+from services import history, http_client, pikalytics
+from services.metrics import HISTORY_WRITE_ERRORS
+from services.resilience import UpstreamUnavailable, error_fields
+
+
+def status_error(status, **headers):
+    request = httpx.Request("GET", "https://www.pikalytics.com/pokedex/sv/x")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def test_error_fields():
+    assert error_fields(UpstreamUnavailable("open", retry_after=2.5)) == {"status": 503, "retry_after": 3}
+    assert error_fields(asyncio.TimeoutError()) == {"status": 504}
+    assert error_fields(httpx.ReadTimeout("slow")) == {"status": 504}
+    assert error_fields(status_error(429, **{"Retry-After": "7"})) == {"status": 503, "retry_after": 7}
+    assert error_fields(status_error(404)) == {"status": 404}
+    assert error_fields(status_error(403)) == {"status": 403}
+    assert error_fields(status_error(500)) == {"status": 502}
+    assert error_fields(httpx.ConnectError("refused")) == {"status": 502}
+    assert error_fields(ValueError("bad input")) == {"status": 400}
+    assert error_fields(KeyError("bug")) == {"status": 500}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", fake_upstreams.create_client(
+        fake_upstreams.make_pikalytics_app(latency=0), fake_upstreams.make_pokepaste_app(latency=0)
+    ))
+    pikalytics._sets_cache.clear()
+    app = FastAPI()
+    app.include_router(sets.router)
+    yield app
+    pikalytics._sets_cache.clear()
+
+def call(app, method, url, **kwargs):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            return await c.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+
+def test_unknown_pokemon_is_404(app):
+    response = call(app, "GET", "/sets/Notamon")
+    assert response.status_code == 404
+    assert response.json()["sets"] == []
+
+    response = call(app, "POST", "/sets/batch", json={"pokemon": ["Notamon", "Alsonotamon"]})
+    assert response.status_code == 404
+    assert response.json()["failed"] == ["Notamon", "Alsonotamon"]
+
+def test_known_pokemon_still_served(app):
+    response = call(app, "POST", "/sets/batch", json={"pokemon": ["Incineroar", "Notamon"]})
+    assert response.status_code == 200
+    assert response.json()["failed"] == ["Notamon"]
+
+
+def test_failed_history_write_is_counted(app, monkeypatch):
+    class BrokenHistory:
+        def record_sets(self, *args):
+            raise OSError("disk full")
+
+    monkeypatch.setattr(history, "meta_history", BrokenHistory())
+    before = HISTORY_WRITE_ERRORS._values.get(("sets", "OSError"), 0)
+
+    assert call(app, "GET", "/sets/Incineroar").status_code == 200
+    assert HISTORY_WRITE_ERRORS._values[("sets", "OSError")] == before + 1
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi import FastAPI
+
+from models.team import SavedTeam, Team
+from routers import teams
+from services import auth, http_client, supabase
+from services.cache import Counters, LRUCache
+from services.supabase import PostgrestTeamStore, SQLiteTeamStore, TeamConflictError, TeamRepository
+
+SECRET = "test-secret-that-is-long-enough-for-hs256"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return TeamRepository(SQLiteTeamStore(str(tmp_path / "teams.db")), cache=LRUCache(maxsize=64), generations=Counters())
+
+def team(name, **kwargs):
+    return Team(name=name, pokemon=[], **kwargs)
+
+def list_all(repo, user_id, limit):
+    pages, cursor = [], None
+    while True:
+        page = asyncio.run(repo.list_teams(user_id, cursor, limit))
+        pages.append([t.id for t in page["teams"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_keyset_cursor_pages_newest_first(repo):
+    saved = asyncio.run(repo.save_teams("alice", [team(f"Team {i}") for i in range(5)]))
+    asyncio.run(repo.save_teams("bob", [team("Other")]))
+
+    pages = list_all(repo, "alice", limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    # Same updated_at throughout, so id breaks the tie
+    assert sum(pages, []) == sorted((t.id for t in saved), reverse=True)
+
+def test_cursor_is_stable_when_teams_are_added(repo):
+    asyncio.run(repo.save_teams("alice", [team(f"Team {i}") for i in range(4)]))
+    first = asyncio.run(repo.list_teams("alice", None, 2))
+
+    asyncio.run(repo.save_teams("alice", [team("Newest")]))
+    rest = asyncio.run(repo.list_teams("alice", first["next_cursor"], 10))
+
+    seen = [t.id for t in first["teams"]] + [t.id for t in rest["teams"]]
+    assert len(seen) == len(set(seen)) == 4
+    assert "Newest" not in [t.name for t in rest["teams"]]
+
+def test_invalid_cursor(repo):
+    with pytest.raises(ValueError):
+        asyncio.run(repo.list_teams("alice", "not-a-cursor", 2))
+
+
+def test_write_bumps_page_generation(repo):
+    asyncio.run(repo.save_teams("alice", [team("First")]))
+    assert len(asyncio.run(repo.list_teams("alice"))["teams"]) == 1
+    assert len(repo.cache) == 1
+    generation = repo._generations.get("alice")
+
+    asyncio.run(repo.save_teams("alice", [team("Second")]))
+    assert repo._generations.get("alice") == generation + 1
+    assert [t.name for t in asyncio.run(repo.list_teams("alice"))["teams"]] == ["Second", "First"]
+
+    asyncio.run(repo.delete_team("alice", asyncio.run(repo.list_teams("alice"))["teams"][0].id))
+    assert [t.name for t in asyncio.run(repo.list_teams("alice"))["teams"]] == ["First"]
+
+def test_page_read_during_a_write_is_not_cached(repo):
+    list_page = repo.store.list_page
+
+    async def racing_list_page(*args):
+        rows = await list_page(*args)
+        # A write lands while this page is loading
+        await repo._invalidate("alice")
+        return rows
+
+    repo.store.list_page = racing_list_page
+    asyncio.run(repo.list_teams("alice"))
+    assert len(repo.cache) == 0
+
+
+def test_cross_user_id_conflict(repo):
+    [owned] = asyncio.run(repo.save_teams("alice", [team("Mine")]))
+
+    with pytest.raises(TeamConflictError) as e:
+        asyncio.run(repo.save_teams("bob", [team("New"), SavedTeam(id=owned.id, name="Hijack", pokemon=[])]))
+    assert e.value.team_ids == [owned.id]
+
+    # Nothing in the batch was written
+    assert asyncio.run(repo.get_team("alice", owned.id)).name == "Mine"
+    assert asyncio.run(repo.list_teams("bob"))["teams"] == []
+
+def test_sqlite_upsert_rolls_back_on_conflict(repo):
+    [owned] = asyncio.run(repo.save_teams("alice", [team("Mine")]))
+    row = {"user_id": "bob", "name": "Hijack", "pokemon": [], "created_at": "t", "updated_at": "t"}
+
+    with pytest.raises(TeamConflictError):
+        asyncio.run(repo.store.upsert([{**row, "id": "fresh"}, {**row, "id": owned.id}]))
+    assert asyncio.run(repo.store.get("bob", "fresh")) is None
+
+def test_updating_own_team_keeps_id(repo):
+    [saved] = asyncio.run(repo.save_teams("alice", [team("Draft")]))
+    [updated] = asyncio.run(repo.save_teams("alice", [SavedTeam(id=saved.id, name="Final", pokemon=[])]))
+    assert updated.id == saved.id
+    assert [t.name for t in asyncio.run(repo.list_teams("alice"))["teams"]] == ["Final"]
+
+
+def fake_postgrest(rows):
+    """Just enough of PostgREST's filters and Prefer handling for the teams store's writes."""
+    def matches(row, params):
+        for column in ("id", "user_id"):
+            op, _, value = params.get(column, "").partition(".")
+            if op == "eq" and row[column] != value or op == "neq" and row[column] == value:
+                return False
+            if op == "in" and row[column] not in json.loads(f"[{value[1:-1]}]"):
+                return False
+        return True
+
+    def handle(request):
+        params = dict(request.url.params)
+        if request.method == "POST":
+            assert "resolution=ignore-duplicates" in request.headers["Prefer"]
+            inserted = [row for row in json.loads(request.content) if row["id"] not in rows]
+            rows.update((row["id"], row) for row in inserted)
+            return httpx.Response(201, json=inserted)
+        found = [row for row in rows.values() if matches(row, params)]
+        if request.method == "PATCH":
+            for row in found:
+                row.update(json.loads(request.content))
+        elif request.method == "DELETE":
+            for row in found:
+                del rows[row["id"]]
+        return httpx.Response(200, json=found)
+    return httpx.MockTransport(handle)
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    rows = {}
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=fake_postgrest(rows)))
+    return rows, PostgrestTeamStore("http://supabase.test", "service-key")
+
+def test_postgrest_upsert_never_takes_another_users_row(postgrest):
+    rows, store = postgrest
+    row = {"name": "Mine", "pokemon": [], "created_at": "t", "updated_at": "t"}
+    asyncio.run(store.upsert([{**row, "id": "owned", "user_id": "alice"}]))
+
+    # As if alice's row landed after bob's foreign_ids() check
+    hijack = {**row, "name": "Hijack", "user_id": "bob"}
+    with pytest.raises(TeamConflictError) as e:
+        asyncio.run(store.upsert([{**hijack, "id": "fresh"}, {**hijack, "id": "owned"}]))
+    assert e.value.team_ids == ["owned"]
+    assert rows["owned"]["name"] == "Mine" and rows["owned"]["user_id"] == "alice"
+    assert "fresh" not in rows
+
+def test_postgrest_upsert_updates_own_rows(postgrest):
+    rows, store = postgrest
+    row = {"user_id": "alice", "pokemon": [], "created_at": "t", "updated_at": "t"}
+    asyncio.run(store.upsert([{**row, "id": "a", "name": "Draft"}]))
+
+    saved = asyncio.run(store.upsert([{**row, "id": "a", "name": "Final", "updated_at": "u"}, {**row, "id": "b", "name": "New"}]))
+    assert sorted(r["id"] for r in saved) == ["a", "b"]
+    assert (rows["a"]["name"], rows["a"]["updated_at"], rows["a"]["created_at"]) == ("Final", "u", "t")
+
+@pytest.fixture
+def client(repo, monkeypatch):
+    monkeypatch.setattr(supabase, "_team_repository", repo)
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    app = FastAPI()
+    app.include_router(teams.router)
+    return app
+
+def bearer(user_id, secret=SECRET, **claims):
+    token = jwt.encode({"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 60, **claims}, secret)
+    return {"Authorization": f"Bearer {token}"}
+
+def call(app, method, url, **kwargs):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            return await c.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+
+def test_routes_require_a_valid_token(client):
+    assert call(client, "GET", "/teams").status_code == 401
+    assert call(client, "GET", "/teams", headers=bearer("alice", secret="wrong-secret-but-also-long-enough")).status_code == 401
+    assert call(client, "GET", "/teams", headers=bearer("alice", exp=int(time.time()) - 10)).status_code == 401
+    assert call(client, "POST", "/teams", json={"teams": [{"name": "A", "pokemon": []}]}).status_code == 401
+
+def test_routes_use_the_token_user(client):
+    response = call(client, "POST", "/teams", json={"user_id": "mallory", "teams": [{"name": "A", "pokemon": []}]},
+                    headers=bearer("alice"))
+    assert response.status_code == 200
+    [saved] = response.json()["teams"]
+    assert saved["user_id"] == "alice"
+
+    assert call(client, "GET", f"/teams/{saved['id']}", headers=bearer("bob")).status_code == 404
+    assert call(client, "DELETE", f"/teams/{saved['id']}", headers=bearer("bob")).status_code == 404
+    assert call(client, "GET", f"/teams/{saved['id']}", headers=bearer("alice")).json()["name"] == "A"
+
+def test_saving_another_users_team_id_is_409(client):
+    [saved] = call(client, "POST", "/teams", json={"teams": [{"name": "A", "pokemon": []}]}, headers=bearer("alice")).json()["teams"]
+    response = call(client, "POST", "/teams", json={"teams": [{"id": saved["id"], "name": "B", "pokemon": []}]},
+                    headers=bearer("bob"))
+    assert response.status_code == 409
+    assert call(client, "GET", f"/teams/{saved['id']}", headers=bearer("alice")).json()["name"] == "A"
\ No newline at end of file